@@ -4,8 +4,10 @@
 Code to control a heating system remotely by a robot, which presses the corresponding buttons on the boiler (Viessmann
 Vitodens 200-W).
  
-The graphical user interface is created with Kivy, and can be used with mouse or touch. 
+The graphical user interface is created with Kivy (in kivygui.py), and can be used with mouse or touch. 
 In our case, a Raspberry Pi acts as a server on which the application runs.
+This module contains the control itself (classes Heizung and Robot) and can be imported without kivy. Started with
+--headless, the control runs without GUI (heizdaemon.py), for example on a computer without screen.
 
 To use the program, we have set our boiler permanently to reduced state (which we have set to ca. 8° C), and we deleted
 all saved changing times in the boiler. Then we raise or reduce the temperature by choosing (or turning off) the  boiler's
@@ -18,8 +20,9 @@ Some features of the program are: raising or reducing spontaneously, automatic c
 changing the schedule once to holiday times with a single button press.
 
 Please consider:
-- when the program is started, the user has to ensure that the state of the program and the state of the boiler are 
-identical (for example by setting the boiler state manually).
+- when the program is started for the first time, the user has to ensure that the state of the program and the state of
+the boiler are identical (for example by setting the boiler state manually). After a restart, the state is restored
+from the journal (see heizjournal.py) - a change of the boiler by hand in the meantime isn't noticed.
 - if the state of the program is 'none', because there was a problem with loading the data for the changing times, the 
 file has to be corrected and the program restarted.
 - not every "weird" combination of actions is being taken care of by the code, as it was created for use by ourselves,
@@ -32,53 +35,97 @@ the interface of the boiler at hand (what possibilities/commands the boiler itse
 """
 
 
+import argparse
 import socket
+import select
+import threading
+import time
 import logging
 from datetime import datetime, timedelta
 import copy
-import ast
-import re
 import os
-
-# the following is needed because otherwise (with KIVY_LOG_MODE = "KIVY"), kivy will affect all logs, even of third-party
-#   modules, and for example the module "logging" will not write to a file as expected:
-os.environ['KIVY_LOG_MODE'] = 'MIXED'  # needs to be done before the import of kivy!
-
-from kivy.config import Config
-# everything here must be above all the other imports:
-Config.set("graphics", "position", "custom")  # position must be set to "custom" (here that way or manually in the kivy configuration file), otherwise it doesn't work
-Config.set("graphics", "left", 0)  # coordinate system
-Config.set("graphics", "top", 0)
-Config.set("graphics", "height", 430)  # 445
-Config.set("graphics", "width", 795)  # 800
-#Config.set("graphics", "allow_screensaver", True)  # more on kivy configurations: https://kivy.org/doc/stable/api-kivy.config.html#module-kivy.config, but doesn't work
-
-import kivy
-from kivy.app import App
-from kivy.uix.button import Button
-from kivy.uix.label import Label
-from kivy.uix.floatlayout import FloatLayout
-
-from kivy.clock import Clock
-
-from ownlabel import MyWarnLabel  # own module with custom kivy-label (it's a label that tells the user to wait while actions run)
-
-kivy.require('2.1.0')
+import sys
+
+from commandexecutor import CommandExecutor  # own module that runs the robot commands in a worker thread
+from scheduleindex import ScheduleIndex, to_minutes  # own module with the sorted index of the changing-times
+from urlaubindex import UrlaubIndex, compact_urlaubfile, merge_vacations  # own module with the index of the holiday-times
+from icsimport import IcsCalendar, parse_ics, format_version as ics_format_version  # own module that imports the holiday and vacation calendars (.ics)
+from heiztimeline import Timeline  # own module with the merged timeline of the coming changes
+from parsecache import ParseCache, content_hash  # own module with the cache of the parsed data-files
+from scheduleparser import parse_times, parse_urlaub, format_version  # own module that reads and checks the data-files
+from heizjournal import Journal  # own module that saves the changes of the state
+from robottiming import TimingModel  # own module with the learned durations of the robot (for the timeouts)
+from circuitbreaker import CircuitBreaker  # own module that stops the commands while the robot can't be reached
+from boilermenu import MenuTracker  # own module with the model of the boiler menu (for the shortest button sequences)
+from heizmetrics import metrics, MetricsServer, TextfileWriter  # own module with the metrics (latencies, results)
+from heizlogging import LogWriter, BatchedRotatingFileHandler, UnitLogger  # own module that writes the logfiles in the background
 
 errorlogfile = "LOG_heiz_fehler.txt"
 actionlogfilei = "LOG_heiz_action.txt"
+log_maxbytes = 1000000  # size of a logfile after which it is rotated (the old part is compressed)
+log_backups = 10  # number of old (compressed) parts kept per logfile
+log_totalcap = 5000000  # maximum size of all the old parts of a logfile together (the oldest are deleted)
+log_flushinterval = 10  # seconds after which the log messages are written at the latest (errors are written at once)
 urlaubfile = "data_urlaub.txt"
+urlaub_compactfile = False  # if True, holiday-times that are over are also removed from the urlaub-file (not only from the memory)
 timesfile = "data_times.txt"
+holidays_icsfile = None  # z.B. "data_feierdeeg.ics": calendar with the public holidays (see icsimport) - the evening before a holiday, tomorrow-holiday is activated automatically
+vacations_icsfile = None  # z.B. "data_vakanz.ics": calendar with vacations, added to the holiday-times of the urlaub-file
+ics_windowdays = 400  # days (from today) for which the repetitions of the calendar events are expanded
+holiday_weekdays = [1, 2, 3, 4, 5]  # tomorrow-holiday is only activated for the imported holidays on these weekdays (the weekend has its own times)
+parsecachefile = "data_cache.json"  # the parsed contents of the data-files (so that unchanged files don't have to be parsed again)
+journalfile = "data_journal.txt"  # the changes of the state (to restore it after a restart, see heizjournal)
+journal_snapshotfile = "data_journal_snapshot.txt"
+robottimingfile = "data_robottiming.json"  # the learned durations of the robot (see robottiming)
+journal_maxage = 7  # days - a saved state that is older isn't restored (only the believed state of the boiler)
+watch_datafiles = True  # if True, changes of the data-files are loaded automatically (without pressing the load-buttons)
 
 datetimeformat = "%Y-%m-%d %H:%M"
 timeformat = "%H:%M"
 
 default_changetimes = {1: {}, 2: {}, 3: {}, 4: {}, 5: {}, 6: {}, 7: {}}  # default dictionary for the automatic changes per day
 
+# the commands for the robot (the buttons of the boiler to press):
+toggle_message = "1 4 4 4 4."  # 'länger warm' on/off - raises to normal or reduces (depending on the state before)
+urlaubon_message = "1 3 3 4 4 4 3 4 4."  # 'Heizkreis aus' (frost protection)
+urlauboff_message = "1 3 3 4 4 4 2 4 4 1 1 2 2 4 4 4 4."  # 'Heizkreis ein' and 'länger warm' (normal state)
+# if True, the commands are computed with the model of the boiler menu (see boilermenu) from the screen the robot left
+#   the display at - without the reset at the beginning if it's known (the sequences above are used while the state
+#   of the boiler is unknown):
+compile_sequences = False  # (opt-in: the menu model was derived from the fixed sequences and hasn't been checked on the real boiler yet - the emulator uses the same model, so it can't confirm it)
+menu_screenkeep = 30  # seconds the display surely stays at the screen of the last press
+menu_screentimeout = 900  # seconds after which the display is surely back at the base display
+
 robot_ip = "192.168.178.33"
 testrobot_ip = "192.168.178.32"  # test-IP (with fake-robot that answers as if the messages/commands would have been carried out)
 myrobot_ip = robot_ip  # TODO: change to robot_ip / testrobot_ip for normal use or for use with fake-robot
 myrobot_port = 23
+robot_connecttimeout = 5  # seconds to wait for the connection to the robot
+robot_maxidle = 600  # seconds after which an unused connection is renewed before the next command
+robot_pipelining = False  # if True, the commands of a batch are sent at once, otherwise one after the other (waiting for each echo) - only for a robot firmware that queues the messages it receives while it presses (check it with the real robot first)
+preconnect_seconds = 5  # how many seconds before a scheduled change the connection to the robot is opened
+reconcile_retries = 2  # how often a robot command is repeated at once, when the robot couldn't be reached
+reconcile_retrydelay = 5  # seconds between these repetitions
+reconcile_retryinterval = 60  # seconds after which the check tries again, if the robot still couldn't be reached
+# after this many failures in a row (no connection or no echo), the robot is considered unreachable: the commands fail
+#   at once, and the connection is tested in the background, first after breaker_resettimeout seconds, then after twice
+#   as long every time (up to breaker_maxresettimeout) - see circuitbreaker:
+breaker_failures = 3
+breaker_resettimeout = 30
+breaker_maxresettimeout = 600
+robot_unreachable = "Roboter net erreechbar"  # the answer of the commands while the robot is considered unreachable
+# the answers of Robot.send_message that mean the message didn't reach the robot (so it is safe to send it again):
+robot_notsent = ["timeouterror", "Verbindungsproblem", "Verbindungsproblem - allg. except agespr.!!", robot_unreachable]
+scheduler_maxsleep = 600  # the scheduler wakes up at least every x seconds (even if no change is due), to notice clock changes
+api_host = "127.0.0.1"  # the HTTP API (see heizapi) is only reachable on this computer - "0.0.0.0" for the local network at http://<IP>:api_port (only started with api_token, as anyone in the network could switch the boiler)
+api_port = 8080  # None: no HTTP API
+api_token = None  # z.B. "geheim": the clients of the API have to send the header "Authorization: Bearer geheim"
+metrics_host = "127.0.0.1"  # the metrics (see heizmetrics) are served at http://metrics_host:metrics_port/metrics
+metrics_port = 9108  # None: no HTTP server for the metrics
+metrics_textfile = None  # z.B. "heiz_metrics.prom": the metrics are also written to this file (every metrics_textinterval seconds)
+metrics_textinterval = 15
+# the names of the robot commands in the metrics:
+robot_commandnames = {"test.": "test", toggle_message: "toggle", urlaubon_message: "urlaub_on", urlauboff_message: "urlaub_off"}
 
 versionnr = "1.3"
 testerei = False  # test status, doesn't write to logfiles if True (only outputs lots of debugging messages)
@@ -91,114 +138,406 @@ if testerei == True:  # for test-modus (logging debug modus, no writing to log-f
     # the debug-modus doesn't log into a file, it's more similar to print-statement to debug:
     logging.basicConfig(level=logging.DEBUG, format='%(asctime)s -  %(levelname)s -  %(message)s', datefmt = "%Y-%m-%d %H:%M")
 else:  # so no testing, but log errors (and possibly actions):
+    # (the messages are written to the files in the background, in batches, and the files are rotated - see heizlogging)
+    logwriter = LogWriter(flush_interval=log_flushinterval)
     errorlogger = logging.getLogger("errorlog")
-    errorhandler = logging.FileHandler(errorlogfile)
+    errorhandler = BatchedRotatingFileHandler(errorlogfile, log_maxbytes, log_backups, log_totalcap)
     errorformatter = logging.Formatter('\n%(asctime)s %(levelname)s | %(name)s | %(message)s', datefmt = "%d-%m-%Y %H:%M:%S")
     errorhandler.setFormatter(errorformatter)
-    errorlogger.addHandler(errorhandler)
+    errorlogger.addHandler(logwriter.handler_for(errorhandler))
     actionlogger = logging.getLogger("actionlog")
     actionlogger.setLevel(logging.DEBUG)
-    actionhandler = logging.FileHandler(actionlogfilei)
+    actionhandler = BatchedRotatingFileHandler(actionlogfilei, log_maxbytes, log_backups, log_totalcap)
     actionformatter = logging.Formatter('%(asctime)s %(levelname)s | %(name)s | %(message)s', datefmt = "%d-%m-%Y %H:%M:%S")
     actionhandler.setFormatter(actionformatter)  # schema: '31-10-2024 09:33:35 INFO | actionlog | lo rof gedréckt.'
-    actionlogger.addHandler(actionhandler)
+    actionlogger.addHandler(logwriter.handler_for(actionhandler))
+
+# the metrics that are exported (see heizmetrics):
+metrics.describe("heiz_robot_phase_seconds", "histogram", "Duration of the phases (connect, send, echo) of the robot commands, per robot.")
+metrics.describe("heiz_robot_commands_total", "counter", "Robot commands per robot by result (ok, timeout, echo_mismatch, connection_error, not_sent, error).")
+metrics.describe("heiz_robot_connect_seconds", "histogram", "Duration of the new connections to the robot.")
+metrics.describe("heiz_robot_connects_total", "counter", "New connections to the robot by result.")
+metrics.describe("heiz_robot_breaker_state", "gauge", "State of the circuit breaker of the robot (0 closed, 1 half open, 2 open).")
+metrics.describe("heiz_robot_breaker_trips_total", "counter", "How often the robot was considered unreachable (circuit breaker opened).")
+metrics.describe("heiz_reconcile_seconds", "histogram", "Duration of the actions of the Heizung (reconcile, with all its robot commands).")
+metrics.describe("heiz_reconcile_total", "counter", "Actions of the Heizung by result (ok, retry_later, failed).")
+metrics.describe("heiz_scheduler_lag_seconds", "histogram", "Delay between the moment a change was due and its check.",
+                 buckets=(0.1, 0.5, 1, 2, 5, 10, 30, 60, 300, 3600))
 
 #logging.debug('the debug-logging part starts here:')
 #logging.debug(f"time_now: {datetime.now().strftime('%H:%M')}")
 
 
+def command_name(message_text):
+    """the name of a robot command in the metrics (the button sequences themselves would be too long as labels)"""
+    return robot_commandnames.get(message_text, "other")
+
+
+def answer_result(answer):
+    """the result of a robot answer in the metrics"""
+    if answer == True:
+        return "ok"
+    if answer == "Timeout":
+        return "timeout"
+    if answer == "Echo-Text falsch":
+        return "echo_mismatch"
+    if answer == robot_unreachable:
+        return "breaker_open"
+    if answer in robot_notsent:
+        return "connection_error"
+    if answer == "net ausgefouert":
+        return "not_sent"
+    return "error"
+
+
+def start_metrics():
+    """starts the export of the metrics (HTTP server and/or file), as configured with metrics_port and metrics_textfile"""
+    if metrics_port is not None:
+        try:
+            MetricsServer(metrics, metrics_host, metrics_port).start()
+        except OSError:  # (z.B. the port is already used - the control works without the metrics)
+            logging.exception("the metrics server couldn't be started")
+            if testerei == False:
+                errorlogger.exception(f"De Metrik-Server konnt net gestart gin (Port {metrics_port})")
+    if metrics_textfile is not None:
+        TextfileWriter(metrics, metrics_textfile, metrics_textinterval).start()
+
+
 class Robot():
     """for the communication with the robot
     (by calling the class Heizung (via the user interface), who calls the robot).
-    The server for the communication runs on the robot."""
+    The server for the communication runs on the robot.
+
+    The connection to the robot is kept open between the commands (instead of a new socket for every command), so that
+    a command doesn't lose time with connecting. If the connection was closed in the meantime (by the robot or because
+    of a network problem), it is re-established transparently before the next command is sent."""
 
-    def __init__(self, robot_ip, communication_port):
+    def __init__(self, robot_ip, communication_port, timingfile=None, name=None):
         self.robot_ip = robot_ip
         self.communication_port = communication_port
+        # the loggers (with the name of the unit in front of the messages, see heizlogging.UnitLogger):
+        self.errorlogger = UnitLogger(logging.getLogger("errorlog"), name)
+        self.actionlogger = UnitLogger(logging.getLogger("actionlog"), name)
+        # the durations of the messages, learned from the echoes - for the timeouts and the expected duration:
+        self.timing = TimingModel(timingfile)
+        self.sock = None  # the long-lived connection to the robot (None as long as there is no open connection)
+        self.last_used = None  # time.monotonic() of the last use of the connection
+        # the lock ensures that only one thread at a time uses the connection (e.g. a pre-connect and a command):
+        self.lock = threading.RLock()
+        self.buffer = b""  # received data that wasn't evaluated yet (the beginning of the next echo)
+        # duration (in seconds) of the phases of the last command (None for a phase that wasn't reached):
+        self.last_timing = {"connect": None, "send": None, "echo": None}
+        self.progress = (0, 0)  # (answered messages, all messages) of the running send_batch
+        self.expected = 0  # the expected duration (in seconds) of the running send_batch (0 if none is running)
+        # while the robot can't be reached, the commands fail at once (see circuitbreaker):
+        self.breaker = CircuitBreaker(self.probe, breaker_failures, breaker_resettimeout, breaker_maxresettimeout)
+        self.breaker.listeners.append(self.breaker_changed)
+        metrics.set("heiz_robot_breaker_state", 0, robot=self.robot_ip)
+
+    def connect(self, probing=False):
+        """Creates the connection to the robot, if there isn't already an open one.
+        Returns True if the connection is open, otherwise it returns a string describing the problem (to be able to
+        show the problem in the window/GUI) - robot_unreachable at once while the circuit breaker is open (except for
+        its probe, probing=True)."""
+        with self.lock:
+            if self.sock is not None:
+                if self.connection_alive():
+                    return True
+                logging.debug("the old connection to the robot was closed - reconnecting")
+                self.disconnect()
+            if not probing and not self.breaker.allow():
+                return robot_unreachable
+            connection = self.open_connection()
+            if connection != True and not probing:
+                self.breaker.record(False)
+            return connection
+
+    def open_connection(self):
+        """creates the connection (see connect)"""
+        with self.lock:
+            # create a socket / connection to the robot:
+            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            try:
+                # if the IP for connecting doesn't exist, connect() throws quickly an error (z.B.: OSError 113), but if it exists and doesn't
+                #   respond, the method connect() would try connecting until it's own timeout. To keep it short, set own timeout:
+                s.settimeout(robot_connecttimeout)
+                # pass the IP-address that should be called to the connect-method:
+                connectstart = time.perf_counter()
+                s.connect((self.robot_ip, self.communication_port))
+            except TimeoutError:
+                s.close()
+                metrics.inc("heiz_robot_connects_total", result="timeout")
+                logging.exception("timeouterror while connecting")
+                if testerei == False:
+                    self.errorlogger.exception("timeout while trying to connect the socket")
+                return "timeouterror"
+            except OSError:
+                s.close()
+                metrics.inc("heiz_robot_connects_total", result="error")
+                # possible OSErrors (among others): OSError: [Errno 113] No route to host (robot doesn't answer)
+                #   OSError: [Errno 101] Network is unreachable (the LAN cable is not plugged in / there is no WLAN connection)
+                #   ConnectionRefusedError: [Errno 111] Connection refused
+                #   TimeoutError: [Errno 110] Connection timed out
+                logging.exception("problem with the communication/connection!")
+                if testerei == False:
+                    self.errorlogger.exception("Problem mat der Kommunikatioun! (Verbindung)")
+                return "Verbindungsproblem"
+            except:  # for the case there were another error than OSError
+                s.close()
+                metrics.inc("heiz_robot_connects_total", result="error")
+                logging.exception("undefined except reached while trying connecting to robot")
+                if testerei == False:
+                    self.errorlogger.exception("Allgemengen except agesprong bei Konnektioun")
+                return "Verbindungsproblem - allg. except agespr.!!"
+            metrics.observe("heiz_robot_connect_seconds", time.perf_counter() - connectstart)
+            metrics.inc("heiz_robot_connects_total", result="ok")
+
+            # the commands are short, so they shouldn't wait in the send buffer:
+            s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            # let the operating system detect a robot that disappeared silently (e.g. power cut), instead of only noticing
+            #   it with the timeout of the next command (the TCP_KEEP* options don't exist on every platform):
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            if hasattr(socket, "TCP_KEEPIDLE"):
+                s.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 30)
+                s.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 10)
+                s.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3)
+            self.sock = s
+            self.buffer = b""
+            self.last_used = time.monotonic()
+            logging.debug("connection to the robot established")
+            return True
+
+    def connection_alive(self):
+        """Checks (without blocking) if the open connection is still usable. A connection that was closed by the robot
+        is readable and returns an empty answer."""
+        try:
+            readable, _, _ = select.select([self.sock], [], [], 0)
+            if readable and self.sock.recv(1, socket.MSG_PEEK) == b"":
+                return False
+        except OSError:
+            return False
+        # a connection that hasn't been used for a long time is renewed, in case it was dropped without notice:
+        if time.monotonic() - self.last_used > robot_maxidle:
+            return False
+        return True
+
+    def disconnect(self):
+        """Closes the connection to the robot (if there is one)."""
+        with self.lock:
+            if self.sock is not None:
+                try:
+                    self.sock.close()
+                except OSError:
+                    pass
+                self.sock = None
+                self.buffer = b""
+
+    def preconnect(self):
+        """Opens the connection in advance (for example a few seconds before a scheduled change), so that the command
+        itself doesn't have to wait for the connection. Returns the same values as connect()."""
+        logging.debug("robot-method preconnect activated")
+        preconnected = self.connect()
+        if preconnected != True and testerei == False and onlyerrorlog == False:
+            self.actionlogger.info(f"Viraus-Verbindung mam Roboter get zréck: {preconnected}")
+        return preconnected
 
     def send_message(self, message_text):
-        """Sends the message to the robot (create a client/socket, send the message, check the response).
+        """Sends the message to the robot (open the connection if needed, send the message, check the response).
         Returns True if the message is successfully sent, otherwise it returns a string describing the problem (to be
         able to show the problem in the window/GUI.
         The parameter is a string containing the command for the robot, for example a sequence of numbers that represent
         the buttons of the boiler that the robot should push, separated by spaces (Bsp: "1 4 4 4.").
         Every command ends with a dot to mark the end of the message."""
         logging.debug("robot-method send_message activated")
+        return self.send_batch([message_text])[0]
+
+    def send_batch(self, messages, on_ack=None):
+        """Sends several messages (button sequences) to the robot in one session, and returns the list of the answers
+        (one per message, like send_message: True or a string describing the problem).
+        If robot_pipelining is True, all the messages are sent at once, and the robot carries them out one after the
+        other - the echoes arrive as each one is finished. Otherwise every message is sent after the echo of the one
+        before. on_ack(position, message_text, answer) is called as soon as the answer of a message is there (for
+        example to show the progress).
+        After the first problem, the remaining messages get the answer "net ausgefouert" (not carried out) - but if they
+        were already sent (pipelining), the robot could still carry them out."""
+        with self.lock:
+            self.last_timing = {"connect": None, "send": None, "echo": None}
+            self.progress = (0, len(messages))
+            self.expected = sum(self.timing.expected(message_text) for message_text in messages)
+            answers = []
+            starttime = time.perf_counter()
+            connection = self.connect()
+            self.last_timing["connect"] = time.perf_counter() - starttime
+            if connection != True:
+                answers.append(connection)
+            elif robot_pipelining == True:
+                sent = self.send_data("".join(messages))
+                self.last_timing["send"] = time.perf_counter() - starttime - self.last_timing["connect"]
+                senttime = time.perf_counter()
+                if sent != True:
+                    answers.append(sent)
+                else:
+                    batchname = command_name(messages[0]) if len(messages) == 1 else "batch"
+                    metrics.observe("heiz_robot_phase_seconds", self.last_timing["send"], command=batchname, phase="send", robot=self.robot_ip)
+                    for position, message_text in enumerate(messages):
+                        # (an echo that arrived together with the previous one says nothing about the duration)
+                        echostart = time.perf_counter() if b"." not in self.buffer else None
+                        answers.append(self.receive_echo(message_text))
+                        self.observe_echo(message_text, answers[-1], echostart)
+                        self.acknowledge(position, message_text, answers[-1], on_ack)
+                        if answers[-1] != True:
+                            break
+                self.last_timing["echo"] = time.perf_counter() - senttime
+            else:
+                self.last_timing["send"] = 0
+                self.last_timing["echo"] = 0
+                for position, message_text in enumerate(messages):
+                    beforesend = time.perf_counter()
+                    sent = self.send_data(message_text)
+                    senttime = time.perf_counter()
+                    self.last_timing["send"] += senttime - beforesend
+                    if sent != True:
+                        answers.append(sent)
+                        break
+                    metrics.observe("heiz_robot_phase_seconds", senttime - beforesend, command=command_name(message_text), phase="send", robot=self.robot_ip)
+                    answers.append(self.receive_echo(message_text))
+                    self.observe_echo(message_text, answers[-1], senttime)
+                    self.last_timing["echo"] += time.perf_counter() - senttime
+                    self.acknowledge(position, message_text, answers[-1], on_ack)
+                    if answers[-1] != True:
+                        break
+            # the messages after a problem weren't carried out (as far as we know):
+            answers += ["net ausgefouert"] * (len(messages) - len(answers))
+            if connection == True:
+                metrics.observe("heiz_robot_phase_seconds", self.last_timing["connect"], command=command_name(messages[0]), phase="connect", robot=self.robot_ip)
+            for message_text, answer in zip(messages, answers):
+                metrics.inc("heiz_robot_commands_total", command=command_name(message_text), result=answer_result(answer), robot=self.robot_ip)
+            self.expected = 0
+            return answers
+
+    def observe_echo(self, message_text, answer, echostart):
+        """adds the time the robot needed for the echo of the message to the timing model and the metrics (only for
+        correct echoes - the problems are counted in heiz_robot_commands_total). echostart is None if the duration
+        isn't known."""
+        if answer == "Timeout":
+            self.timing.timed_out()
+            self.breaker.record(False)
+        if answer == True:
+            self.breaker.record(True)
+        if answer == True and echostart is not None:
+            self.timing.learn(message_text, time.perf_counter() - echostart)
+            metrics.observe("heiz_robot_phase_seconds", time.perf_counter() - echostart, command=command_name(message_text), phase="echo", robot=self.robot_ip)
+
+    def probe(self):
+        """the probe of the circuit breaker (in its thread): tests the connection with "test." (no button is pressed).
+        Returns True if the robot answered correctly."""
+        with self.lock:
+            logging.debug("probing the robot")
+            connection = self.connect(probing=True)
+            if connection != True:
+                return connection
+            sent = self.send_data("test.")
+            if sent != True:
+                return sent
+            return self.receive_echo("test.")
+
+    def breaker_changed(self, state, previous):
+        """listener of the circuit breaker: logs its changes, and counts them in the metrics"""
+        metrics.set("heiz_robot_breaker_state", {"closed": 0, "half_open": 1, "open": 2}[state], robot=self.robot_ip)
+        if state == "open" and previous == "closed":
+            metrics.inc("heiz_robot_breaker_trips_total", robot=self.robot_ip)
+            logging.debug(f"robot {self.robot_ip} unreachable - the commands fail at once until it answers again")
+            if testerei == False:
+                self.errorlogger.error(f"De Roboter ({self.robot_ip}) as net erreechbar - d'Befeler gin net méi probéiert, bis e rem äntwert (nächsten Test an {self.breaker.waiting} s)")
+        elif state == "closed":
+            logging.debug(f"robot {self.robot_ip} reachable again")
+            if testerei == False and onlyerrorlog == False:
+                self.actionlogger.info(f"De Roboter ({self.robot_ip}) as rem erreechbar")
 
-        socket_on = False
+    def acknowledge(self, position, message_text, answer, on_ack):
+        """refreshes the progress of a batch, and passes the answer of a message to the caller of send_batch"""
+        self.progress = (position + 1, self.progress[1])
+        if on_ack is not None:
+            on_ack(position, message_text, answer)
 
-        # create a socket / connection to the robot:
+    def send_data(self, message_text):
+        """Sends the message(s) over the open connection. Returns True, or a string describing the problem."""
         try:
-            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            # if the IP for connecting doesn't exist, connect() throws quickly an error (z.B.: OSError 113), but if it exists and doesn't
-            #   respond, the method connect() would try connecting until it's own timeout. To keep it short, set own timeout:
-            s.settimeout(5)
-            # pass the IP-address that should be called to the connect-method:
-            s.connect((self.robot_ip, self.communication_port))
-            socket_on = True
-        except TimeoutError:
-            logging.exception("timeouterror while connecting")
-            if testerei == False:
-                errorlogger.exception("timeout while trying to connect the socket")
-            return "timeouterror"
+            self.sock.sendall(message_text.encode())
+            return True
         except OSError:
-            # possible OSErrors (among others): OSError: [Errno 113] No route to host (robot doesn't answer)
-            #   OSError: [Errno 101] Network is unreachable (the LAN cable is not plugged in / there is no WLAN connection)
-            #   ConnectionRefusedError: [Errno 111] Connection refused
-            #   TimeoutError: [Errno 110] Connection timed out
-            logging.exception("problem with the communication/connection!")
-            if testerei == False:
-                errorlogger.exception("Problem mat der Kommunikatioun! (Verbindung)")
-            return "Verbindungsproblem"
-        except:  # for the case there were another error than OSError
-            logging.exception("undefined except reached while trying connecting to robot")
-            if testerei == False:
-                errorlogger.exception("Allgemengen except agesprong bei Konnektioun")
-            return "Verbindungsproblem - allg. except agespr.!!"
-
-        if socket_on == True:  # checks if the socket exists/was created
-            s.send(message_text.encode())
-
+            # the old connection broke in the meantime (the message didn't reach the robot) - try once with a new one:
+            self.disconnect()
+            logging.debug("the reused connection was broken, sending again with a new connection")
+            connection = self.connect()
+            if connection != True:
+                return connection
             try:
-                if message_text == "test.":
-                    s.settimeout(7)
-                elif message_text == "1 3 3 4 4 4 2 4 4 1 1 2 2 4 4 4 4.":
-                    s.settimeout(18)
-                else:
-                    s.settimeout(15)
-
-                answer = s.recv(1024)
-
-            except (TimeoutError, socket.timeout):
-                logging.exception("Timeout-Error!")
-                if testerei == False:
-                    errorlogger.exception("Timeout!")
-                return "Timeout"
-            except:  # for the case there were another error than TimeoutError
-                logging.exception("general except thrown while evaluating the message")
+                self.sock.sendall(message_text.encode())
+                return True
+            except OSError:
+                self.disconnect()
+                logging.exception("problem while sending the message!")
                 if testerei == False:
-                    errorlogger.exception("Allgemengen except agesprong beim Auswerten vum Message")
-                return "allgem. except agesprongen bei Message-Auswertung!!"
+                    self.errorlogger.exception("Problem beim Schécken vum Message!")
+                return "Verbindungsproblem"
 
-            finally: # close the socket (this block runs even if there is a return in the except-blocks above)
-                s.close()
+    def receive_echo(self, message_text):
+        """Waits for the echo of the message and compares it with the message. Returns True if the echo is correct,
+        otherwise a string describing the problem. (What the robot sends after the dot of the echo is kept for the echo
+        of the next message.)"""
+        try:
+            # (the timeout depends on the number of button presses, and on the durations measured so far)
+            self.sock.settimeout(self.timing.timeout(message_text))
+
+            # the answer is complete when it contains the dot (like the message):
+            while b"." not in self.buffer:
+                received = self.sock.recv(1024)
+                if received == b"":  # the robot closed the connection
+                    break
+                self.buffer += received
+
+        except (TimeoutError, socket.timeout):
+            # (the connection is closed, so that a late answer can't be mistaken for the echo of the next command)
+            self.disconnect()
+            logging.exception("Timeout-Error!")
+            if testerei == False:
+                self.errorlogger.exception("Timeout!")
+            return "Timeout"
+        except:  # for the case there were another error than TimeoutError
+            self.disconnect()
+            logging.exception("general except thrown while evaluating the message")
+            if testerei == False:
+                self.errorlogger.exception("Allgemengen except agesprong beim Auswerten vum Message")
+            return "allgem. except agesprongen bei Message-Auswertung!!"
 
-            if testerei == False and onlyerrorlog == False:
-                actionlogger.info(f"'{message_text}' geschéckt")
+        self.last_used = time.monotonic()
+        if b"." in self.buffer:
+            answer, self.buffer = self.buffer.split(b".", 1)
+            answer += b"."
+        else:
+            # the robot closed the connection without (complete) answer - the next command gets a new connection:
+            answer = self.buffer
+            self.disconnect()
 
-            # compare the robot answer with the original sent text - the answer should be the repetition of the
-            #   command (to make sure the communication worked):
-            if answer.decode() != message_text:
-                reckmeldung = f"Kommunikatiounsfehler! Message-Text war: {message_text}\nÄntwert/Echo as: {answer.decode()}"
-                logging.debug(reckmeldung)
-                if testerei == False:
-                    errorlogger.error(reckmeldung)
-                return "Echo-Text falsch"
-            #else:
-            #    reckmeldung = f"Dat huet geklappt!. De mesage war: {message_text}"
-            #    logging.debug(reckmeldung)
+        if testerei == False and onlyerrorlog == False:
+            self.actionlogger.info(f"'{message_text}' geschéckt")
 
-            return True
+        # compare the robot answer with the original sent text - the answer should be the repetition of the
+        #   command (to make sure the communication worked):
+        if answer.decode(errors="replace") != message_text:
+            reckmeldung = f"Kommunikatiounsfehler! Message-Text war: {message_text}\nÄntwert/Echo as: {answer.decode(errors='replace')}"
+            logging.debug(reckmeldung)
+            if testerei == False:
+                self.errorlogger.error(reckmeldung)
+            # (the following echoes can't be assigned reliably anymore)
+            self.disconnect()
+            return "Echo-Text falsch"
+        #else:
+        #    reckmeldung = f"Dat huet geklappt!. De mesage war: {message_text}"
+        #    logging.debug(reckmeldung)
+
+        return True
 
 
 class Heizung():
@@ -212,32 +551,71 @@ class Heizung():
     which raises the temperature to normal.
     For vacation setting, the boiler is turned off (runs on frost protection) by choosing 'Heizkreis aus' in the boiler control."""
 
-    def __init__(self):
-        self.myrobot = Robot(myrobot_ip, myrobot_port)
+    def __init__(self, robotip=None, robotport=None, datadir="", name=None):
+        # (without parameters, the robot and the files configured at the top of this module are used - the fleet mode
+        #   (heizfleet.py) passes its own robot and directory for the files of every unit)
+        self.name = name
+        # the loggers (with the name of the unit in front of the messages, so that the units of a fleet, which write to
+        #   the same logfiles, can be told apart - see heizlogging.UnitLogger):
+        self.errorlogger = UnitLogger(logging.getLogger("errorlog"), name)
+        self.actionlogger = UnitLogger(logging.getLogger("actionlog"), name)
+        self.myrobot = Robot(robotip if robotip is not None else myrobot_ip, robotport if robotport is not None else myrobot_port,
+                             timingfile=os.path.join(datadir, robottimingfile), name=name)
+        self.timesfile = os.path.join(datadir, timesfile)
+        self.urlaubfile = os.path.join(datadir, urlaubfile)
+        self.holidayfile = os.path.join(datadir, holidays_icsfile) if holidays_icsfile is not None else None
+        self.vacationfile = os.path.join(datadir, vacations_icsfile) if vacations_icsfile is not None else None
+        self.calendarfiles = [filename for filename in [self.holidayfile, self.vacationfile] if filename is not None]
+        # all robot commands are carried out one after the other by this executor (in a worker thread, not in the GUI):
+        self.executor = CommandExecutor(logger=self.errorlogger)
+        # the possible screens of the boiler display after the robot commands (only used in the executor):
+        self.menu = MenuTracker(menu_screenkeep, menu_screentimeout)
         self.status = "none"  # possible values: "normal", "reduziert", "urlaub" # (shouldn't be type None, as the value None for a kivy-label could break the code)
+        # the state the boiler should have (self.status is the state the boiler is believed to have) - the robot actions
+        #   needed to bring the boiler from self.status to self.desired_status are carried out by reconcile():
+        self.desired_status = self.status
+        # (the state is changed by the GUI/daemon and by reconcile in the worker thread of the executor - the changes
+        #   that read and write the state are made with this lock, so that none of them overwrites the other one)
+        self.statelock = threading.RLock()
+        self.reconcile_retry_at = None  # moment when reconcile() should be tried again (if the robot couldn't be reached)
         self.longerwarm_on = False  # helper variable to ensure the longerwarm-button cannot be pressed if it already is active
         self.tomorrowholiday_on = False
         self.newmorningtime = None  # new change-time if the morning data has to be changed because of holiday
+        self.holidaycalendar_applied = None  # the holiday ('YYYY-MM-DD') of the holiday calendar for which tomorrow-holiday was activated automatically
 
         self.zeit = datetime.now().strftime("%H:%M")
         if zeiten_testerei == True:
             self.zeit = testzeit
         self.weekday = datetime.now().isoweekday()
         #logging.debug(f"current day of the week is: {self.weekday}")
-        # helper variables to ensure that the automatic changes don't try to run as often as they are called by the kivy scheduler (e.g. 60 times in a minute):
-        self.alreadyrun_times = False
-        self.alreadyrun_holiday = False
+        # the last minute that was checked for due changes (the next check takes into account all the changes since then):
+        self.last_evaluated = datetime.now().replace(second=0, microsecond=0)
+        if zeiten_testerei == True:
+            self.last_evaluated = datetime.combine(self.last_evaluated.date(), datetime.strptime(testzeit, timeformat).time())
+        self.nextcheck = None  # the moment of the next time-related check (computed by next_check_time)
+        self.preconnected_for = None  # the change-time (minute) for which the robot connection was already opened in advance
 
-        self.communicationworks = self.myrobot.send_message("test.")  # test on start if the communication with the robot works
-        if testerei == False and onlyerrorlog == False:
-            actionlogger.info(f"Kommunikatiounstest get zréck: {self.communicationworks}")
+        # the result of the communication test with the robot (None as long as it isn't done - it's started in the
+        #   background by the GUI/daemon with check_communication, so that the start isn't delayed by the robot):
+        self.communicationworks = None
+
+        self.parsecache = ParseCache(os.path.join(datadir, parsecachefile),
+                                     f"{versionnr}/{format_version}/{ics_format_version}")  # (app, data-files, calendars)
+        self.parseerrors = []  # the problems found in the last loaded data-file (see scheduleparser.ScheduleError)
+
+        # reading the imported calendars (the vacations are added to the holiday-times):
+        self.holiday_calendar = self.load_calendar(self.holidayfile, "ics_holidays")
+        self.vacation_calendar = self.load_calendar(self.vacationfile, "ics_vacations")
 
         # reading the file with the holiday-times and load the dictionary:
         read_urlaub_dict = self.load_urlaubdata()
+        self.urlaub_index = UrlaubIndex()
+        # (the vacations that are over are only removed after the journal was read: one that ended while the program
+        #   was stopped still has to be ended by the first check after the last checked minute)
         if type(read_urlaub_dict) == dict:
-            self.urlaub_times = read_urlaub_dict
+            self.set_urlaubtimes(read_urlaub_dict, compact=False)
         else:
-            self.urlaub_times = {}  # load an empty dict when there was a problem with loading it from file (to prevent a traceback when trying to iterate)
+            self.set_urlaubtimes({}, compact=False)  # load an empty dict when there was a problem with loading it from file (to prevent a traceback when trying to iterate)
         logging.debug(f"self.urlaub_times in the Heizung init: {self.urlaub_times}")
 
         # reading the file with the automatic changing-times for the different weekdays:
@@ -251,6 +629,9 @@ class Heizung():
         # create a dict with the automatic change-times for the current day (that is a copy of the corresponding sub-dict):
         self.changetimes_today = copy.deepcopy(self.change_times[self.weekday])
         logging.debug(f"changetimes_today for weekday {self.weekday}: {self.changetimes_today}")
+        # sorted indexes of the changing-times (for the whole week, and for today - see refresh_todayindex):
+        self.times_index = ScheduleIndex(self.change_times)
+        self.refresh_todayindex()
 
         # identify the status for the start:
         returned_status = self.read_timesstatus()
@@ -259,185 +640,203 @@ class Heizung():
         else:
             logging.error("checking the status with the changetimes returns False!")
             if testerei == False:
-                errorlogger.error("status-ofchecken mat den changetimes get False!")
+                self.errorlogger.error("status-ofchecken mat den changetimes get False!")
+        # if the start lies in a vacation, the boiler should be (and stay) off:
+        if self.urlaub_index.on_vacation(datetime.now()):
+            self.status = "urlaub"
+        self.desired_status = self.status
+
+        # restore the state from before the restart (the saved state replaces the guessed one):
+        self.journal = Journal(os.path.join(datadir, journalfile), os.path.join(datadir, journal_snapshotfile))
+        self.restore_state()
+        self.set_urlaubtimes(self.urlaub_filetimes)  # (compacted up to the restored last checked minute)
+        self.apply_holidaycalendar(self.last_evaluated.date())
+        self.save_state("start")
 
         # log the start-status:
         if testerei == False and onlyerrorlog == False:
-            actionlogger.info(f"den status beim Starten as: {self.status}")
+            self.actionlogger.info(f"den status beim Starten as: {self.status}")
+
+
+    def journal_state(self):
+        """the state that is saved in the journal (everything that isn't in the data-files)"""
+        return {"status": self.status, "desired_status": self.desired_status, "longerwarm_on": self.longerwarm_on,
+                "tomorrowholiday_on": self.tomorrowholiday_on, "newmorningtime": self.newmorningtime,
+                "holidaycalendar_applied": self.holidaycalendar_applied,
+                "weekday": self.weekday, "changetimes_today": self.changetimes_today,
+                "last_evaluated": self.last_evaluated.strftime(datetimeformat)}
+
+    def save_state(self, event):
+        """appends the changes of the state to the journal (event describes what happened)"""
+        try:
+            with self.statelock:  # (so that the saved state is the one of a finished change)
+                self.journal.record(event, self.journal_state())
+        except OSError:
+            logging.exception("Problem while writing the journal")
+            if testerei == False:
+                self.errorlogger.exception("Problem beim Schreiwen vum Journal")
 
+    def restore_state(self):
+        """Restores the state saved in the journal before the restart. The state of the boiler is taken over in any
+        case (it's the state after the last confirmed robot action). The rest (longer-warm, tomorrow-holiday, the
+        changing-times of today and the last checked minute) only if the state isn't older than journal_maxage days -
+        the changes that were due in the meantime are then caught up by the next check."""
+        try:
+            saved = self.journal.recover()
+        except (OSError, ValueError, KeyError):
+            logging.exception("Problem while reading the journal")
+            if testerei == False:
+                self.errorlogger.exception("Problem beim Liesen vum Journal - de status gët net erëmhiergestallt")
+            return
+        if saved is None:
+            return
+        self.status = saved["status"]
+        last_evaluated = datetime.strptime(saved["last_evaluated"], datetimeformat)
+        if zeiten_testerei == False and timedelta(0) <= self.last_evaluated - last_evaluated <= timedelta(days=journal_maxage):
+            self.desired_status = saved["desired_status"]
+            self.longerwarm_on = saved["longerwarm_on"]
+            self.tomorrowholiday_on = saved["tomorrowholiday_on"]
+            self.newmorningtime = saved["newmorningtime"]
+            self.holidaycalendar_applied = saved.get("holidaycalendar_applied")  # (not in the journals of older versions)
+            self.weekday = saved["weekday"]
+            if self.longerwarm_on or self.tomorrowholiday_on:  # (otherwise the times of the file, they could be newer)
+                self.changetimes_today = saved["changetimes_today"]
+            else:
+                self.changetimes_today = copy.deepcopy(self.change_times[self.weekday])
+            self.refresh_todayindex()
+            self.last_evaluated = last_evaluated
+        if self.status != self.desired_status:
+            self.reconcile_retry_at = datetime.now()  # (the next check lets the robot bring the boiler to the desired state)
+        logging.debug(f"state restored from the journal: status {self.status}, desired {self.desired_status}, last check {self.last_evaluated}")
+        if testerei == False and onlyerrorlog == False:
+            self.actionlogger.info(f"status aus dem Journal erëmhiergestallt: {self.status} (gewënscht: {self.desired_status}, länger warm: {self.longerwarm_on}, muar-Feierdag: {self.tomorrowholiday_on})")
 
     def load_timesdata(self):
         """loads the times (when the state of the boiler has to be automatically changed), from an external file.
         So the change-times can be edited in the file and loaded into the program during the runtime of the app.
-        Returns either a nested dictionary (with data or empty), or False.
-        (the file contents are not checked for coherence, for example there could be a missing day/dict, or a day/number
-        could be double - a missing daynumber could break the code when the dictionary is searched for the given weekdayday)."""
-        if os.path.exists(timesfile):  # checks if the file already exists
-            with open(timesfile, "r") as timefile:
+        The file is read in one pass (see scheduleparser), in the line format ("1 06:30 normal") or in the old format
+        (a nested dictionary). All the problems found in the file are saved (with line and column) in parseerrors.
+        Returns either a nested dictionary (with data or empty), or False."""
+        self.parseerrors = []
+        if os.path.exists(self.timesfile):  # checks if the file already exists
+            with open(self.timesfile, "r") as timefile:
                 readfile = timefile.read()
-                # extract the changetimes-dictionary from the file:
-                #   (the file contains a multi-line string as a format example, so regex is used to extract the "real" changing-times dictionary)
-                cleanedreadfile = re.sub(r"'''[\s\S]*'''", '', readfile)  # Remove multi-line comments
-                cleanedreadfile = re.sub(r'#.*', '', cleanedreadfile)  # Remove single-line comments
-                cleanedreadfile = re.sub(r"\s*\n\s*\n\s*", '', cleanedreadfile)  # remove whitespaces etc
-
-                # convert the retrieved dictionary-string to a dictionary object:
-                if len(cleanedreadfile) != 0:
-                    try:
-                        loadedtimesdata = ast.literal_eval(cleanedreadfile)  # ast.literal_eval() is able to build a python dictionary from a string
-                    except (SyntaxError, ValueError):
-                        logging.exception("Problem with loading timesdata (SyntaxError or ValueError)")
-                        if testerei == False and onlyerrorlog == False:
-                            errorlogger.exception("Problem beim Ausliesen vun der Zäiten-Datei - falscht Format an der Datei")
-                        return False
-                    except:
-                        logging.exception("General except reached while reading the times file!")
-                        if testerei == False:
-                            errorlogger.exception("Allgemengen except agesprong beim Zäiten-Ausliesen!")
-                        return False
-
-                    # check the dictionary for correctness:
-                    if type(loadedtimesdata) == dict:
-                        # check the values of the (nested) dictionary:
-                        for singledictname in loadedtimesdata:  # looping through the nested dictionary
-                            # check the names of the sub-dictionaries:
-                            if singledictname not in [1, 2, 3, 4, 5, 6, 7]:
-                                logging.debug(f"false dictname: {singledictname}")
-                                if testerei == False:
-                                    errorlogger.error(f'Problem with a dicionary name - has to be 0-7 and not {singledictname}')
-                                return False
-                            for singlekey in loadedtimesdata[singledictname]:
-                                subdict = loadedtimesdata[singledictname]
-                                # check the correctness of the values in the sub-dictionaries:
-                                if subdict[singlekey] not in ["reduziert", "normal"]:
-                                    logging.debug(f"False value: {subdict[singlekey]}")
-                                    if testerei == False:
-                                        errorlogger.error(f'Problem with a value - has to be "reduziert" or "normal" and not {subdict[singlekey]}')
-                                    return False
-                                # check the correctness of the dates/keys of the sub-dictionaries:
-                                try:
-                                    if len(singlekey) == 5:  # check if it is "06:30" and not "6:30" (which would be accepted as a valid time, but crash the app)
-                                        datetime.strptime(singlekey, timeformat)
-                                    else:
-                                        # force the except block to run (as it's an incorrect timeformat too)
-                                        raise ValueError
-                                except:
-                                    logging.debug("There is a problem with the time-format in timesdata")
-                                    if testerei == False:
-                                        errorlogger.exception(f"there is a problem with the formatting of the time in timesdata. It is: {singlekey} but should be: {timeformat}")
-                                    return False
-                        return loadedtimesdata
-                    else: # (no dict)
-                        logging.debug("Doesn't result in a dictionary type")
-                        if testerei == False:
-                            errorlogger.error("Problem with loading the timesdata - the result is not a dict")
-                        return False
-                else:  # if the length of the file is 0 / the file is empty
-                    return default_changetimes  # (and not just {}, as it can bring problems later on because of KeyErrors)
+            # if the same content was already parsed and checked, the result is taken from the cache:
+            texthash = content_hash(readfile)
+            cachedtimesdata = self.parsecache.get("times", texthash)
+            if cachedtimesdata is not None:
+                return cachedtimesdata
+
+            loadedtimesdata, self.parseerrors = parse_times(readfile.splitlines())
+            if len(self.parseerrors) > 0:
+                self.log_parseerrors(self.timesfile)
+                return False
+            elif loadedtimesdata is None:  # if the file contains no times (only comments, or nothing)
+                return default_changetimes  # (and not just {}, as it can bring problems later on because of KeyErrors)
+            self.parsecache.put("times", texthash, loadedtimesdata)
+            return loadedtimesdata
         else:  # if the file doesn't exist
-            writefile = open(timesfile, "x")  # "x" only creates a new file, if it doesn't already exist (whereas "w" would overwrite an existing file)
-            writefile.write("""# Add/Change here the times when the boiler should change his state\n# 1 stands for Monday, 2 for Tuesday etc.\n# Format-Bsp.:\n'''{1: {"06:30": "normal", "21:40": "reduziert"}, 2: {"06:30": "normal", "21:40": "reduziert"}, 
-    3: {"06:30": "normal", "21:40": "reduziert"}, 4: {"06:30": "normal", "21:40": "reduziert"}, 
-    5: {"06:30": "normal", "22:20": "reduziert"}, 6: {"07:30": "normal", "22:20": "reduziert"}, 
-    7: {"07:30": "normal", "21:40": "reduziert"}}'''""")
+            writefile = open(self.timesfile, "x")  # "x" only creates a new file, if it doesn't already exist (whereas "w" would overwrite an existing file)
+            writefile.write("""# Add/Change here the times when the boiler should change his state (one change per line):
+# <weekday> <HH:MM> <normal/reduziert> - 1 stands for Monday, 2 for Tuesday etc. (several days: 1-5 or 1,3,5)
+# Format-Bsp.:
+# 1-4 06:30 normal
+# 1-4 21:40 reduziert
+# 5 06:30 normal
+# 5-6 22:20 reduziert
+# 6-7 07:30 normal
+# 7 21:40 reduziert
+""")
             writefile.close()
             if testerei == False and onlyerrorlog == False:
-                actionlogger.info(f"Datei fier Zäiten-Daten {timesfile} ugeluet")
+                self.actionlogger.info(f"Datei fier Zäiten-Daten {self.timesfile} ugeluet")
             return default_changetimes
 
     def load_urlaubdata(self):
         """loads the dates and times for holiday from an external file. So the holiday-times can be edited in the file and
         loaded into the program during the runtime of the app.
-        The file should only contain 1 dictionary (one line of relevant data, besides of the comments/format example).
+        The file is read in one pass (see scheduleparser), in the line format ("2024-11-13 10:00 urlaub") or in the
+        old format (one dictionary). All the problems found in the file are saved (with line and column) in parseerrors.
         Returns either a dictionary (with data or empty), or False.
         (the file contents are not checked for coherence, for example the holiday-end could lie earlier than the start)"""
-
+        self.parseerrors = []
         # check if the file exists:
-        if os.path.exists(urlaubfile):
-            with open(urlaubfile, "r") as readurlaubfile:
+        if os.path.exists(self.urlaubfile):
+            with open(self.urlaubfile, "r") as readurlaubfile:
                 readfile = readurlaubfile.read()
-                # extract the holiday-dictionary from the file (ignore the lines preceeded by a hashtag, as they are comments):
-                cleanedurlaubfile = re.sub(r'#.*', '', readfile)  # Remove single-line comments
-                cleanedurlaubfile = re.sub(r"\s*\n\s*\n\s*", '', cleanedurlaubfile)  # remove whitespaces etc
-                if len(cleanedurlaubfile) == 0:
-                    logging.debug("urlaub-file is empty")
-                    if testerei == False:
-                        errorlogger.error("urlaub-Datei as eidel - keng Vakanz agin")
-                    return {}
-                else: # len(cleanedurlaubfile) != 0:
-                    # make a dictionary from the dict-like string in the file:
-                    try:
-                        urlaubdict = ast.literal_eval(cleanedurlaubfile)
-                    except (SyntaxError, ValueError):  # if the string in the file has not the right format for a dict
-                        logging.exception("Problem with urlaubdata! (SyntaxError or ValueError)")
-                        if testerei == False:
-                            errorlogger.exception("Problem mam Format vun urlaubdata")
-                        return False
-                    except:
-                        logging.exception("Reached general except while reading holiday data!!")
-                        if testerei == False:
-                            errorlogger.exception("Allgemengen except agesprong beim Ausliesen vun urlaubdata!!")
-                        return False
-
-                    for singlekey in urlaubdict:
-                        # check the correctness of the values:
-                        if urlaubdict[singlekey] not in ["normal", "urlaub"]:
-                            logging.debug(f"The values of the urlaub-data have to be 'normal' or 'urlaub'!")
-                            if testerei == False:
-                                errorlogger.error(f"The values of the urlaub-data can only be 'normal' or 'urlaub', and not {urlaubdict[singlekey]}")
-                            return False
-                        # check the correctness of the date-formats:
-                        try:
-                            if len(singlekey) == 16:  # ensure date/time are in the correct format (and not for example 2025-1-29 4:30)
-                                datetime.strptime(singlekey, datetimeformat)
-                            else:
-                                raise
-                        except:
-                            logging.debug("There is a problem with the date format")
-                            if testerei == False:
-                                errorlogger.exception(f"There is a problem with the formatting of the date/time. It is: {singlekey} but should be: {datetimeformat}")
-                            return False
-                    return urlaubdict
+            texthash = content_hash(readfile)
+            cachedurlaubdict = self.parsecache.get("urlaub", texthash)
+            if cachedurlaubdict is not None:
+                return cachedurlaubdict
+
+            urlaubdict, self.parseerrors = parse_urlaub(readfile.splitlines())
+            if len(self.parseerrors) > 0:
+                self.log_parseerrors(self.urlaubfile)
+                return False
+            elif len(urlaubdict) == 0:
+                logging.debug("urlaub-file is empty")
+                if testerei == False:
+                    self.errorlogger.error("urlaub-Datei as eidel - keng Vakanz agin")
+                return {}
+            self.parsecache.put("urlaub", texthash, urlaubdict)
+            return urlaubdict
         else:
-            writefile = open(urlaubfile, 'x')  # create urlaub-file if it doesn't exists
+            writefile = open(self.urlaubfile, 'x')  # create urlaub-file if it doesn't exists
             # write a comment to the file:
-            writefile.write("# The format (for holiday on and off) should be: {'datum': 'urlaub', 'datum': 'normal'}\n# and the format for date and time 'YYYY-MM-DD HH:MM', z.B. 2024-11-12 13:41\n# Bsp: {'2024-11-13 10:00': 'urlaub', '2024-11-13 12:00': 'normal'}")
+            writefile.write("# The format (for holiday on and off) should be one change per line: <YYYY-MM-DD> <HH:MM> <urlaub/normal>\n# z.B. 2024-11-12 13:41\n# Bsp:\n# 2024-11-13 10:00 urlaub\n# 2024-11-13 12:00 normal\n")
             writefile.close()
             if testerei == False and onlyerrorlog == False:
-                actionlogger.info(f"Datei fier urlaubs-daten {urlaubfile} ugeluet")
+                self.actionlogger.info(f"Datei fier urlaubs-daten {self.urlaubfile} ugeluet")
             urlaubdict = {}
             return urlaubdict
 
+    def load_calendar(self, filename, kind):
+        """Loads an imported calendar (.ics, see icsimport), with the parse cache like the other data-files. The
+        problems found in the file are saved in parseerrors (the events with a problem are left out, the others are
+        used). Returns the IcsCalendar - empty if no file is configured or the file doesn't exist."""
+        self.parseerrors = []
+        if filename is None or not os.path.exists(filename):
+            return IcsCalendar(window_days=ics_windowdays)
+        with open(filename, "r", encoding="utf-8") as readcalendar:
+            readfile = readcalendar.read()
+        texthash = content_hash(readfile)
+        cachedevents = self.parsecache.get(kind, texthash)
+        if cachedevents is None:
+            events, self.parseerrors = parse_ics(readfile.splitlines())
+            cachedevents = {str(number): event for number, event in enumerate(events)}
+            if len(self.parseerrors) > 0:
+                self.log_parseerrors(filename)
+            else:  # (with problems, the file isn't cached, so that they are reported again at the next loading)
+                self.parsecache.put(kind, texthash, cachedevents)
+        return IcsCalendar(cachedevents.values(), window_days=ics_windowdays)
+
+    def log_parseerrors(self, filename):
+        """writes the problems found in a data-file to the log"""
+        logging.debug(f"problems in {filename}: " + "; ".join(str(error) for error in self.parseerrors))
+        if testerei == False:
+            self.errorlogger.error(f"Problemer an der Datei {filename}:\n" + "\n".join(str(error) for error in self.parseerrors))
+
     def read_timesstatus(self):
         """Checks what status it is (should be) based on the change-times and the current time, and returns it (or False,
         if the changetimes for today have just 0 or 1 element)."""
 
-        # create a sorted list of the keys (times of the day) from the change_times dict to get the sequence of the change-times (z.B. ['06:45', '22:15']):
-        self.changetimes_list = sorted([key for key in self.changetimes_today])
-        if len(self.changetimes_list) > 1: # (time-strings can be compared with < and >)
-            if self.zeit < self.changetimes_list[0] or self.zeit > self.changetimes_list[-1]:  # if it lies before the first or after the last changetime
-                # (if the current time is smaller/earlier than the lowest, the status has to be the one from the night (stated by
-                #   the last index in the sorted list) - presuming the status is the same for the night on every weekday)
-                status_tobe = self.changetimes_today[self.changetimes_list[-1]]
-            else:
-                # loop through changetimes_list and find the first value that is greater than the current time, then chose the status of the value that lies before:
-                for i in range(len(self.changetimes_list)):
-                    if self.zeit < self.changetimes_list[i]:  # changetimes_list[i] refers to the key/status-values in the dictionary
-                        # the needed heating-status is the one that lies before the chosen/greater time:
-                        assigned_time = self.changetimes_list[i-1]
-                        status_tobe = self.changetimes_today[assigned_time]  # find the corresponding status in the dict
-                        break # otherwise the last corresponding time would be chosen instead of the first (if more than one corresponds)
-                    elif self.zeit == self.changetimes_list[i]:
-                        # if the current time is exactly the time where the status should change
-                        assigned_time = self.changetimes_list[i]
-                        status_tobe = self.changetimes_today[assigned_time]
+        # (the index answers with a binary search which change lies at or before the current time - if the current
+        #   time is earlier than the first change-time, the status has to be the one from the night (the last change-time
+        #   of the day) - presuming the status is the same for the night on every weekday)
+        if len(self.today_index) > 1:
+            status_tobe = self.today_index.state_at(to_minutes(self.zeit))
             return status_tobe
         else:
-            logging.debug("The changetimes_list for today has 1 or fewer entries, the status can't be determined!")
+            logging.debug("The changetimes for today have 1 or fewer entries, the status can't be determined!")
             if testerei == False:
-                errorlogger.error("changetimes_list fier haut huet maximal 1 Antrag! - et sin also keng normal Heizungs-Zäiten agedro (an den Start-status as net ermettelbar)")
+                self.errorlogger.error("changetimes fier haut hun maximal 1 Antrag! - et sin also keng normal Heizungs-Zäiten agedro (an den Start-status as net ermettelbar)")
             return False
 
+    def refresh_todayindex(self):
+        """Refreshes the sorted index of the changing-times of today. Has to be called every time changetimes_today
+        is changed (the index of the weekday is reused if the times of today are the standard ones)."""
+        self.today_index = self.times_index.day_index(self.weekday, self.changetimes_today)
+
     def refresh_heiz_time(self):
         self.zeit = datetime.now().strftime('%H:%M')
 
@@ -447,11 +846,70 @@ class Heizung():
         It returns either False or a dictionary (empty or with data)"""
         urlaub_request = self.load_urlaubdata()  # gets a dict (empty or with data) or False
         if urlaub_request == False:
-            self.urlaub_times = {}
+            self.set_urlaubtimes({})  # (only the vacations of the vacation calendar)
             return False
         else:  # urlaub_request is {} or a normal dict
-            self.urlaub_times = urlaub_request
-            return urlaub_request
+            self.set_urlaubtimes(urlaub_request)
+            return self.urlaub_times
+
+    def set_urlaubtimes(self, urlaubdict, compact=True):
+        """Builds the index of the holiday-times from the (loaded) dictionary - with the vacations of the vacation
+        calendar of the next ics_windowdays days merged in -, and removes the vacations that are already over (from the
+        index, and from the file if urlaub_compactfile is True). urlaub_times is set to the remaining holiday-times,
+        urlaub_filetimes to the ones of the file. With compact=False, the vacations that are over are kept."""
+        self.urlaub_filetimes = urlaubdict
+        if len(self.vacation_calendar) > 0:
+            since = self.last_evaluated
+            urlaubdict = merge_vacations(urlaubdict, self.vacation_calendar.intervals(since, since + timedelta(days=ics_windowdays)))
+        self.urlaub_index.rebuild(urlaubdict)
+        if compact:
+            self.compact_urlaub()
+        else:
+            self.urlaub_times = self.urlaub_index.as_dict()
+
+    def compact_urlaub(self):
+        """Removes the vacations that are over from the index of the holiday-times (and from the file, if
+        urlaub_compactfile is True).
+        Only the changes before the last checked minute (last_evaluated) are removed, not the ones up to now: a change
+        after it wasn't seen by a check yet (z.B. a vacation that ended while the program was stopped, or during a
+        check that catches up over midnight), it still has to be carried out."""
+        checked = self.last_evaluated
+        removed = self.urlaub_index.compact(checked)
+        self.urlaub_times = self.urlaub_index.as_dict()
+        if removed > 0:
+            logging.debug(f"{removed} past holiday-times removed, urlaub_times is now: {self.urlaub_times}")
+            # (the file only gets its own holiday-times back, not the vacations of the calendar)
+            fileindex = UrlaubIndex(self.urlaub_filetimes)
+            removed = fileindex.compact(checked)
+            self.urlaub_filetimes = fileindex.as_dict()
+            if removed > 0 and urlaub_compactfile == True and os.path.exists(self.urlaubfile):
+                try:
+                    compact_urlaubfile(self.urlaubfile, self.urlaub_filetimes)
+                except OSError:
+                    logging.exception("Problem while compacting the urlaub-file")
+                    if testerei == False:
+                        self.errorlogger.exception("Problem beim Opraumen vun der urlaub-Datei")
+                    return
+                if testerei == False and onlyerrorlog == False:
+                    self.actionlogger.info(f"{removed} al Vakanzen aus der Datei {self.urlaubfile} geläscht")
+
+    def refresh_calendar(self, filename):
+        """Loads an imported calendar again (z.B. when the file was changed), and applies it: the vacations of the vacation
+        calendar are merged into the holiday-times again, and with the holiday calendar, tomorrow-holiday is activated if
+        tomorrow is a holiday. Returns False if there were problems in the file (the other events are used anyway),
+        otherwise the number of events."""
+        if self.holidayfile is not None and os.path.basename(filename) == os.path.basename(self.holidayfile):
+            self.holiday_calendar = loaded = self.load_calendar(self.holidayfile, "ics_holidays")
+            self.apply_holidaycalendar(self.last_evaluated.date())
+        else:
+            self.vacation_calendar = loaded = self.load_calendar(self.vacationfile, "ics_vacations")
+            self.set_urlaubtimes(self.urlaub_filetimes)
+        logging.debug(f"calendar {filename} loaded: {len(loaded)} events, problems: {self.parseerrors}")
+        if testerei == False and onlyerrorlog == False:
+            self.actionlogger.info(f"Kalenner {filename} ragelueden: {len(loaded)} Evenementer")
+        if len(self.parseerrors) > 0:
+            return False
+        return len(loaded)
 
     def refresh_changetimes(self):
         """Refreshes the attributes change_times and changetimes_today.
@@ -469,29 +927,35 @@ class Heizung():
                 # ensure that there exists at least an empty dict, to avoid tracebacks because of KeyErrors:
                 self.change_times = copy.deepcopy(default_changetimes)
                 self.changetimes_today = copy.deepcopy(self.change_times[self.weekday])
+                self.times_index.rebuild(self.change_times)
+                self.refresh_todayindex()
                 #logging.debug(f"self.changetimes_today for today: {self.changetimes_today}")
                 return False
             elif times_request == default_changetimes:  # the "empty" (nested) dict default_changetimes
                 if testerei == False:
-                    errorlogger.error("timesdata as eidel")
+                    self.errorlogger.error("timesdata as eidel")
                 return "empty"
             else:  # times_request is a normal dict
                 self.change_times = times_request
                 self.changetimes_today = copy.deepcopy(self.change_times[self.weekday])
+                # (only the days whose times changed are re-indexed)
+                rebuilt_days = self.times_index.rebuild(self.change_times)
+                self.refresh_todayindex()
+                logging.debug(f"re-indexed weekdays: {rebuilt_days}")
                 #logging.debug(f"self.changetimes_today for today: {self.changetimes_today}")
                 logging.debug(f"timesdata loaded. timesdata returns: {times_request}.\n change_times is now: {self.change_times}")
                 if testerei == False and onlyerrorlog == False:
-                    actionlogger.info(f"timesdata ragelueden.\n change_times as lo: {self.change_times}")
+                    self.actionlogger.info(f"timesdata ragelueden.\n change_times as lo: {self.change_times}")
 
                 # define what status it has to be according to the times-file, and adjust it if needed:
                 status_tobe = self.read_timesstatus()
-                if self.status == "normal" and status_tobe == "reduziert":
+                if self.desired_status == "normal" and status_tobe == "reduziert":
                     if testerei == False and onlyerrorlog == False:
-                        actionlogger.info("automatesch Status-Upassung decideiert (weinst Zäiten-Aktualiseirung)")
+                        self.actionlogger.info("automatesch Status-Upassung decideiert (weinst Zäiten-Aktualiseirung)")
                     return "reduce now"
-                elif self.status == "reduziert" and status_tobe == "normal":
+                elif self.desired_status == "reduziert" and status_tobe == "normal":
                     if testerei == False and onlyerrorlog == False:
-                        actionlogger.info("automatesch Status-Upassung decideiert (weinst Zäiten-Aktualiseirung)")
+                        self.actionlogger.info("automatesch Status-Upassung decideiert (weinst Zäiten-Aktualiseirung)")
                     return "raise now"
                 elif self.status == "none":
                     # when status is 'none' (for ex. because there where no valid changing-times while starting the app),
@@ -500,7 +964,7 @@ class Heizung():
                     #   and restarting the app).
                     logging.debug("The status is 'none' - so the current target status cannot be determined/set!")
                     if testerei == False:
-                        errorlogger.error("Den Heizungsstatus as 'none' - deen aktuellen soll-status kann also net ermettelt/agestallt gin!")
+                        self.errorlogger.error("Den Heizungsstatus as 'none' - deen aktuellen soll-status kann also net ermettelt/agestallt gin!")
                     return "status was none"
 
                 return True
@@ -508,117 +972,354 @@ class Heizung():
         else:
             logging.debug("tomorrow-holiday is active - timesdata cannot be loaded")
             if testerei == False and onlyerrorlog == False:
-                actionlogger.info(f"D'Zäiten konnten net agelies gin, well muar-Feierdag aktiv as.")
+                self.actionlogger.info(f"D'Zäiten konnten net agelies gin, well muar-Feierdag aktiv as.")
             return "muar-Feierdag"
 
 
+    def preconnect_robot(self):
+        """Opens the connection to the robot a few seconds (preconnect_seconds) before a scheduled change (change-time or
+        holiday-time), so that the change itself doesn't lose time with connecting.
+        The connection is opened in a separate thread, to not block the caller while the robot is unreachable."""
+        now = datetime.now()
+        if now.second < 60 - preconnect_seconds:
+            return
+        nextminute = now + timedelta(minutes=1)
+        if nextminute.strftime(datetimeformat) == self.preconnected_for:  # already done for this change
+            return
+        if nextminute.strftime(timeformat) in self.changetimes_today or self.urlaub_index.get(nextminute) is not None:
+            self.preconnected_for = nextminute.strftime(datetimeformat)
+            logging.debug(f"change ahead at {self.preconnected_for} - opening the robot connection in advance")
+            threading.Thread(target=self.myrobot.preconnect, daemon=True).start()
+
+    def timeline(self, now=None):
+        """Returns the timeline of the effective changes from now on (see heiztimeline), for the current data and the
+        desired state - z.B. timeline().next_transitions(3), or timeline().state_at(moment)."""
+        if now is None:
+            now = datetime.now()
+        return Timeline(now.replace(second=0, microsecond=0), self.desired_status, self.times_index,
+                        self.last_evaluated.date(), self.today_index, self.urlaub_index,
+                        self.newmorningtime if self.tomorrowholiday_on else None)
+
+    def next_check_time(self, now=None):
+        """Computes the moment when the next time-related check is due: the first change of the timeline (the next
+        change-time or holiday-time that changes the state), the midnight-change or the retry of a robot action that
+        failed, whichever comes first.
+        So the caller doesn't have to check every second, but can sleep until this moment (z.B. during a vacation, the
+        change-times don't wake it up). The result has to be recomputed when the data, the changing-times of today or
+        the desired state change (loading the files, longer-warm, tomorrow-holiday, the buttons)."""
+        if now is None:
+            now = datetime.now()
+        currentminute = now.replace(second=0, microsecond=0)
+        # the midnight-change (refresh of the weekday etc.):
+        nextcheck = currentminute.replace(hour=0, minute=0) + timedelta(days=1)
+        # the next change of the state (not further than to the midnight-change):
+        for transition in self.timeline(currentminute).transitions(nextcheck):
+            nextcheck = transition.moment
+            break
+        # the retry of a robot action (if the robot couldn't be reached):
+        if self.reconcile_retry_at is not None:
+            nextcheck = min(nextcheck, self.reconcile_retry_at)
+        self.nextcheck = nextcheck
+        return nextcheck
+
+    def seconds_until_next_check(self):
+        """Returns the seconds the caller can sleep before the next check: until the next due change (see
+        next_check_time), or preconnect_seconds before it (to open the robot connection in advance). To notice
+        changes of the system clock, it never sleeps longer than scheduler_maxsleep."""
+        now = datetime.now()
+        nextcheck = self.next_check_time(now)
+        wakeup = nextcheck - timedelta(seconds=preconnect_seconds)
+        if wakeup <= now:
+            wakeup = nextcheck
+        return min(max((wakeup - now).total_seconds(), 0), scheduler_maxsleep)
+
     def check_heiz_statusandactions(self):
-        """called regularly by the kivy-scheduler to check if the status label in the GUI has to be refreshed, and
-        additionally checks if any time-related action has to be taken. If it is the moment to automatically
-        change the boiler to another state, the corresponding methods are called."""
-
-        # if shortly after midnight, refresh the weekday and other attributes:
-        if self.zeit == "00:01":
-            if self.weekday != datetime.now().isoweekday():  # ensure the midnight-change is executed only once per day (and not as often as the method is called while it's "00:01"):
-                self.longerwarm_on = False
-                self.weekday = datetime.now().isoweekday()  # refresh for the new day
-                self.changetimes_today = copy.deepcopy(self.change_times[self.weekday])  # new changing times for the new day
-                if self.tomorrowholiday_on == True:  # if the new day is a holiday, its first change-time is reset to the raise-time of Saturday
-                    if testerei == False and onlyerrorlog == False:
-                        actionlogger.info("Den Dag haut huet Feierdags-Zäiten")
-                    self.changetimes_list = sorted([x for x in self.changetimes_today])
-                    oldmorning = self.changetimes_list[0]
-                    self.changetimes_today.pop(oldmorning)  # delete the old morning change-time from the dict
-                    self.changetimes_today[self.newmorningtime] = "normal"  # add the new morning data to the dict
-                    self.newmorningtime = None  # reset the helper variables
-                    self.tomorrowholiday_on = False
-                logging.debug(f"changetimes_today for weekday {self.weekday}: {self.changetimes_today}, status: {self.status}, longerwarm_on: {self.longerwarm_on}")
-                if testerei == False and onlyerrorlog == False:
-                    actionlogger.info(f"changetimes_today for weekday {self.weekday}: {self.changetimes_today}, status: {self.status}, longerwarm_on: {self.longerwarm_on}")
-
-        # CHECK HOLIDAY:
-        # if the current date and time are in the dictionary of the holiday settings, the status has to be changed to "urlaub" (or back to "normal"):
-        current_datetime = datetime.now().strftime(datetimeformat)
-        if current_datetime in self.urlaub_times and self.alreadyrun_holiday == False:
-            urlaub_changeto = self.urlaub_times[current_datetime]  # "urlaub" or "normal"
-            #logging.debug("variable urlaub_changeto has been created")
-            #logging.debug(f"change_to: {urlaub_changeto}")
-            self.alreadyrun_holiday = True  # mark that the change runs for the first time, to avoid repetitions
-            # ensure that the status hasn't been already reset:
-            if (urlaub_changeto == "urlaub" and self.status == "normal") or (urlaub_changeto == "urlaub" and self.status == "reduziert"):
-                if testerei == False and onlyerrorlog == False:
-                    actionlogger.info("Automatesch Aktioun (Vakanz aschalten) decidéiert")
-                response_urlaub_on = self.turn_vacation_on()
-                return response_urlaub_on
-            elif urlaub_changeto == "urlaub" and self.status == "none":
-                if testerei == False:
-                    errorlogger.error("De status war 'none', wéi urlaub hätt sollen agestallt gin!")
-                return False
-            elif urlaub_changeto == "normal" and self.status == "urlaub":  # ensure that the status hasn't been already reset
-                if testerei == False and onlyerrorlog == False:
-                    actionlogger.info("Automatesch Aktioun (vakanz ausschalten) decidéiert")
-                response_urlaub_off = self.turn_vacation_off()
-                return response_urlaub_off
-            else: # (none of the status values that exist at the moment. Also "none", when changing-times are missing)
-                logging.debug("status was probably 'none', or a new status-value was added without changing the code appropriately - The 'else' was started during check holiday in check_heiz_statusandactions()")
-                if testerei == False:
-                    errorlogger.error(f"Status war wuel 'none' beim urlaub-ofchecken? Oder du hues een status bäigemat ouni de Code unzepassen? (else agesprong beim urlaub-ofchecken, an der check_heiz_statusandactions) / urlaub_changeto as: {urlaub_changeto}, status as: {self.status}")
-                return False
-        # reset the helper variable self.alreadyrun_holiday as soon as it isn't needed anymore (when the time/minute has changed):
-        if self.alreadyrun_holiday == True and current_datetime not in self.urlaub_times:
-            # (this handling could be a problem if there are 2 consecutive times in the list - this isn't covered because such a use would make no sense)
-            self.alreadyrun_holiday = False
-
-        # CHECK CHANGE-TIMES:
-        # if the current time is present in the dictionary of time changes, we have to change to the corresponding state:
-        if self.status != "urlaub":  # during holiday, these changes have to be blocked
-            if self.zeit in self.changetimes_today and self.alreadyrun_times == False:
-                change_to = self.changetimes_today[self.zeit]  # check what state is needed according to the dict
-                #logging.debug("variable change_to as ugelued gin")
-                #logging.debug(f"change_to: {change_to}")
-                self.alreadyrun_times = True # mark that the change runs for the first time, to avoid repetitions
-                if change_to == "reduziert":
-                    #self.reduce_now()  # if the command reduce_now is called from here, it works, but there is no "please wait"-popup
-                    if testerei  == False and onlyerrorlog == False:
-                        actionlogger.info("Automatesch Aktioun (reduce now) decidéiert")
-                    return "reduce now"  # this return passes the command through to the class KivyGui, and triggers the appropriate button there
-                elif change_to == "normal":
-                    #self.raise_now()
-                    if testerei  == False and onlyerrorlog == False:
-                        actionlogger.info("Automatesch Aktioun (raise now) decidéiert")
-                    return "raise now"
-                else: # (none of the status values that exist at the moment)
+        """called by the kivy-scheduler (at the moments computed by next_check_time) to check if the status label in
+        the GUI has to be refreshed, and additionally checks if any time-related action has to be taken.
+
+        All the changes that were due since the last check are taken into account (not only the ones of the current
+        minute) - so no change gets lost when a check is missed (a robot command that runs over a minute boundary, a
+        clock that jumps, a midnight that was skipped). The changes are collapsed to the state that is needed at the
+        end, which is set as desired state (see request_status). If the robot has to take an action, "reconcile" is
+        returned (the caller lets reconcile() carry it out, so that the robot doesn't block the GUI). Returns False if
+        there was a problem, otherwise None."""
+
+        # open the connection to the robot in advance if a change is due in the next minute:
+        self.preconnect_robot()
+
+        # a robot action that failed because the robot couldn't be reached is tried again:
+        if self.reconcile_retry_at is not None and datetime.now() >= self.reconcile_retry_at:
+            self.reconcile_retry_at = None
+            if self.status != self.desired_status:
+                return "reconcile"
+
+        if zeiten_testerei == True:  # (the time is faked with self.zeit, the date is counted on when the time goes over midnight)
+            currentminute = datetime.combine(self.last_evaluated.date(), datetime.strptime(self.zeit, timeformat).time())
+            if currentminute < self.last_evaluated:
+                currentminute += timedelta(days=1)
+        else:
+            currentminute = datetime.now().replace(second=0, microsecond=0)
+        if currentminute <= self.last_evaluated:
+            return None  # (this minute was already checked)
+
+        due_changes = self.due_transitions(currentminute)
+        if len(due_changes) == 0:
+            return None
+        if zeiten_testerei == False:
+            checktime = datetime.now()
+            for changemoment, kind, change_to in due_changes:
+                metrics.observe("heiz_scheduler_lag_seconds", (checktime - changemoment).total_seconds())
+        if len(due_changes) > 1:
+            logging.debug(f"{len(due_changes)} changes were due since the last check: {due_changes}")
+            if testerei == False and onlyerrorlog == False:
+                self.actionlogger.info(f"{len(due_changes)} Ännerungen waren zanter dem leschten Check fälleg: {due_changes}")
+
+        # collapse the due changes to the state that is needed at the end:
+        #   (during holiday, the changes of the change-times are blocked)
+        state_tobe = self.desired_status
+        for changemoment, kind, change_to in due_changes:
+            if kind == "urlaub":
+                if change_to == "urlaub" and self.status == "none":
+                    if testerei == False:
+                        self.errorlogger.error("De status war 'none', wéi urlaub hätt sollen agestallt gin!")
+                    return False
+                elif change_to == "urlaub":
+                    state_tobe = "urlaub"
+                elif change_to == "normal" and state_tobe == "urlaub":
+                    state_tobe = "normal"
+            elif state_tobe != "urlaub":  # kind == "times"
+                if change_to not in ["reduziert", "normal"]:  # (none of the status values that exist at the moment)
                     logging.debug("The 'else' was started during check change-times in check_heiz_statusandactions(). Maybe a new status-value was added without changing the code appropriately??")
                     if testerei == False:
-                        errorlogger.error(f"Du hues wuel een status bäigemat ouni de Code unzepassen? (else agesprong beim times-ofchecken, an der check_heiz_statusandactions) / change_to as: {change_to}, status as: {self.status}")
+                        self.errorlogger.error(f"Du hues wuel een status bäigemat ouni de Code unzepassen? (else agesprong beim times-ofchecken, an der check_heiz_statusandactions) / change_to as: {change_to}, status as: {self.status}")
                     return False
-        # reset the helper variable self.alreadyrun_times as soon as it isn't needed anymore (when the time/minute has changed)
-        if self.alreadyrun_times == True and self.zeit not in self.changetimes_today:
-            # (this handling could be a problem if there are 2 consecutive times in the list - this isn't covered because such a use would make no sense)
-            self.alreadyrun_times = False
+                state_tobe = change_to
+
+        # set the state that is needed (the status 'none' is treated like before: the robot is started with the needed direction):
+        if state_tobe == self.desired_status:
+            return None
+        if testerei  == False and onlyerrorlog == False:
+            self.actionlogger.info(f"Automatesch Aktioun decidéiert: {self.desired_status} -> {state_tobe}")
+        self.request_status(state_tobe)
+        return "reconcile"  # this return passes the command through to the class KivyGui, which lets reconcile() carry it out
+
+    def due_transitions(self, currentminute):
+        """Returns all the changes that were due after the last check (self.last_evaluated) and up to (including) the
+        current minute, sorted by time: a list of (datetime, kind, change_to), where kind is "urlaub" (holiday-times) or
+        "times" (change-times). If midnight was passed in the meantime, the midnight-change is carried out on the way
+        (for every new day), so that the change-times of the right day are used.
+        self.last_evaluated is set to the current minute."""
+        due_changes = []
+        # (the holiday-changes are taken before the midnight-changes, which remove the vacations that are over)
+        for urlaubtime, change_to in self.urlaub_index.changes_between(self.last_evaluated, currentminute):
+            due_changes.append((datetime.strptime(urlaubtime, datetimeformat), "urlaub", change_to))
+        day = self.last_evaluated.date()
+        fromminute = self.last_evaluated.hour * 60 + self.last_evaluated.minute  # (the changes of this minute were already checked)
+        while True:
+            if day == currentminute.date():
+                tominute = currentminute.hour * 60 + currentminute.minute
+            else:
+                tominute = 24 * 60 - 1
+            for changetime, change_to in self.today_index.transitions_between(fromminute, tominute):
+                changemoment = datetime.combine(day, datetime.strptime(changetime, timeformat).time())
+                due_changes.append((changemoment, "times", change_to))
+            if day >= currentminute.date():
+                break
+            day += timedelta(days=1)
+            self.midnight_change(day)
+            fromminute = -1  # (the changes at 00:00 of the new day are due too)
+
+        self.last_evaluated = currentminute
+        self.save_state("check")
+        # (at the same minute, the holiday-change comes before the change-time)
+        due_changes.sort(key=lambda change: (change[0], change[1] != "urlaub"))
+        return due_changes
+
+    def midnight_change(self, newday):
+        """Refreshes the weekday and the other attributes for the new day (called by due_transitions when midnight was
+        passed)."""
+        self.longerwarm_on = False
+        self.weekday = newday.isoweekday()  # refresh for the new day
+        self.changetimes_today = copy.deepcopy(self.change_times[self.weekday])  # new changing times for the new day
+        self.refresh_todayindex()
+        if len(self.vacation_calendar) > 0:
+            self.set_urlaubtimes(self.urlaub_filetimes)  # the window of the vacation calendar moves on (and the vacations that ended are removed)
+        else:
+            self.compact_urlaub()  # the vacations that ended are of no more use
+        if self.tomorrowholiday_on == True:  # if the new day is a holiday, its first change-time is reset to the raise-time of Saturday
+            if testerei == False and onlyerrorlog == False:
+                self.actionlogger.info("Den Dag haut huet Feierdags-Zäiten")
+            oldmorning = self.today_index.first()[0]
+            self.changetimes_today.pop(oldmorning)  # delete the old morning change-time from the dict
+            self.changetimes_today[self.newmorningtime] = "normal"  # add the new morning data to the dict
+            self.refresh_todayindex()
+            self.newmorningtime = None  # reset the helper variables
+            self.tomorrowholiday_on = False
+        self.apply_holidaycalendar(newday)  # (if the day after the new day is an imported holiday)
+        logging.debug(f"changetimes_today for weekday {self.weekday}: {self.changetimes_today}, status: {self.status}, longerwarm_on: {self.longerwarm_on}")
+        if testerei == False and onlyerrorlog == False:
+            self.actionlogger.info(f"changetimes_today for weekday {self.weekday}: {self.changetimes_today}, status: {self.status}, longerwarm_on: {self.longerwarm_on}")
 
 
+    def request_status(self, status_tobe):
+        """Sets the state the boiler should have ("normal", "reduziert" or "urlaub"). The robot isn't called here: the
+        robot actions are carried out by reconcile(), which brings the boiler from its state to the desired state.
+        So requests that come in while the robot is busy (from the buttons, the change-times or the holiday-times) are
+        collapsed: only the last desired state counts, and a raise followed by a reduce costs no robot action at all.
+        Returns True if the desired state changed, otherwise "Näischt gemat"."""
+        with self.statelock:
+            if status_tobe == self.desired_status:
+                return "Näischt gemat"
+            logging.debug(f"desired status: {self.desired_status} -> {status_tobe} (status is {self.status})")
+            if testerei == False and onlyerrorlog == False:
+                self.actionlogger.info(f"Gewënschte status: {self.desired_status} -> {status_tobe} (status as {self.status})")
+            self.desired_status = status_tobe
+            self.save_state("desired_status")
+            return True
+
+    def request_raise(self):
+        """Requests the raising to normal (see request_status), if it isn't already requested and it's not during
+        holiday. Returns True if the desired state changed or the robot has to take an action, otherwise "Näischt gemat".
+        (The desired state can change while the believed state is already the new one - z.B. a reduce during a raise
+        that is still running: the robot has to change the boiler back afterwards, so the caller has to reconcile.)"""
+        changed = False
+        if self.desired_status != "normal" and self.desired_status != "urlaub":
+            changed = self.request_status("normal") == True
+        if not changed and (self.desired_status == "urlaub" or self.status == self.desired_status):
+            logging.debug("The boiler was already raised or 'urlaub'/holiday is on")
+            if testerei == False and onlyerrorlog == False:
+                self.actionlogger.info("Näischt gemat - war schon rop (oder 'urlaub' as an)")
+            return "Näischt gemat"
+        return True
+
+    def request_reduce(self):
+        """Requests the reducing (see request_status), if it isn't already requested and it's not during holiday.
+        Returns True if the desired state changed or the robot has to take an action, otherwise "Näischt gemat" (see
+        request_raise)."""
+        changed = False
+        if self.desired_status != "reduziert" and self.desired_status != "urlaub":  # (like desired_status == normal, but works also if there would be more than 3 status-values)
+            changed = self.request_status("reduziert") == True
+        if not changed and (self.desired_status == "urlaub" or self.status == self.desired_status):
+            logging.debug("The status 'reduziert' was already on, or the status was 'urlaub'")
+            if testerei == False and onlyerrorlog == False:
+                self.actionlogger.info("Näischt gemat - war schon 'reduziert' (oder de status war 'urlaub')")
+            return "Näischt gemat"
+        return True
+
+    def reconcile_plan(self):
+        """Returns the robot commands (messages) needed to bring the boiler from its (believed) state to the desired
+        state, as list of (message, status_after) - status_after is the state of the boiler after this command.
+        With compile_sequences, it's one command computed for the tracked screen (see boilermenu)."""
+        if compile_sequences == True:
+            message = self.menu.message_to(self.status, self.desired_status)
+            if message is not None:
+                return [(message, self.desired_status)]
+        if self.desired_status == "urlaub":
+            return [(urlaubon_message, "urlaub")]
+        elif self.status == "urlaub":
+            # turning the vacation off sets 'länger warm' (normal) - to reach 'reduziert', the toggle follows:
+            if self.desired_status == "reduziert":
+                return [(urlauboff_message, "normal"), (toggle_message, "reduziert")]
+            return [(urlauboff_message, "normal")]
+        else:
+            # "normal" <-> "reduziert" is the same toggle ('länger warm' on/off) in both directions (and with the status
+            #   'none' the robot is started with the needed direction, like before)
+            return [(toggle_message, self.desired_status)]
+
+    def reconcile(self):
+        """Carries out the robot commands needed to bring the boiler from its (believed) state to the desired state,
+        until both states match (the desired state may change while the robot is busy - the following commands then go
+        to the new desired state). The commands of one plan (z.B. vacation off and reduce) are sent as one batch, and
+        the status is updated with every echo.
+        If the robot can't be reached (the message didn't reach it), the command is repeated reconcile_retries times,
+        and after that the next check tries again (after reconcile_retryinterval seconds). If the robot doesn't answer
+        correctly, it's unknown if the buttons were pressed - then the command isn't repeated (the desired state is
+        reset to the believed one), to not toggle the boiler into the wrong direction. A desired state that was
+        requested in the meantime isn't reset, it's carried out by the next check.
+        Runs in the worker thread of the executor: the state is changed with statelock (see request_status).
+        Returns the answer of the last robot command (True if everything worked), or "Näischt gemat"."""
+        logging.debug("method reconcile activated")
+        self.reconcile_retry_at = None
+        robot_action = "Näischt gemat"
+        attempts = 0
+        reconcilestart = time.perf_counter()
+
+        def acknowledged(position, message, answer):
+            """called by the robot for every echo of the batch"""
+            logging.debug(f"self.myrobot.send_batch: {message} returned {answer}")
+            if testerei == False and onlyerrorlog == False:
+                self.actionlogger.info(f"De Roboter get zréck: {answer}")
+            if answer == True:
+                self.menu.pressed(message, self.status)
+                with self.statelock:
+                    self.status = plan[position][1]
+                    logging.debug(f"The status is now: {self.status}")
+                    if testerei == False and onlyerrorlog == False:
+                        self.actionlogger.info(f"De status as lo: {self.status}")
+                    # ensure that "longer-warm" cannot be active when the status was reduced, because it wouldn't make any sense:
+                    if self.status == "reduziert":
+                        self.longerwarm_on = False
+                    self.save_state(f"robot: {message}")
+            else:  # (it's unknown which buttons were pressed)
+                self.menu.lost()
+
+        while self.status != self.desired_status:
+            with self.statelock:
+                plan = self.reconcile_plan()
+                planned_status = self.desired_status  # (the desired state the plan was made for)
+            answers = self.myrobot.send_batch([message for message, status_after in plan], on_ack=acknowledged)
+            # (the first answer that isn't True is the problem - the following commands weren't carried out)
+            robot_action = next((answer for answer in answers if answer != True), True)
+            if robot_action == True:
+                attempts = 0
+            elif robot_action in robot_notsent and attempts < reconcile_retries and robot_action != robot_unreachable:
+                attempts += 1
+                logging.debug(f"robot not reachable, attempt {attempts} of {reconcile_retries} in {reconcile_retrydelay} s")
+                time.sleep(reconcile_retrydelay)
+            elif robot_action in robot_notsent:
+                self.reconcile_retry_at = datetime.now() + timedelta(seconds=reconcile_retryinterval)
+                if testerei == False:
+                    self.errorlogger.error(f"De Roboter as net erreechbar ({robot_action}) - nach eng Kéier ëm {self.reconcile_retry_at.strftime(timeformat)}")
+                break
+            else:
+                with self.statelock:
+                    if self.desired_status == planned_status:
+                        if testerei == False:
+                            self.errorlogger.error(f"De Roboter huet net richteg geäntwert ({robot_action}) - de status bleift {self.status}")
+                        self.desired_status = self.status
+                        self.save_state("reconcile failed")
+                    else:  # (a button or a change-time requested another state while the robot was busy)
+                        if testerei == False:
+                            self.errorlogger.error(f"De Roboter huet net richteg geäntwert ({robot_action}) - de gewënschte status {self.desired_status} gëtt beim nächste Check gemat")
+                        self.reconcile_retry_at = datetime.now()
+                break
+        if robot_action != "Näischt gemat":
+            metrics.observe("heiz_reconcile_seconds", time.perf_counter() - reconcilestart)
+            if robot_action == True:
+                metrics.inc("heiz_reconcile_total", result="ok")
+            elif robot_action in robot_notsent:
+                metrics.inc("heiz_reconcile_total", result="retry_later")
+            else:
+                metrics.inc("heiz_reconcile_total", result="failed")
+        return robot_action
+
     def turn_vacation_on(self):
         """Turns vacation mode on by selecting the boiler mode 'Heizkreis aus' which sets the boiler to a frost protection state.
         It assumes that there is only one 'Heizkreis' (heating circuit) used.
         Returns a string to be displayed in the GUI."""
         logging.debug("method turn_vacation_on activated")
         if testerei == False and onlyerrorlog == False:
-            actionlogger.info("Heizungsmethod turn_vacation_on agesprong")
-        urlaub_message = "1 3 3 4 4 4 3 4 4."
-        robotaction = self.myrobot.send_message(urlaub_message)
-        logging.debug(f"self.myrobot.send_message(urlaub_message) returned {robotaction}")
-        if testerei == False and onlyerrorlog == False:
-            actionlogger.info(f"De Roboter get zréck: {robotaction}")
-        if robotaction == True:
-            self.status = "urlaub"
+            self.actionlogger.info("Heizungsmethod turn_vacation_on agesprong")
+        self.request_status("urlaub")
+        robotaction = self.reconcile()
+        if self.status == "urlaub":
             if testerei == False and onlyerrorlog == False:
-                actionlogger.info(f"Vakanze-status aktivéiert, de status as lo: {self.status}")
+                self.actionlogger.info(f"Vakanze-status aktivéiert, de status as lo: {self.status}")
             return "Vakanz ageschalt"
         else:
             logging.debug("There has been a problem with the activation of the holiday status")
             if testerei == False:
-                errorlogger.error(f"Problem mam Roffueren fier d'Vakanz - d'Roboter-Method get zréck: {robotaction}")
+                self.errorlogger.error(f"Problem mam Roffueren fier d'Vakanz - d'Roboter-Method get zréck: {robotaction}")
             return "Problem mam Roffueren fier d'Vakanz!"
 
     def turn_vacation_off(self):
@@ -628,92 +1329,56 @@ class Heizung():
         Returns a string to be displayed in the GUI."""
         logging.debug("method turn_vacation_off activated")
         if testerei == False and onlyerrorlog == False:
-            actionlogger.info("Heizungsmethod turn_vacation_off agesprong")
-        urlauboff_message = "1 3 3 4 4 4 2 4 4 1 1 2 2 4 4 4 4."
-        robotaction = self.myrobot.send_message(urlauboff_message)
-        logging.debug(f"self.myrobot.send_message(urlauboff_message) returned {robotaction}")
-        if testerei == False and onlyerrorlog == False:
-            actionlogger.info(f"De Roboter get zréck: {robotaction}")
-        if robotaction == True:
-            self.status = "normal"
+            self.actionlogger.info("Heizungsmethod turn_vacation_off agesprong")
+        if self.request_status("normal") != True and self.status != "urlaub":
+            return "Näischt gemat"
+        robotaction = self.reconcile()
+        if self.status == "normal":
             if testerei == False and onlyerrorlog == False:
-                actionlogger.info(f"'urlaub' ausgeschalt. De Status as lo: {self.status}")
+                self.actionlogger.info(f"'urlaub' ausgeschalt. De Status as lo: {self.status}")
             logging.debug(f"The status is now: {self.status}")
             return "Vakanz ausgeschalt"
         else:
             logging.debug("There has been a problem with the DEactivation of the holiday status")
             if testerei == False:
-                errorlogger.error(f"Problem mam Ropfueren no der Vakanz - d'Roboter-Method get zréck: {robotaction}")
+                self.errorlogger.error(f"Problem mam Ropfueren no der Vakanz - d'Roboter-Method get zréck: {robotaction}")
             return f"Problem mam Ropfueren no der Vakanz! D'Roboter-Method get zréck: {robotaction}"
 
-
-
     def reduce_now(self):
         """Reduces the temperature immediately (if the status was normal). For example, before you leave for the day or
         when you go to bed earlier.
-        Sends the message to the robot.
+        Sends the message to the robot (via request_reduce and reconcile).
         Uses the "länger warm" (longer warm) mode of the heating. This stays until it is changed again.
         Passes the return value of the robot method to the GUI.
         When longer-warm was active, it is turned off when the status is changed to reduced or holiday."""
         logging.debug("method reduce_now activated")
         if testerei == False and onlyerrorlog == False:
-            actionlogger.info("Heizungsmethod reduce_now agesprong")
-        if self.status != "reduziert" and self.status != "urlaub":  # (like self.status == normal, but works also if there would be more than 3 status-values)
-            rof_message = "1 4 4 4 4."
-            robot_action = self.myrobot.send_message(rof_message)
-            logging.debug(f"self.myrobot.send_message(rof_message) returned {robot_action}")
-            if testerei == False and onlyerrorlog == False:
-                actionlogger.info(f"De Roboter get zréck: {robot_action}")
-            if robot_action == True:
-                self.status = "reduziert"
-                logging.debug(f"The status is now: {self.status}")
-                if testerei == False and onlyerrorlog == False:
-                    actionlogger.info(f"De status as lo: {self.status}")
-                # ensure that "longer-warm" cannot be active when the status was reduced or put to 'urlaub', because it wouldn't make any sense:
-                if self.longerwarm_on == True:
-                    self.longerwarm_on = False
-            return robot_action
-        else:
-            logging.debug("The status 'reduziert' was already on, or the status was 'urlaub'")
-            if testerei == False and onlyerrorlog == False:
-                actionlogger.info("Näischt gemat - war schon 'reduziert' (oder de status war 'urlaub')")
-            return "Näischt gemat"
+            self.actionlogger.info("Heizungsmethod reduce_now agesprong")
+        requested = self.request_reduce()
+        if requested != True:
+            return requested
+        return self.reconcile()
 
 
     def raise_now(self):
-        """raises the temperature if it was reduced, by sending the message to the robot. Works with the mode
-        'länger warm' of the boiler.
+        """raises the temperature if it was reduced, by sending the message to the robot (via request_raise and
+        reconcile). Works with the mode 'länger warm' of the boiler.
         Stays until changed (automatically or by pressing a button)."""
         logging.debug("method raise_now activated")
         if testerei == False and onlyerrorlog == False:
-            actionlogger.info("Heizungsmethod raise_now agesprong")
-        # if status is reduced and needs to raise to normal, the raise-message is sent to the robot:
-        if self.status != "normal" and self.status != "urlaub":
-            rop_message = "1 4 4 4 4."
-            robot_action = self.myrobot.send_message(rop_message)
-            logging.debug(f"self.myrobot.send_message(rop_message) returned {robot_action}")
-            if testerei == False and onlyerrorlog == False:
-                actionlogger.info(f"De Roboter get zréck: {robot_action}")
-            if robot_action == True:
-                self.status = "normal"
-                logging.debug(f"The status is now: {self.status}")
-                if testerei == False and onlyerrorlog == False:
-                    actionlogger.info(f"De Status as lo: {self.status}")
-            return robot_action
-        else:
-            logging.debug("The boiler was already raised or 'urlaub'/holiday is on")
-            if testerei == False and onlyerrorlog == False:
-                actionlogger.info("Näischt gemat - war schon rop (oder 'urlaub' as an)")
-            return "Näischt gemat"
+            self.actionlogger.info("Heizungsmethod raise_now agesprong")
+        requested = self.request_raise()
+        if requested != True:
+            return requested
+        return self.reconcile()
 
 
     def longer_warm(self):
         """Switches off the evening reducing (by deleting the last changing-schedule of the day from the dictionary
         changetimes_today - presuming that there are at least 2 change-times per day and that the last automatic action
         on a given day always is a reducing of the temperature).
-        To do this, a sorted list of the keys (times of the day) is created from changetimes_today to get the sequence
-        of the change-times (z.B. ['06:45', '22:15']). With the help of the current changetimess_list, the method
-        longer_warm can find/remove the last changing time of the day.
+        To do this, the sorted index of today's change-times (today_index) is used to find/remove the last reducing time
+        of the day.
 
         This means, the heater heats through the night, if it isn't reduced. It would then reduce again the day later
         when a reducing is scheduled in the times-dictionary.
@@ -722,61 +1387,67 @@ class Heizung():
 
         Isn't possible when tomorrow-holiday is active."""
         if testerei == False and onlyerrorlog == False:
-            actionlogger.info("Heizungs-method longer_warm agesprong")
-
-        if self.tomorrowholiday_on == False:
-
-            if self.status != "urlaub" and self.longerwarm_on == False: # longer_warm is not already on, and holiday-status neither
-                self.changetimes_list = sorted([x for x in self.changetimes_today])  # an up-to-date list is needed for the method longer_warm to find the last changing time
-                if len(self.changetimes_list) > 0:  # not empty
-                    if len(self.changetimes_list) >= 2:
-                        # ensure that longer_warm can not be used after the last reducing of the day, nor when it was reduced manually:
-                        if self.zeit < self.changetimes_list[-1] and self.status != "reduziert":
-                            last_reducetime = self.changetimes_list[-1]  # supposing the last planned action in a day is always a reducing
-                            # refresh the times-dictionary for today:
-                            deleted_reducetime = self.changetimes_today.pop(last_reducetime)
-                            #print("deleted_reducetime:", deleted_reducetime)  # to return also the value: key, value = dictname.popitem(keyname)
-                            #logging.debug(f"self.changetimes_today: {self.changetimes_today}")
-                            self.longerwarm_on = True
-                            return True
-                        else: # the current time lies after the last reducing-time of the day, longer_warm makes no sense here, or the status was already reduced manually
-                            logging.debug("It's already after the evening-reducing (or was manually reduced)!")
-                            if testerei == False and onlyerrorlog == False:
-                                actionlogger.info("War schon no der Owes-Ofsenkung (oder manuell reduzéiert)")
-                            return "Näischt gemat"
+            self.actionlogger.info("Heizungs-method longer_warm agesprong")
+
+        # (with the lock: reconcile in the worker thread could reduce the status between the check and the change)
+        with self.statelock:
+            if self.tomorrowholiday_on == False:
+
+                if self.status != "urlaub" and self.longerwarm_on == False: # longer_warm is not already on, and holiday-status neither
+                    if len(self.today_index) > 0:  # not empty
+                        last_reduce = self.today_index.last_reduce()  # (normally the last planned action in a day is a reducing)
+                        if len(self.today_index) >= 2 and last_reduce is not None:
+                            # ensure that longer_warm can not be used after the last reducing of the day, nor when it was reduced manually:
+                            if self.zeit < last_reduce[0] and self.status != "reduziert":
+                                last_reducetime = last_reduce[0]
+                                # refresh the times-dictionary for today:
+                                deleted_reducetime = self.changetimes_today.pop(last_reducetime)
+                                self.refresh_todayindex()
+                                #print("deleted_reducetime:", deleted_reducetime)  # to return also the value: key, value = dictname.popitem(keyname)
+                                #logging.debug(f"self.changetimes_today: {self.changetimes_today}")
+                                self.longerwarm_on = True
+                                self.save_state("longer_warm")
+                                return True
+                            else: # the current time lies after the last reducing-time of the day, longer_warm makes no sense here, or the status was already reduced manually
+                                logging.debug("It's already after the evening-reducing (or was manually reduced)!")
+                                if testerei == False and onlyerrorlog == False:
+                                    self.actionlogger.info("War schon no der Owes-Ofsenkung (oder manuell reduzéiert)")
+                                return "Näischt gemat"
+                        else:
+                            # supposing that there should be at least 2 change-times per day to make sense (and to have an evening-reducing):
+                            logging.debug("changetimes for today have fewer than 2 elements (or no reducing)!")
+                            if testerei == False:
+                                self.errorlogger.error("changetimes fier haut hun manner wéi 2 Elementer (oder keng Ofsenkung)!")
+                            return "changetimes for today have fewer than 2 elements (or no reducing)!"
                     else:
-                        # supposing that there should be at least 2 change-times per day to make sense (and to have an evening-reducing):
-                        logging.debug("changetimes_list has fewer than 2 elements!")
+                        logging.debug("changetimes for today are empty/faulty")
                         if testerei == False:
-                            errorlogger.error("changetimes_list huet manner wéi 2 Elementer!")
-                        return "changetimes_list has fewer than 2 elements!"
-                else:
-                    logging.debug("changetimes_list for today is empty/faulty")
-                    if testerei == False:
-                            errorlogger.error("changetimes_list fier haut as eidel/fehlerhaft!")
-                    return "Zäiten-Lescht as eidel oder fehlerhaft"
-            else:  # # longerwarm_on is True or status is "urlaub"
-                logging.debug("longer_warm was already active, or it is during holiday-status")
-                if testerei == False and onlyerrorlog == False:
-                    actionlogger.info("longer_warm war schon an, oder et war 'urlaub' an")
-                return "Näischt gemat"
+                                self.errorlogger.error("changetimes fier haut sin eidel/fehlerhaft!")
+                        return "Zäiten-Lescht as eidel oder fehlerhaft"
+                else:  # # longerwarm_on is True or status is "urlaub"
+                    logging.debug("longer_warm was already active, or it is during holiday-status")
+                    if testerei == False and onlyerrorlog == False:
+                        self.actionlogger.info("longer_warm war schon an, oder et war 'urlaub' an")
+                    return "Näischt gemat"
 
-        else:  # tomorrowholiday_on is True
-            logging.debug("tomorrow_holiday is active, longer_warm can't be set")
-            if testerei == False and onlyerrorlog == False:
-                actionlogger.info("longer_warm kann net agemat gin well dFeierdags-Astellung aktiv as")
-            return "muar-Feierdag as aktiv, länger-warm as net méiglech!"
+            else:  # tomorrowholiday_on is True
+                logging.debug("tomorrow_holiday is active, longer_warm can't be set")
+                if testerei == False and onlyerrorlog == False:
+                    self.actionlogger.info("longer_warm kann net agemat gin well dFeierdags-Astellung aktiv as")
+                return "muar-Feierdag as aktiv, länger-warm as net méiglech!"
 
     def longer_warm_back(self):
         """Sets off the longer-warm. This means, that the normal change-times for the day are loaded again."""
         if self.longerwarm_on == True:
             self.changetimes_today = copy.deepcopy(self.change_times[self.weekday])  # resets the changing-times to standard
+            self.refresh_todayindex()
             self.longerwarm_on = False
+            self.save_state("longer_warm_back")
             return True
         else:
             logging.debug("longer_warm wasn't active")
             if testerei == False and onlyerrorlog == False:
-                actionlogger.info("longer_warm war net an")
+                self.actionlogger.info("longer_warm war net an")
             return "Näischt gemat"
 
 
@@ -791,408 +1462,138 @@ class Heizung():
         To change from tomorrow_holiday to longer_warm, the holiday-feature has first to be disabled."""
         logging.debug("method tomorrow_holiday started")
         if testerei == False and onlyerrorlog == False:
-            actionlogger.info("Heizungs-method tomorrow_holiday agesprong")
+            self.actionlogger.info("Heizungs-method tomorrow_holiday agesprong")
 
         # if longer_warm is active, there is no evening reducing time in the current times that could be updated:
         if self.longerwarm_on == False:
             # if it wasn't already activated (and there are saved change_times in the file):
-            if self.tomorrowholiday_on == False and len(self.changetimes_list) != 0:
+            if self.tomorrowholiday_on == False and len(self.today_index) != 0:
                 # change the evening reducing of the current day to the late reducing time from Saturday:
-                self.changetimes_list = sorted(x for x in self.changetimes_today) # make a sorted list of the dictionary keys (current day)
-                oldeveningtime = self.changetimes_list[-1]  # get the last change-time for today
-                saturdaylist = sorted(x for x in self.change_times[6])  # create a sorted list of the Saturday change-times
-                neweveningtime = saturdaylist[-1]  # last changing time on Saturday
+                oldeveningtime = self.today_index.last()[0]  # get the last change-time for today
+                saturday_index = self.times_index[6]  # the sorted Saturday change-times
+                neweveningtime = saturday_index.last()[0]  # last changing time on Saturday
                 self.changetimes_today.pop(oldeveningtime)  # delete change-time from the current changetimes-dict
                 self.changetimes_today[neweveningtime] = "reduziert"  # add the new reducing time to the dict
+                self.refresh_todayindex()
                 # set tomorrow_holiday_on to True (to be able to adjust the automatic times for the next day during midnight changes):
                 self.tomorrowholiday_on = True
-                self.newmorningtime =  saturdaylist[0]  # first changing time on Saturday
+                self.newmorningtime =  saturday_index.first()[0]  # first changing time on Saturday
+                self.save_state("tomorrow_holiday")
                 logging.debug(f"Method tomorrow_holiday activated. New change-times for today: {self.changetimes_today}")
                 return True
             else:  # self.tomorrowholiday_on is True
                 logging.debug("Done nothing - tomorrow_holiday was already active")
                 if testerei == False and onlyerrorlog == False:
-                    actionlogger.info(f"Näischt gemat (muar-Feierdag war schon an - d'Zäiten sin: {self.changetimes_today})")
+                    self.actionlogger.info(f"Näischt gemat (muar-Feierdag war schon an - d'Zäiten sin: {self.changetimes_today})")
                 return f"Näischt gemat - d'Zäiten sin: {self.changetimes_today}"
         else:  # longer warm is active
             logging.debug("Done nothing - longer_warm is active")
             if testerei == False and onlyerrorlog == False:
-                actionlogger.info(f"länger warm as an! (Näischt gemat)")
+                self.actionlogger.info(f"länger warm as an! (Näischt gemat)")
             return "länger warm as an - muar-Feierdag kann net gemat gin!"
 
     def tomorrow_holiday_back(self):
         """Undo the feature tomorrow-holiday (resets the changing-times to the standard values)."""
         if testerei == False and onlyerrorlog == False:
-            actionlogger.info("Heizungs-Method tomorrow_holiday_back agesprong")
+            self.actionlogger.info("Heizungs-Method tomorrow_holiday_back agesprong")
         if self.tomorrowholiday_on == True:
             self.changetimes_today = copy.deepcopy(self.change_times[self.weekday])
+            self.refresh_todayindex()
             self.tomorrowholiday_on = False
+            self.save_state("tomorrow_holiday_back")
             return True
         else:
             logging.debug("tomorrow_holiday wasn't active")
             if testerei == False and onlyerrorlog == False:
-                actionlogger.info("muar-Feierdag war net an")
+                self.actionlogger.info("muar-Feierdag war net an")
             return "Näischt gemat"
 
+    def apply_holidaycalendar(self, day):
+        """Activates tomorrow-holiday if the day after day (the day of the current changing-times) is a holiday of the
+        imported holiday calendar, and falls on one of holiday_weekdays. It's done once per holiday: if tomorrow-holiday
+        is undone with the button, it isn't activated again for the same holiday. Returns True if it was activated."""
+        tomorrow = day + timedelta(days=1)
+        tomorrowkey = tomorrow.isoformat()
+        if tomorrow.isoweekday() not in holiday_weekdays or self.holidaycalendar_applied == tomorrowkey:
+            return False
+        tomorrowindex = self.times_index.days.get(tomorrow.isoweekday())
+        if tomorrowindex is None or len(tomorrowindex) == 0:  # (there is no morning to change)
+            return False
+        holidayname = self.holiday_calendar.holiday_on(tomorrow)
+        if holidayname is None:
+            return False
+        if self.tomorrowholiday_on == True:  # (already activated by hand)
+            self.holidaycalendar_applied = tomorrowkey
+            return False
+        previous = self.holidaycalendar_applied
+        self.holidaycalendar_applied = tomorrowkey  # (set before, so that it's saved in the journal with tomorrow-holiday)
+        response = self.tomorrow_holiday()
+        if response != True:  # (z.B. longer-warm is active - it's tried again at the next loading of the calendar)
+            self.holidaycalendar_applied = previous
+            logging.debug(f"tomorrow is the holiday '{holidayname}', but tomorrow-holiday couldn't be activated: {response}")
+            if testerei == False and onlyerrorlog == False:
+                self.actionlogger.info(f"Muar as Feierdag ({holidayname}), mä muar-Feierdag konnt net ageschalt gin: {response}")
+            return False
+        logging.debug(f"tomorrow-holiday activated for the holiday '{holidayname}' ({tomorrowkey})")
+        if testerei == False and onlyerrorlog == False:
+            self.actionlogger.info(f"Muar-Feierdag automatesch ageschalt: {holidayname} ({tomorrowkey}) - d'Zäiten fier haut sin: {self.changetimes_today}")
+        return True
+
+    def check_communication(self):
+        """Tests if the communication with the robot works (on start), and saves the answer of the robot in
+        communicationworks (True, or a string describing the problem). Returns the answer."""
+        self.communicationworks = self.myrobot.send_message("test.")
+        if testerei == False and onlyerrorlog == False:
+            self.actionlogger.info(f"Kommunikatiounstest get zréck: {self.communicationworks}")
+        return self.communicationworks
+
     def test_robot(self):
         """Method to check/move the robot, with a sequence that does nothing (doesn't change the configurations in the
         boiler at hand)"""
         logging.debug("Method test_robot activated")
         if testerei == False and onlyerrorlog == False:
-            actionlogger.info("Heizungsmethod test_robot agesprong")
+            self.actionlogger.info("Heizungsmethod test_robot agesprong")
         test_message = "1 3 2 4 1 1."
         #if testerei == True:
         #    test_message = "13 2 4 1 1."
         robot_action = self.myrobot.send_message(test_message)
+        if robot_action == True:
+            self.menu.pressed(test_message, self.status)
+        elif robot_action not in robot_notsent:
+            self.menu.lost()
         logging.debug(f"self.myrobot.send_message(test_message) returned {robot_action}")
         if testerei == False and onlyerrorlog == False:
-            actionlogger.info(f"self.myrobot.send_message(test_message) returned {robot_action}")
+            self.actionlogger.info(f"self.myrobot.send_message(test_message) returned {robot_action}")
         return robot_action
 
 
 
-class KivyGui(App):
-    """gets called in the class Interface(), and calls itself the methods of the class Heizung that are needed.
-    Creates the graphical interface with Kivy."""
-
-    def __init__(self):
-        super(KivyGui, self).__init__()
-        self.myheizung = Heizung()
-        logging.debug("init of the class KivyGui activated")
-
-    # to build the application we have to return a widget on the build() function:
-    def build(self):
-        layout = FloatLayout()
-        self.title = f"Heizungssteierung V {versionnr}"  # window title
-
-        # BUTTON ACTIONS:
-
-        def popup_on(nobutton_assigned):
-            """to activate the popup-label ("Please wait"), when a button is pressed"""
-            layout.add_widget(lbpopup)
-        def popup_off(nobutton_assigned):
-            """to deactivate the popup-label ("Please wait")"""
-            layout.remove_widget(lbpopup)
-
-        def set_raise_now(currentbutton):
-            """action bound to the raise-now-button btnrop"""
-            logging.debug(f"'{currentbutton.text}' pushed")
-            if onlyerrorlog == False and testerei == False:
-                actionlogger.info(f"'{currentbutton.text}' gedréckt")
-            response = self.myheizung.raise_now()
-            popup_off(currentbutton)
-            lboutput.text = f"Roboter/Kommunikatioun get zréck: {response}"
-            #if onlyerrorlog == False and testerei == False:
-            #    actionlogger.info(f"Roboter/Kommunikatioun get zréck: {response}")
-
-        def set_reduce_now(currentbutton):
-            """action bound to the reduce-now-button btnrof"""
-            logging.debug(f"'{currentbutton.text}' pushed")
-            if onlyerrorlog == False and testerei == False:
-                actionlogger.info(f"'{currentbutton.text}' gedréckt")
-            response = self.myheizung.reduce_now()
-            popup_off(currentbutton)
-            lboutput.text = f"Roboter/Kommunikatioun get zréck: {response}"
-            #if onlyerrorlog == False and testerei == False:
-            #    actionlogger.info(f"Roboter/Kommunikatioun get zréck: {response}")
-
-        def set_longer_warm(currentbutton):
-            """action bound to the longer-warm-button btnsetlonger"""
-            logging.debug(f"'{currentbutton.text}' pushed")
-            if onlyerrorlog == False and testerei == False:
-                actionlogger.info(f"'{currentbutton.text}' gedréckt")
-            # call the method of Heizung that makes the needed changes to not reduce the temp in the evening:
-            response_longer = self.myheizung.longer_warm()
-            if response_longer == True:
-                lboutput.text = f"nei Zäiten fier haut: {self.myheizung.changetimes_today}"
-                lblongerwarm.text = "länger warm an"
-                if testerei == False and onlyerrorlog == False:
-                    actionlogger.info(f"nei Zäiten fier haut: {self.myheizung.changetimes_today}")
-            else:
-                lboutput.text = response_longer
-
-        def set_longer_warm_back(currentbutton):
-            """action bound to the undo-longer-warm-button btnsetlongerback"""
-            logging.debug(f"'{currentbutton.text}' pushed")
-            if onlyerrorlog == False and testerei == False:
-                actionlogger.info(f"'{currentbutton.text}' gedréckt")
-            response_longerback = self.myheizung.longer_warm_back()
-            if response_longerback == True:
-                lboutput.text = f"nei Zäiten fier haut: {self.myheizung.changetimes_today}"
-                lblongerwarm.text = ""
-                if testerei == False and onlyerrorlog == False:
-                    actionlogger.info(f"nei Zäiten fier haut: {self.myheizung.changetimes_today}")
-            else:
-                lboutput.text = response_longerback
-
-        def set_tomorrow_holiday(currentbutton):
-            """action bound to the tomorrow-holiday-button btnholiday"""
-            logging.debug(f"'{currentbutton.text}' pushed")
-            if onlyerrorlog == False and testerei == False:
-                actionlogger.info(f"'{currentbutton.text}' gedréckt")
-            response_tomorrow = self.myheizung.tomorrow_holiday()  # returns True, "länger warm as an!" or "Näischt gemat"
-            if response_tomorrow == True:
-                lboutput.text = f"muar-Feierdag as aktivéiert. Nei Zäiten fier haut: {self.myheizung.changetimes_today}"
-                if testerei == False and onlyerrorlog == False:
-                    actionlogger.info(lboutput.text)
-            else:
-                lboutput.text = response_tomorrow
-
-        def set_tomorrow_holiday_back(currentbutton):
-            """action bound to the undo-tomorrow-holiday-button btnholidayback"""
-            logging.debug(f"'{currentbutton.text}' pushed")
-            if onlyerrorlog == False and testerei == False:
-                actionlogger.info(f"'{currentbutton.text}' gedréckt")
-            response_tomorrowback = self.myheizung.tomorrow_holiday_back()
-            if response_tomorrowback == True:
-                lboutput.text = f"muar-Feierdag as rem ausgeschalt. Zäiten fier haut: {self.myheizung.changetimes_today}"
-                if testerei == False and onlyerrorlog == False:
-                    actionlogger.info(lboutput.text)
-            else:
-                lboutput.text = response_tomorrowback
-
-        def get_holidaydata(currentbutton):
-            """when the associated button is pushed, it calls the methods to load the automatic holiday changes from the file"""
-            logging.debug(f"'{currentbutton.text}' pushed")
-            if onlyerrorlog == False and testerei == False:
-                actionlogger.info(f"'{currentbutton.text}' gedréckt")
-            response_urlaub = self.myheizung.refresh_urlaub()  # returns False or a dict (either empty or with data)
-            if response_urlaub == False:
-                lboutput.text = "Problem mat der Datei/Formateirung vun urlaubdata!"
-                logging.debug(lboutput.text)
-                if testerei == False:
-                    errorlogger.error(lboutput.text)
-            elif response_urlaub == {}:
-                lboutput.text = "urlaubdata as eidel!"
-                logging.debug(lboutput.text)
-                if testerei == False:
-                    errorlogger.error(lboutput.text)
-            else:  # it's the right, non-empty dict
-                lboutput.text = f"urlaubdata get zréck: {response_urlaub}"
-                logging.debug(f"urlaubdata loaded. urlaubdata returns: {response_urlaub}. urlaub_times is now: {self.myheizung.urlaub_times}")
-                if testerei == False and onlyerrorlog == False:
-                    actionlogger.info(f"urlaubdata ragelueden. urlaubdata get zréck: {response_urlaub}. urlaub_times as lo: {self.myheizung.urlaub_times}")
-
-        def get_timedata(currentbutton):
-            """when the associated button is pushed, it calls the methods to load the automatic status-changing times from the file"""
-            logging.debug(f"'{currentbutton.text}' pushed")
-            if onlyerrorlog == False and testerei == False:
-                actionlogger.info(f"'{currentbutton.text}' gedréckt")
-            response_times = self.myheizung.refresh_changetimes()  # returns False or an "empty" dict or normal dict
-            if response_times == False:
-                lboutput.text = "Problem mat der Datei/Formateirung vun timesdata!"
-                logging.debug(lboutput.text)
-                #if testerei == False:
-                #    errorlogger.error(lboutput.text)
-            elif response_times == "empty":  # default_changetimes is an "empty" nested dict
-                lboutput.text = "timesdata as eidel!"
-                logging.debug(lboutput.text)
-                #if testerei == False:
-                #    errorlogger.error(lboutput.text)
-            elif response_times == "muar-Feierdag":
-                lboutput.text = f"muar-Feierdag as aktiv - d'Zäiten kennen net agelies gin."
-                logging.debug(lboutput.text)
-            else: # it is the right dict/format
-                lboutput.text = f"timesdata as ragelueden gin / Fier haut as: {self.myheizung.changetimes_today}"
-                #logging.debug(f"timesdata loaded. timesdata returns: {response_times}.\n change_times is now: {self.myheizung.change_times}")
-                #if testerei == False and onlyerrorlog == False:
-                #    actionlogger.info(f"timesdata ragelueden. timesdata get zréck: {response_times}.\n change_times as lo: {self.myheizung.change_times}")
-
-                # automatic adjustments based on new timesdata, when necessary:
-                if response_times == "reduce now":
-                    btnrof.trigger_action()  # this is like pushing the button btnrof (carried out this way so that the please-wait-label appears)
-                elif response_times == "raise now":
-                    btnrop.trigger_action()  # this is like pushing the button btnrop (carried out this way so that the please-wait-label appears)
-                elif response_times == "status was none":
-                    lboutput.text = "PROBLEM BEIM UPASSEN UN DEI NEI TIMESDATA! (de status war 'none')"
-
-
-        def call_robottest(currentbutton):
-            logging.debug(f"'{currentbutton.text}' pushed")
-            if onlyerrorlog == False and testerei == False:
-                actionlogger.info(f"'{currentbutton.text}' gedréckt")
-            response = self.myheizung.test_robot()
-            popup_off(currentbutton)
-            lboutput.text = f"Roboter/Kommunikatioun get zréck: {response}"
-            if onlyerrorlog == False and testerei == False:
-                actionlogger.info(lboutput.text)
-
-        def test_robocommunication(currentbutton):
-            logging.debug(f"'{currentbutton.text}' pushed")
-            if onlyerrorlog == False and testerei == False:
-                actionlogger.info(f"'{currentbutton.text}' gedréckt")
-            commresponse = self.myheizung.myrobot.send_message("test.")
-            popup_off(currentbutton)
-            lboutput.text = f"Roboter/Kommunikatioun get zréck: {commresponse}"
-            if onlyerrorlog == False and testerei == False:
-                actionlogger.info(lboutput.text)
-
-
-        def refresh_kivy_time(nobutton_assigned):
-            # refresh the clock of the class Heizung (by calling the own method of the class Heizung):
-            self.myheizung.refresh_heiz_time()
-            # refresh the clock label in the GUI (otherwise the first time from the starting would remain without being updated):
-            lbclock.text = self.myheizung.zeit
-
-
-        def check_kivy_statusandactions(nobutton_assigned):
-            """refreshes the indicators of status and longerwarm_on in the GUI.
-            If the Heizung.check_heiz_statusandactions() method returns that a status has to be automatically changed
-            because of time settings, the correspondent button is triggered here in the KivyGui (it is done this way and
-            not by calling the robot directly from the class Heizung as the button-trigger implies that the please-wait-label
-            appears in the GUI)."""
-            heizstatus_response = self.myheizung.check_heiz_statusandactions()
-            lbstatus.text = f"status: {self.myheizung.status}"
-            if self.myheizung.longerwarm_on == False:
-                lblongerwarm.text = ""
-
-            # automatic adjustments based on time, when necessary:
-            if heizstatus_response == "reduce now":
-                btnrof.trigger_action()  # this is like pushing the button btnrof (carried out this way so that the please-wait-label appears)
-            elif heizstatus_response == "raise now":
-                btnrop.trigger_action()  # this is like pushing the button btnrop
-            elif heizstatus_response == False:
-                lboutput.text = "PROBLEM BEIM AUTOMATESCHEN EMSCHALTEN vun Zäiten/urlaub! (ev. war de status 'none'?)"
-            elif heizstatus_response != None:  # example: "Vakanz ageschalt" (holiday activated)
-                lboutput.text  = f"Roboter/Kommunikatioun get zréck: {heizstatus_response}"
-
-
-        def test_statuschanging(nobutton_assigned):
-            """function to change the time arbitrarily to test methods which rely on time (e.g. when the status
-            should change and be displayed in the GUI). The minutes are incremented to mimic a normal time elapsing/changing.
-            The desired starting time has to be set where the function is called (as it has to be outside of the
-            function to not set the time to start with every function call).
-            (Isn't needed anymore since the implementation of the time data from the files, as now change-times can be
-            easily changed in the time-file during runtime for testing)."""
-            logging.debug("Fonctioun test_statuschanging as agesprong")
-            if type(self.myheizung.zeit) != str:
-                print("self.myheizung.zeit:", self.myheizung.zeit.strftime("%H:%M"))  # only print the hours and minutes
-            elif type(self.myheizung.zeit) == str:
-                print("self.myheizung.zeit:", self.myheizung.zeit)
-                self.myheizung.zeit = datetime.strptime(self.myheizung.zeit, "%H:%M")  # it has to be a datetime object to be able to add 1 minute
-            self.myheizung.zeit +=  timedelta(minutes = 1)
-            self.myheizung.zeit = self.myheizung.zeit.strftime("%H:%M")  # change again the time to string for the rest of the program and for displaying
-            lbclock.text = self.myheizung.zeit
-
-
-        # SCHEDULES / PRESENT READINGS:
-        if zeiten_testerei == False:
-            # refresh the clock regularly (calls refresh_kivy_time(), which refreshes the clock label in the window and the zeit-attribute of the class Heizung):
-            Clock.schedule_interval(refresh_kivy_time, 1)  # (timeout is in seconds)
-            # check the status of the heizung and if actions have to be taken:
-            Clock.schedule_interval(check_kivy_statusandactions, 1)
-        # to test if the status of the class Heizung changes as it should on given times of the day:
-        else: # (if zeiten_testerei == True)
-            returned_status = self.myheizung.read_timesstatus()
-            if returned_status != False:
-                self.myheizung.status = returned_status
-            else:
-                logging.error("status-ofchecken mat den changetimes get False!")
-            Clock.schedule_interval(test_statuschanging, 5)  # This is basically a replacement for the time update for testing (so that I can use the times I need for the test)
-            Clock.schedule_interval(check_kivy_statusandactions, 5)  # check the status of Heizung regularly
-
-
-        # BUTTONS AND LABELS:
-
-        # (size_hint = (width-percent, height-percent))  # size_hint should be used with pos_hint (and not pos) to allow the elements to find their places when the window is resized
-        # (pos = (sideways, bottom-top)  # starts at the bottom left corner with 0,0 (for the top left corner you need e.g. (0, 500))
-        # (pos_hint = )  # position of the elements by percentage, Bsp: pos_hint={'center_x': .5, 'center_y': .5})
-
-        # clock-Label:
-        lbclock = Label(text = str(datetime.now().strftime("%H:%M")), font_size = 20, color = "blue",  size_hint = (0.8, .2), pos_hint={'center_x': .85, 'center_y': .95})
-        layout.add_widget(lbclock)
-
-        # status-label:
-        lbstatus = Label(text = f"status: {self.myheizung.status}", font_size = 20, color = "blue",  size_hint = (0.2, .2), pos_hint={'center_x': .15, 'center_y': .95})
-        layout.add_widget(lbstatus)
-
-        # longer-warm-label:
-        lblongerwarm = Label(text = "", font_size = 20, color = "blue", size_hint = (0.2, 0.2), pos_hint={'center_x': .15, 'center_y': .90})
-        layout.add_widget(lblongerwarm)
-
-        # output-label (messages for the user):
-        lboutput = Label(size_hint = (0.85, .2), pos_hint={'center_x': .50, 'center_y': .20})
-        # start message - show in the GUI if the communication works (gets overwritten when other actions are taken):
-        lboutput.text = f"Kommunikatioun funzt?: {self.myheizung.communicationworks}"
-        layout.add_widget(lboutput)
-
-        # raise-button:
-        btnrop = Button(text ='lo rop', size_hint =(.4, .23), pos_hint={'center_x': .25, 'center_y': .75})
-        btnrop.bind(on_press = popup_on, on_release=set_raise_now)
-        layout.add_widget(btnrop)
-
-        # reduce-button:
-        btnrof = Button(text ='lo rof', size_hint =(.4, .23), pos_hint={'center_x': .75, 'center_y': .75})
-        btnrof.bind(on_press = popup_on, on_release= set_reduce_now)
-        layout.add_widget(btnrof)
-
-        # button for heating longer:
-        btnsetlonger = Button(text = "länger warm an", size_hint = (.30, .12), pos_hint={'center_x': .25, 'center_y': .43})
-        btnsetlonger.bind(on_press = set_longer_warm) # (on_press = popup_on, on_release= set_longer_warm) isn't needed for the please-wait-label because the robot does not need to take an action
-        layout.add_widget(btnsetlonger)
-
-        # button to set off heating longer:
-        btnsetlongerback = Button(text = "länger warm aus", size_hint = (.30, .12), pos_hint={'center_x': .25, 'center_y': .30})
-        btnsetlongerback.bind(on_press = set_longer_warm_back)
-        layout.add_widget(btnsetlongerback)
-
-        # button to load the holiday dates and times from the file:
-        btnurlaub = Button(text = "load urlaubdata", size_hint = (.30, .12), pos_hint={'center_x': .75, 'center_y': .30})
-        btnurlaub.bind(on_press = get_holidaydata)
-        layout.add_widget(btnurlaub)
-
-        # button to load the automatic changing times from the file:
-        btntimes = Button(text = "load timesdata", size_hint = (.30, .12), pos_hint={'center_x': .75, 'center_y': .43})
-        btntimes.bind(on_press = get_timedata)
-        layout.add_widget(btntimes)
-
-        # button to set the next day to a holiday:
-        btnholiday = Button(text = "muar-Feierdag an", size_hint = (.18, .12), pos_hint = {"center_x": .50, "center_y": .43})
-        btnholiday.bind(on_press = set_tomorrow_holiday)
-        layout.add_widget(btnholiday)
-
-        # button to set off tomorrow_holiday (reset the day after to a normal day regarding the saved change-times)
-        btnholidayback = Button(text = "muar-Feierdag aus", size_hint = (.18, .12), pos_hint = {"center_x": .50, "center_y": .30})
-        btnholidayback.bind(on_press = set_tomorrow_holiday_back)
-        layout.add_widget(btnholidayback)
-
-        # button to test the function of the robot:
-        btntestrobot = Button(text = "test robot", color = "red", size_hint = (0.13, 0.08), pos_hint = {"center_x": .10, "center_y": .10})
-        btntestrobot.bind(on_press = popup_on, on_release = call_robottest)
-        layout.add_widget(btntestrobot)
-
-        # button to test the communication to the robot:
-        btntestcomm = Button(text = "test commun.", color = "red", size_hint = (0.13, 0.08), pos_hint = {"center_x": .24, "center_y": .10})
-        btntestcomm.bind(on_press = popup_on, on_release = test_robocommunication)
-        layout.add_widget(btntestcomm)
-
-        # please-wait-label (is added in the moment the label is needed (after pressing a button))
-        lbpopup = MyWarnLabel(text = "Please wait ...", font_size = 110, color = "red", size_hint = (1, 1)) # pos_hint={'center_x': 1, 'center_y': 1})
-
-        # label that shows that "testerei" (testing state) is True:
-        if testerei == True or zeiten_testerei == True:
-            lbtesterei = Label(text = "|testerei on|\n|or zeitentest|", color = "pink", font_size = 20, size_hint = (0.25, 0.15), pos_hint = {"center_x": .90, "center_y": .10})
-            layout.add_widget(lbtesterei)
-        if myrobot_ip != robot_ip:
-            lbfakerobot = Label(text = "fake-robot(IP)", color = "pink", font_size = 50, size_hint = (0.25, 0.15), pos_hint = {"center_x": .50, "center_y": .10})
-            layout.add_widget(lbfakerobot)
-
-        return layout
-
-
-
-class Interface():
-
-    def __init__(self):
-        logging.debug(f"init of the class Interface activated (v{versionnr})")
-        if testerei == False and onlyerrorlog == False:
-            actionlogger.info(f"init vun class Interface agesprong / Programm gestart (Versioun: {versionnr})")
-
-        myKivyGui = KivyGui()
-        myKivyGui.run()
+def main():
+    """Starts the touchscreen GUI (kivygui), or with --headless only the control (heizdaemon), without kivy, or with
+    --fleet the control of several units (heizfleet)."""
+    parser = argparse.ArgumentParser(description="Remote heating control with robot")
+    parser.add_argument("--headless", action="store_true", help="run the control without GUI (kivy isn't loaded)")
+    parser.add_argument("--fleet", metavar="FILE", default=None,
+                        help="control several units (robots/boilers) without GUI, as defined in the JSON file (see heizfleet.py)")
+    args = parser.parse_args()
+    # kivygui and heizdaemon import this module by its name - as it runs as __main__ here, it's registered under its
+    #   name too, so that it isn't loaded (and the logfiles opened) a second time:
+    sys.modules.setdefault("Heizsteierung", sys.modules[__name__])
+    start_metrics()
+    if args.fleet is not None:
+        from heizfleet import HeizFleet, load_fleet
+        HeizFleet(load_fleet(args.fleet)).run()
+    elif args.headless:
+        from heizdaemon import HeizDaemon
+        HeizDaemon().run()
+    else:
+        os.environ.setdefault("KIVY_NO_ARGS", "1")  # (the arguments are read here, not by kivy)
+        from kivygui import Interface
+        my_instanz = Interface()  # this instance later calls all the other classes and methods that are needed
 
 
 #----------------------
 
-my_instanz = Interface()  # this instance later calls all the other classes and methods that are needed
+if __name__ == "__main__":  # (so that the module can be imported, for example by benchmark.py, without starting the control)
+    main()
 
@@ -0,0 +1,330 @@
+"""
+Benchmarks for the heating control (runs without screen and without the real robot).
+
+Measures:
+- how long load_timesdata and load_urlaubdata need to parse the data-files, for different file sizes and both formats
+  (parsed, and taken from the parse cache), and load_calendar for holiday calendars over several years (with the
+  expansion of the repetitions for the window),
+- how long one check (check_heiz_statusandactions) takes - with nothing due, and with a change due,
+- the duration of raise_now, reduce_now and turn_vacation_off from start to end, split in the phases connect, send and
+  echo (against the fake robot of fakerobot.py, with a new or with an already open connection),
+- the time from the start of the program until the first frame of the GUI is drawn (needs kivy and a screen,
+  otherwise it is skipped),
+- fleet mode: the time until the raise of every unit is done, when all the units (each with its own fake robot) are
+  raised at the same time, for a growing number of units - also with one unit whose robot doesn't answer.
+
+The results are saved as JSON (--output), so that the results of different versions can be compared (--compare).
+The benchmarks run in a temporary directory, so that the data- and log-files of the app aren't touched.
+
+Use: python benchmark.py [--output results.json] [--compare old_results.json] [--repeat 20] [--press-latency 0]
+"""
+
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from fakerobot import FakeRobot
+
+repodir = os.path.dirname(os.path.abspath(__file__))
+
+timesfile_sizes = [2, 10, 50, 200]  # changing-times per weekday
+urlaubfile_sizes = [10, 100, 1000, 10000]  # holiday-times in the file
+calendar_years = [1, 10, 50]  # years of public holidays in the calendar (.ics)
+
+
+def summary(durations):
+    """statistics (in milliseconds) of a list of durations (in seconds)"""
+    durations = [duration for duration in durations if duration is not None]
+    if len(durations) == 0:
+        return None
+    ms = sorted(duration * 1000 for duration in durations)
+    return {"n": len(ms), "min_ms": ms[0], "median_ms": statistics.median(ms), "mean_ms": statistics.fmean(ms),
+            "p95_ms": ms[min(len(ms) - 1, int(len(ms) * 0.95))], "max_ms": ms[-1]}
+
+
+def write_timesfile(filename, entries_per_day, fileformat="lines"):
+    """writes a times-file with the given number of changing-times per weekday (fileformat: "lines" for the line
+    format, "dict" for the old format)"""
+    step = 24 * 60 // entries_per_day
+    days = {}
+    for weekday in range(1, 8):
+        days[weekday] = {f"{minute // 60:02d}:{minute % 60:02d}": ("normal" if pos % 2 == 0 else "reduziert")
+                         for pos, minute in enumerate(range(0, entries_per_day * step, step))}
+    with open(filename, "w") as writefile:
+        if fileformat == "dict":
+            writefile.write("# benchmark data\n" + str(days) + "\n")
+        else:
+            writefile.write("# benchmark data\n" + "".join(f"{weekday} {zeit} {state}\n" for weekday, daytimes in days.items()
+                                                          for zeit, state in daytimes.items()))
+
+
+def write_urlaubfile(filename, entries, fileformat="lines"):
+    """writes an urlaub-file with the given number of holiday-times (half in the past, half in the future)"""
+    start = datetime.now() - timedelta(days=entries)
+    urlaub = {}
+    for pos in range(entries):
+        moment = start + timedelta(days=2 * pos)
+        urlaub[moment.strftime("%Y-%m-%d %H:%M")] = "urlaub" if pos % 2 == 0 else "normal"
+    with open(filename, "w") as writefile:
+        if fileformat == "dict":
+            writefile.write("# benchmark data\n" + str(urlaub) + "\n")
+        else:
+            writefile.write("# benchmark data\n" + "".join(f"{key} {state}\n" for key, state in urlaub.items()))
+
+
+def write_calendarfile(filename, years):
+    """writes a holiday calendar with 10 single holidays per year (for years years, up to the coming year) and 2 yearly
+    repeated ones"""
+    lastyear = datetime.now().year + 1
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0"]
+    for year in range(lastyear - years + 1, lastyear + 1):
+        for month in range(1, 11):
+            lines += ["BEGIN:VEVENT", f"UID:{year}-{month}", f"DTSTART;VALUE=DATE:{year}{month:02d}1{month % 10}",
+                      f"SUMMARY:Feierdag {month}", "END:VEVENT"]
+    for monthday in ["0101", "1225"]:
+        lines += ["BEGIN:VEVENT", f"UID:{monthday}", f"DTSTART;VALUE=DATE:{lastyear - years + 1}{monthday}",
+                  "RRULE:FREQ=YEARLY", f"SUMMARY:Feierdag {monthday}", "END:VEVENT"]
+    with open(filename, "w") as writefile:
+        writefile.write("\r\n".join(lines + ["END:VCALENDAR"]) + "\r\n")
+
+
+def time_loading(myheizung, loadfunction, repeat, cached):
+    """durations of loadfunction - with the result from the parse cache, or parsed every time (empty cache)"""
+    durations = []
+    loadfunction()  # (fills the cache)
+    for _ in range(repeat):
+        if not cached:
+            myheizung.parsecache.entries.clear()
+        start = time.perf_counter()
+        loadfunction()
+        durations.append(time.perf_counter() - start)
+    return summary(durations)
+
+
+def bench_loading(heiz, myheizung, repeat):
+    """parse time of the data-files versus the file size and format (and the time with the parse cache)"""
+    results = {"load_timesdata": [], "load_urlaubdata": []}
+    for fileformat in ["dict", "lines"]:
+        for entries_per_day in timesfile_sizes:
+            write_timesfile(heiz.timesfile, entries_per_day, fileformat)
+            results["load_timesdata"].append({"format": fileformat, "entries_per_day": entries_per_day,
+                                              "bytes": os.path.getsize(heiz.timesfile),
+                                              **time_loading(myheizung, myheizung.load_timesdata, repeat, False),
+                                              "cached": time_loading(myheizung, myheizung.load_timesdata, repeat, True)})
+        for entries in urlaubfile_sizes:
+            write_urlaubfile(heiz.urlaubfile, entries, fileformat)
+            results["load_urlaubdata"].append({"format": fileformat, "entries": entries,
+                                               "bytes": os.path.getsize(heiz.urlaubfile),
+                                               **time_loading(myheizung, myheizung.load_urlaubdata, repeat, False),
+                                               "cached": time_loading(myheizung, myheizung.load_urlaubdata, repeat, True)})
+    results["load_calendar"] = []
+    calendarfile = os.path.abspath("benchmark_holidays.ics")
+
+    def load_calendar():  # (with the expansion for the window, like at the start)
+        myheizung.load_calendar(calendarfile, "ics_holidays").holiday_on(datetime.now().date())
+
+    for years in calendar_years:
+        write_calendarfile(calendarfile, years)
+        results["load_calendar"].append({"years": years, "bytes": os.path.getsize(calendarfile),
+                                         **time_loading(myheizung, load_calendar, repeat, False),
+                                         "cached": time_loading(myheizung, load_calendar, repeat, True)})
+    return results
+
+
+def bench_tick(heiz, myheizung, repeat):
+    """cost of one check of the times (nothing due / a change due)"""
+    write_timesfile(heiz.timesfile, 50)
+    write_urlaubfile(heiz.urlaubfile, 1000)
+    myheizung.refresh_urlaub()
+    myheizung.refresh_changetimes()
+    idle, due = [], []
+    for _ in range(repeat * 50):
+        start = time.perf_counter()
+        myheizung.check_heiz_statusandactions()
+        idle.append(time.perf_counter() - start)
+    for _ in range(repeat * 10):
+        # (pretend the last check was a day ago, so that all the changes since then are due)
+        myheizung.last_evaluated = datetime.now().replace(second=0, microsecond=0) - timedelta(days=1)
+        myheizung.weekday = myheizung.last_evaluated.isoweekday()
+        myheizung.desired_status = myheizung.status
+        start = time.perf_counter()
+        myheizung.check_heiz_statusandactions()
+        due.append(time.perf_counter() - start)
+    return {"idle": summary(idle), "catchup_one_day": summary(due)}
+
+
+def bench_robot(heiz, myheizung, repeat):
+    """duration of the robot actions, split in the phases connect, send and echo"""
+    results = {}
+    actions = {
+        "raise_now": (lambda: myheizung.raise_now(), "reduziert"),
+        "reduce_now": (lambda: myheizung.reduce_now(), "normal"),
+        "turn_vacation_off": (lambda: myheizung.turn_vacation_off(), "urlaub"),
+    }
+    for connection in ["new", "open"]:
+        for name, (action, status_before) in actions.items():
+            phases = {"total": [], "connect": [], "send": [], "echo": []}
+            failures = 0
+            for _ in range(repeat):
+                if connection == "new":
+                    myheizung.myrobot.disconnect()
+                else:
+                    myheizung.myrobot.connect()
+                myheizung.status = myheizung.desired_status = status_before
+                start = time.perf_counter()
+                response = action()
+                phases["total"].append(time.perf_counter() - start)
+                if response not in (True, "Vakanz ausgeschalt"):
+                    failures += 1
+                for phase in ["connect", "send", "echo"]:
+                    phases[phase].append(myheizung.myrobot.last_timing[phase])
+            results[f"{name}/{connection}_connection"] = {"failures": failures,
+                                                         **{phase: summary(durations) for phase, durations in phases.items()}}
+    return results
+
+
+def bench_fleet(heiz, repeat, press_latency, sizes=(1, 4, 16)):
+    """per-unit duration of a raise, when all the units of the fleet are raised at the same time"""
+    from heizfleet import HeizFleet
+    results = {}
+    for size in sizes:
+        for variant in ["all_answer", "one_hanging"] if size > 1 else ["all_answer"]:
+            fakerobots = [FakeRobot(press_latency=press_latency,
+                                    faults=["hang"] * 1000 if variant == "one_hanging" and number == 0 else None)
+                          for number in range(size)]
+            units = [{"name": f"unit{number}", "robot_ip": "127.0.0.1", "robot_port": fakerobot.start(),
+                      "directory": f"fleet{size}_{variant}/unit{number}", "api_port": None}
+                     for number, fakerobot in enumerate(fakerobots)]
+            fleet = HeizFleet(units)
+            heizungen = [daemon.myheizung for daemon in fleet.units.values()]
+            durations = []
+            if variant == "one_hanging":  # (the robot of the first unit never answers - its raise runs until the timeout)
+                heizungen[0].status = heizungen[0].desired_status = "reduziert"
+                heizungen[0].request_raise()
+                heizungen[0].executor.submit(heizungen[0].reconcile)
+            for _ in range(repeat):
+                start = time.perf_counter()
+                futures = []
+                for myheizung in heizungen[1 if variant == "one_hanging" else 0:]:
+                    myheizung.status = myheizung.desired_status = "reduziert"
+                    myheizung.request_raise()
+                    futures.append(myheizung.executor.submit(myheizung.reconcile))
+                for future in futures:
+                    future.result()
+                    durations.append(time.perf_counter() - start)
+            results[f"{size}_units/{variant}"] = summary(durations)
+            # (the fake robots are stopped first, which releases the hanging raise - the commands of the units have
+            #   to be finished before their directories are removed)
+            for fakerobot in fakerobots:
+                fakerobot.stop()
+            for daemon in fleet.units.values():
+                daemon.shutdown()
+    return results
+
+
+def bench_startup(robot_port, workdir):
+    """time from the start of the program until the first frame of the GUI is drawn (in a separate process)"""
+    code = f"""
+import time
+start = time.perf_counter()
+import sys
+sys.path.insert(0, {repodir!r})
+import Heizsteierung as heiz
+heiz.myrobot_ip = "127.0.0.1"
+heiz.myrobot_port = {robot_port}
+import kivygui
+from kivy.core.window import Window
+app = kivygui.KivyGui()
+def first_frame(*args):
+    print("FIRSTFRAME", time.perf_counter() - start, flush=True)
+    app.stop()
+app.bind(on_start=lambda *args: Window.bind(on_flip=first_frame))
+app.run()
+"""
+    try:
+        completed = subprocess.run([sys.executable, "-c", code], cwd=workdir, capture_output=True, text=True, timeout=120)
+    except subprocess.TimeoutExpired:
+        return {"skipped": "timeout"}
+    for line in completed.stdout.splitlines():
+        if line.startswith("FIRSTFRAME"):
+            return {"first_frame_ms": float(line.split()[1]) * 1000}
+    lastlines = (completed.stderr.strip().splitlines() or ["no output"])[-1]
+    return {"skipped": f"no frame drawn (returncode {completed.returncode}): {lastlines}"}
+
+
+def compare(results, oldresults, path=""):
+    """prints the relative change of all the median/mean values compared to an older result file"""
+    if isinstance(results, dict) and isinstance(oldresults, dict):
+        for key in results:
+            if key in oldresults:
+                compare(results[key], oldresults[key], f"{path}/{key}")
+    elif isinstance(results, list) and isinstance(oldresults, list):
+        for pos, (new, old) in enumerate(zip(results, oldresults)):
+            compare(new, old, f"{path}[{pos}]")
+    elif path.endswith(("median_ms", "first_frame_ms")) and isinstance(results, (int, float)) and oldresults:
+        change = (results - oldresults) / oldresults * 100
+        print(f"{path}: {oldresults:.3f} -> {results:.3f} ms ({change:+.1f} %)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for the heating control")
+    parser.add_argument("--output", default="benchmark_results.json", help="file for the results (JSON)")
+    parser.add_argument("--compare", default=None, help="older result file to compare with")
+    parser.add_argument("--repeat", type=int, default=20, help="repetitions per measurement")
+    parser.add_argument("--press-latency", type=float, default=0.0, help="seconds per button press of the fake robot")
+    parser.add_argument("--no-startup", action="store_true", help="skip the startup benchmark (GUI)")
+    parser.add_argument("--no-fleet", action="store_true", help="skip the fleet benchmark")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output)
+    os.environ["KIVY_NO_ARGS"] = "1"  # (otherwise kivy tries to read the arguments of the benchmark at the import)
+
+    fakerobot = FakeRobot(press_latency=args.press_latency)
+    robot_port = fakerobot.start()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)  # (the app uses relative paths for its data- and log-files)
+        sys.path.insert(0, repodir)
+        importstart = time.perf_counter()
+        import Heizsteierung as heiz
+        importduration = time.perf_counter() - importstart
+        heiz.myrobot_ip = "127.0.0.1"
+        heiz.myrobot_port = robot_port
+        myheizung = heiz.Heizung()
+
+        results = {
+            "version": heiz.versionnr,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "settings": {"repeat": args.repeat, "press_latency": args.press_latency},
+            "import_ms": importduration * 1000,
+            "loading": bench_loading(heiz, myheizung, args.repeat),
+            "tick": bench_tick(heiz, myheizung, args.repeat),
+            "robot": bench_robot(heiz, myheizung, args.repeat),
+        }
+        if not args.no_fleet:
+            results["fleet"] = bench_fleet(heiz, args.repeat, args.press_latency)
+        if not args.no_startup:
+            results["startup"] = bench_startup(robot_port, workdir)
+        myheizung.executor.shutdown(wait=False)
+    fakerobot.stop()
+
+    with open(output, "w") as resultfile:
+        json.dump(results, resultfile, indent=2)
+    print(f"results written to {output}")
+    if args.compare is not None:
+        with open(args.compare) as oldfile:
+            compare(results, json.load(oldfile))
+
+
+if __name__ == "__main__":
+    main()
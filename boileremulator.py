@@ -0,0 +1,226 @@
+"""
+Emulator of the boiler control (Viessmann Vitodens 200-W): carries out button sequences like the boiler would, and
+shows the resulting screen, Betriebsprogramm and 'länger warm' - to check what a sequence does without the real boiler.
+
+The menu logic is the model of boilermenu.py (the same one the sequences are computed with); the emulator adds what the
+real display does on its own: it goes back to the base display after screen_timeout seconds without presses.
+The emulator can be put behind the fake robot (FakeRobot(boiler=BoilerEmulator(...)), or python fakerobot.py --boiler
+reduziert), so that the whole control (Heizung, robot protocol) runs against it.
+
+Use from the terminal:
+    python boileremulator.py run "1 3 3 4 4 4 3 4 4." --status normal   shows the state after the sequence
+    python boileremulator.py verify [--runs 500] [--seed 1]             checks all the sequences of the control (the
+        fixed ones, the compiled ones from every possible screen, and random changes of a Heizung against the fake
+        robot with the emulator) - the exit code is 1 if a sequence doesn't do what it should
+"""
+
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from boilermenu import (MENU, status_settings, base_state, all_screens, press, run_sequence,
+                        compile_sequence, as_message, buttons)
+
+# the names for the output:
+settingnames = {"heizen_ww": "Heizen und Warmwasser", "abschalt": "Abschaltbetrieb"}
+
+
+def status_of(mode, laengerwarm):
+    """the state of the control for the settings of the boiler (None if there is none, z.B. 'länger warm' while the
+    heating circuit is off can't happen)"""
+    for status, settings in status_settings.items():
+        if settings == (mode, laengerwarm):
+            return status
+    return None
+
+
+class BoilerEmulator():
+    """The boiler control: its state (MenuState), changed by the button presses. clock returns the current time in
+    seconds (for the screen timeout - a simulated clock can be given)."""
+
+    def __init__(self, status="reduziert", screen_timeout=300, clock=time.monotonic):
+        self.state = base_state(*status_settings[status])
+        self.screen_timeout = screen_timeout
+        self.clock = clock
+        self.lastpress = None  # time (clock) of the last press
+        self.presses = 0  # number of presses since the start
+        self.lock = threading.Lock()  # (the fake robot carries out the messages of several connections)
+
+    def press(self, button):
+        """presses one button (1-4, other characters are ignored like by the robot)"""
+        if button not in buttons:
+            return
+        with self.lock:
+            now = self.clock()
+            if self.lastpress is not None and now - self.lastpress >= self.screen_timeout:
+                self.state = base_state(self.state.mode, self.state.laengerwarm)
+            self.state = press(self.state, button)
+            self.lastpress = now
+            self.presses += 1
+
+    def run(self, message_text):
+        """presses the buttons of the message (z.B. "1 4 4 4 4."), returns the state after it"""
+        for button in message_text.rstrip(".").split():
+            self.press(button)
+        return self.state
+
+    @property
+    def status(self):
+        """the state of the control that corresponds to the settings of the boiler ("normal", "reduziert", "urlaub")"""
+        return status_of(self.state.mode, self.state.laengerwarm)
+
+    def describe(self):
+        state = self.state
+        screen = state.screen
+        name = screen.partition(":")[0]
+        if MENU[name]["kind"] == "list" and len(MENU[name]["entries"]) > 0:
+            cursor = state.basecursor if name == "grundanzeige" else state.cursor
+            screen += f" (cursor on {MENU[name]['entries'][cursor]})"
+        elif screen.endswith(":select") or screen.endswith(":confirm"):
+            if MENU[name]["kind"] == "choice":
+                screen += f" ({settingnames[MENU[name]['options'][state.cursor]]})"
+        return (f"screen: {screen}, Betriebsprogramm: {settingnames[state.mode]}, länger warm: "
+                f"{'an' if state.laengerwarm else 'aus'} -> status {self.status}")
+
+
+class SimulatedClock():
+    """a clock that only moves when it's told to (for the screen timeouts in the verification)"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def verify_fixed():
+    """The fixed sequences of Heizsteierung, from the base display. Returns (number of runs, list of problems)."""
+    from Heizsteierung import toggle_message, urlaubon_message, urlauboff_message
+    expected = [
+        (toggle_message, "normal", "reduziert"), (toggle_message, "reduziert", "normal"),
+        (urlaubon_message, "normal", "urlaub"), (urlaubon_message, "reduziert", "urlaub"),
+        (urlauboff_message, "urlaub", "normal"),
+        ("1 3 2 4 1 1.", "normal", "normal"), ("1 3 2 4 1 1.", "reduziert", "reduziert"),  # (test_robot)
+        ("1 3 2 4 1 1.", "urlaub", "urlaub"),
+    ]
+    problems = []
+    for message_text, status_before, status_after in expected:
+        boiler = BoilerEmulator(status_before)
+        boiler.run(message_text)
+        if boiler.status != status_after:
+            problems.append(f"'{message_text}' from {status_before}: {boiler.describe()} (expected {status_after})")
+    return len(expected), problems
+
+
+def verify_compiled():
+    """The compiled sequences for every change of the state, from every screen (alone, together with the base display
+    - like after screen_keep seconds - and all the screens at once). Returns (number of runs, list of problems)."""
+    runs = 0
+    problems = []
+    for status_before, settings_before in status_settings.items():
+        screens = sorted(all_screens(*settings_before))
+        base = base_state(*settings_before)
+        beliefs = [[state] for state in screens] + [[state, base] for state in screens] + [screens]
+        for status_after, settings_after in status_settings.items():
+            if status_after == status_before:
+                continue
+            for belief in beliefs:
+                sequence = compile_sequence(belief, *settings_after)
+                if sequence is None:
+                    problems.append(f"no sequence {status_before} -> {status_after} from {len(belief)} screen(s), "
+                                    f"z.B. {belief[0].screen}")
+                    continue
+                for state in belief:
+                    runs += 1
+                    after = run_sequence(state, as_message(sequence))
+                    if status_of(after.mode, after.laengerwarm) != status_after:
+                        problems.append(f"'{as_message(sequence)}' from {state}: {after} (expected {status_after})")
+    return runs, problems
+
+
+def verify_heizung(runs, seed, screen_timeouts=(30, 300, 900)):
+    """Random changes of the state by a Heizung (with its tracking of the screen and the compiled sequences), against
+    the fake robot with the emulator, with random pauses (simulated) in between - after every change, the boiler has to
+    be in the state the Heizung believes. Returns (number of changes, list of problems)."""
+    from fakerobot import FakeRobot
+    import Heizsteierung as heiz
+    heiz.compile_sequences = True  # (the compiled sequences are the ones to verify)
+    randomness = random.Random(seed)
+    problems = []
+    changes = 0
+    with tempfile.TemporaryDirectory() as datadir:
+        for screen_timeout in screen_timeouts:
+            clock = SimulatedClock()
+            boiler = BoilerEmulator("reduziert", screen_timeout, clock)
+            fakerobot = FakeRobot(boiler=boiler)
+            fakerobot.start()
+            myheizung = heiz.Heizung(robotip="127.0.0.1", robotport=fakerobot.port, datadir=datadir)
+            myheizung.menu.clock = clock
+            myheizung.menu.lost()  # (the start with the simulated clock)
+            myheizung.status = myheizung.desired_status = "reduziert"
+            for _ in range(runs):
+                clock.advance(randomness.choice([0, 1, 10, 40, 200, 600, 2000]))
+                if randomness.random() < 0.1:
+                    myheizung.test_robot()
+                else:
+                    myheizung.request_status(randomness.choice(list(status_settings)))
+                    myheizung.reconcile()
+                changes += 1
+                if boiler.status != myheizung.status:
+                    problems.append(f"screen timeout {screen_timeout} s: the Heizung believes {myheizung.status}, "
+                                    f"but the boiler is at {boiler.describe()} (after '{fakerobot.received[-1]}')")
+                    boiler.state = base_state(*status_settings[myheizung.status])  # (to go on with the same state)
+            myheizung.executor.shutdown(wait=False)
+            myheizung.myrobot.disconnect()
+            fakerobot.stop()
+    return changes, problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emulator of the boiler control (menu of the Vitodens 200-W)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    runparser = commands.add_parser("run", help="carry out a button sequence and show the state after it")
+    runparser.add_argument("sequence", help='the buttons, z.B. "1 4 4 4 4."')
+    runparser.add_argument("--status", default="reduziert", choices=list(status_settings), help="the state before")
+    runparser.add_argument("--screen", default="grundanzeige", help="the screen before (z.B. laengerwarm)")
+    verifyparser = commands.add_parser("verify", help="check all the sequences of the control")
+    verifyparser.add_argument("--runs", type=int, default=500, help="random changes per screen timeout (end to end)")
+    verifyparser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        boiler = BoilerEmulator(args.status)
+        if args.screen.partition(":")[0] not in MENU:
+            parser.error(f"unknown screen {args.screen} (possible: {', '.join(MENU)})")
+        boiler.state = boiler.state._replace(screen=args.screen)
+        boiler.run(args.sequence)
+        print(boiler.describe())
+        return
+
+    failed = False
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)  # (the app writes its log-files to the current directory)
+        import Heizsteierung  # (loaded before the time measurement)
+        for name, check in [("fixed sequences", verify_fixed), ("compiled sequences", verify_compiled),
+                            ("Heizung end to end", lambda: verify_heizung(args.runs, args.seed))]:
+            start = time.perf_counter()
+            runs, problems = check()
+            duration = time.perf_counter() - start
+            print(f"{name}: {runs} runs in {duration:.2f} s ({runs / duration:.0f}/s), {len(problems)} problems")
+            for problem in problems[:20]:
+                print(f"    {problem}")
+            failed = failed or len(problems) > 0
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
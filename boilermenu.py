@@ -0,0 +1,277 @@
+"""
+Model of the menu of the boiler control (Viessmann Vitodens 200-W), and compiler for the shortest button sequences.
+
+The robot presses 4 buttons of the boiler control:
+    1 = back (one level up - in the base display it does nothing)
+    2 = up, 3 = down (moves the cursor in a list, it stays at the first/last entry)
+    4 = OK (opens the entry under the cursor, or confirms)
+The part of the menu that is used (MENU below) was derived from the sequences that are used since the beginning, and it
+reproduces what they do (see Heizsteierung.py):
+    toggle_message    "1 4 4 4 4."  base display -> Komfort -> länger warm -> change? -> confirmed
+    urlaubon_message  "1 3 3 4 4 4 3 4 4."  base display, 2 x down to Heizkreis -> Betriebsprogramm -> select
+                      -> 'Abschaltbetrieb' -> change? -> confirmed
+    urlauboff_message the same with up to 'Heizen und Warmwasser', back to the base display (1 1), 2 x up to Komfort,
+                      and länger warm on
+The display goes back to the base display (with the cursor on the first entry) if no button is pressed for a while
+(screen_timeout), which is why the sequences can start at the base display.
+
+The state of the model (MenuState) is the screen with its cursors, and the settings of the boiler (Betriebsprogramm and
+länger warm). compile_sequence() searches (breadth-first) the shortest button sequence that brings the boiler from a
+set of possible states to the wanted settings - if the screen is known (z.B. the robot pressed the last buttons a few
+seconds ago), the reset at the beginning isn't needed, and if it's not known exactly, the sequence works for every
+possible screen. MenuTracker keeps track of the possible screens between the robot commands.
+"""
+
+
+import collections
+import functools
+import heapq
+import time
+
+from robottiming import count_presses
+
+BACK, UP, DOWN, OK = "1", "2", "3", "4"
+buttons = [BACK, UP, DOWN, OK]
+
+# the screens of the menu: "list" (entries that open other screens), "switch" (a setting that is on or off) and
+#   "choice" (a setting with several options). Every screen except the base display has a parent (the screen that
+#   button 1 goes back to).
+MENU = {
+    "grundanzeige": {"kind": "list", "entries": ["komfort", "info", "heizkreis"], "parent": None},
+    "komfort": {"kind": "list", "entries": ["laengerwarm"], "parent": "grundanzeige"},
+    "laengerwarm": {"kind": "switch", "setting": "laengerwarm", "parent": "komfort"},
+    "info": {"kind": "list", "entries": [], "parent": "grundanzeige"},
+    "heizkreis": {"kind": "list", "entries": ["betriebsprogramm"], "parent": "grundanzeige"},
+    "betriebsprogramm": {"kind": "choice", "setting": "mode", "options": ["heizen_ww", "abschalt"], "parent": "heizkreis"},
+}
+
+# the settings of the boiler for the states of the control:
+status_settings = {
+    "normal": ("heizen_ww", True),
+    "reduziert": ("heizen_ww", False),
+    "urlaub": ("abschalt", False),
+}
+
+# screen: name of the screen, with ":select" (choosing an option) or ":confirm" (the question if the setting should be
+#   changed); basecursor: the cursor of the base display (it stays when a submenu is opened); cursor: the cursor of the
+#   other screens (list entry or option); mode: the Betriebsprogramm; laengerwarm: True/False
+MenuState = collections.namedtuple("MenuState", "screen basecursor cursor mode laengerwarm")
+
+
+def base_state(mode, laengerwarm):
+    """the state after the screen timeout (base display, cursor on the first entry)"""
+    return MenuState("grundanzeige", 0, 0, mode, laengerwarm)
+
+
+def all_screens(mode, laengerwarm):
+    """all the states the menu can be in, with the given settings (if the screen isn't known at all)"""
+    states = set()
+    for name, screen in MENU.items():
+        for basecursor in range(len(MENU["grundanzeige"]["entries"])):
+            if screen["kind"] == "list":
+                for cursor in range(max(len(screen["entries"]), 1)):
+                    states.add(MenuState(name, basecursor, cursor if name != "grundanzeige" else 0, mode, laengerwarm))
+            elif screen["kind"] == "switch":
+                states.add(MenuState(name, basecursor, 0, mode, laengerwarm))
+                states.add(MenuState(name + ":confirm", basecursor, 0, mode, laengerwarm))
+            else:
+                states.add(MenuState(name, basecursor, 0, mode, laengerwarm))
+                for cursor in range(len(screen["options"])):
+                    states.add(MenuState(name + ":select", basecursor, cursor, mode, laengerwarm))
+                    states.add(MenuState(name + ":confirm", basecursor, cursor, mode, laengerwarm))
+    return states
+
+
+def go_back(state, name):
+    """the state after button 1 on the screen name (back to the parent, with the cursor on the entry of name)"""
+    parent = MENU[name]["parent"]
+    if parent is None:
+        return state
+    if parent == "grundanzeige":
+        return state._replace(screen=parent, cursor=0)
+    return state._replace(screen=parent, cursor=MENU[parent]["entries"].index(name))
+
+
+def press(state, button):
+    """the state after pressing the button"""
+    name, _, step = state.screen.partition(":")
+    screen = MENU[name]
+    if screen["kind"] == "list":
+        entries = screen["entries"]
+        cursor = state.basecursor if name == "grundanzeige" else state.cursor
+        if button == BACK:
+            return go_back(state, name)
+        if button in (UP, DOWN):
+            cursor = max(0, min(len(entries) - 1, cursor + (1 if button == DOWN else -1))) if len(entries) > 0 else 0
+            if name == "grundanzeige":
+                return state._replace(basecursor=cursor)
+            return state._replace(cursor=cursor)
+        if len(entries) == 0:
+            return state
+        return state._replace(screen=entries[cursor], cursor=0)
+    if screen["kind"] == "switch":
+        if step == "":
+            if button == BACK:
+                return go_back(state, name)
+            if button == OK:
+                return state._replace(screen=name + ":confirm")
+            return state
+        # the question if the setting should be changed:
+        if button == BACK:
+            return state._replace(screen=name)
+        if button == OK:
+            changed = state._replace(screen=name)
+            if screen["setting"] == "laengerwarm" and state.mode == "abschalt":
+                return changed  # ('länger warm' doesn't exist while the heating circuit is off)
+            return changed._replace(**{screen["setting"]: not getattr(state, screen["setting"])})
+        return state
+    # choice:
+    options = screen["options"]
+    if step == "":
+        if button == BACK:
+            return go_back(state, name)
+        if button == OK:  # (the cursor starts at the option that is set)
+            return state._replace(screen=name + ":select", cursor=options.index(getattr(state, screen["setting"])))
+        return state
+    if step == "select":
+        if button == BACK:
+            return state._replace(screen=name, cursor=0)
+        if button in (UP, DOWN):
+            return state._replace(cursor=max(0, min(len(options) - 1, state.cursor + (1 if button == DOWN else -1))))
+        return state._replace(screen=name + ":confirm")
+    # confirm:
+    if button == BACK:
+        return state._replace(screen=name + ":select")
+    if button == OK:
+        changed = state._replace(screen=name, cursor=0, **{screen["setting"]: options[state.cursor]})
+        if screen["setting"] == "mode" and options[state.cursor] == "abschalt":
+            changed = changed._replace(laengerwarm=False)  # (switching the heating circuit off ends 'länger warm')
+        return changed
+    return state
+
+
+def run_sequence(state, message_text):
+    """the state after the buttons of the message (z.B. "1 4 4 4 4.")"""
+    for button in message_text.rstrip(".").split():
+        if button in buttons:
+            state = press(state, button)
+    return state
+
+
+def reaches(state, mode, laengerwarm):
+    return state.mode == mode and state.laengerwarm == laengerwarm
+
+
+@functools.lru_cache(maxsize=4096)
+def presses_needed(state, mode, laengerwarm):
+    """the number of presses needed (at least) from the state to the settings, or None if they can't be reached"""
+    if reaches(state, mode, laengerwarm):
+        return 0
+    visited = {state}
+    queue = collections.deque([(state, 0)])
+    while queue:
+        current, presses = queue.popleft()
+        for button in buttons:
+            following = press(current, button)
+            if following in visited:
+                continue
+            if reaches(following, mode, laengerwarm):
+                return presses + 1
+            visited.add(following)
+            queue.append((following, presses + 1))
+    return None
+
+
+def compile_sequence(states, mode, laengerwarm, maxpresses=30):
+    """Returns the shortest list of buttons that brings every one of the possible states to the settings (mode,
+    laengerwarm), or None if there is none with at most maxpresses presses.
+    The search (A*) goes over the sets of possible states; the presses needed by the farthest state alone are the
+    estimate of the remaining presses (no sequence can be shorter), so that only few sets are looked at."""
+    start = frozenset(states)
+
+    def estimate(belief):
+        needed = [presses_needed(state, mode, laengerwarm) for state in belief]
+        return None if None in needed else max(needed)
+
+    if estimate(start) is None:
+        return None
+    shortest = {start: 0}  # possible states -> the fewest presses found to reach them
+    # (estimated total presses, buttons, possible states - of the equally short sequences, the one with the smallest
+    #   buttons comes first, z.B. the reset with "1 1 1 1" at the beginning)
+    queue = [(estimate(start), [], start)]
+    while queue:
+        _, sequence, belief = heapq.heappop(queue)
+        if len(sequence) > shortest[belief]:
+            continue  # (reached with fewer presses in the meantime)
+        if all(reaches(state, mode, laengerwarm) for state in belief):
+            return sequence
+        for button in buttons:
+            following = frozenset(press(state, button) for state in belief)
+            if shortest.get(following, maxpresses + 1) <= len(sequence) + 1:
+                continue
+            shortest[following] = len(sequence) + 1
+            remaining = estimate(following)
+            if remaining is None or len(sequence) + 1 + remaining > maxpresses:
+                continue
+            heapq.heappush(queue, (len(sequence) + 1 + remaining, sequence + [button], following))
+    return None
+
+
+def as_message(sequence):
+    """the robot message for the list of buttons"""
+    return " ".join(sequence) + "."
+
+
+class MenuTracker():
+    """Keeps track of the possible screens of the boiler control between the robot commands, and compiles the shortest
+    message for a change of the state. The settings of the boiler are taken from the state of the control (status).
+    screen_timeout: the display is surely back at the base display after this many seconds without presses, and
+    surely not yet before screen_keep seconds. clock returns the current time in seconds (z.B. a simulated clock for
+    the verification with the emulator, see boileremulator)."""
+
+    def __init__(self, screen_keep=30, screen_timeout=900, clock=time.monotonic):
+        self.screen_keep = screen_keep
+        self.screen_timeout = screen_timeout
+        self.clock = clock
+        self.screens = set()  # the possible states after the last press (only the screen part counts)
+        self.lastpress = None  # time (clock) of the last button press of the robot
+        # at the start, the screen isn't known (someone could have used the boiler control, or the program was
+        #   restarted in the middle of a sequence) - that's why the fixed sequences start with 1:
+        self.lost()
+
+    def possible_states(self, status, now=None):
+        """the possible states of the menu now, with the settings of the status"""
+        mode, laengerwarm = status_settings[status]
+        if now is None:
+            now = self.clock()
+        if now - self.lastpress >= self.screen_timeout:
+            return {base_state(mode, laengerwarm)}
+        states = {state._replace(mode=mode, laengerwarm=laengerwarm) for state in self.screens}
+        if now - self.lastpress >= self.screen_keep:  # (the display could be back at the base display, or not yet)
+            states.add(base_state(mode, laengerwarm))
+        return states
+
+    def message_to(self, status, desired_status):
+        """the shortest robot message from the status to the desired status, or None if the status is unknown"""
+        if status not in status_settings or desired_status not in status_settings:
+            return None
+        sequence = compile_sequence(self.possible_states(status), *status_settings[desired_status])
+        if sequence is None or len(sequence) == 0:
+            return None
+        return as_message(sequence)
+
+    def pressed(self, message_text, status):
+        """called after the robot carried out the message (correct echo), with the status before it"""
+        if count_presses(message_text) == 0:
+            return
+        if status not in status_settings:
+            self.lost()
+            return
+        self.screens = {run_sequence(state, message_text) for state in self.possible_states(status)}
+        self.lastpress = self.clock()
+
+    def lost(self):
+        """called when it's unknown what the robot pressed (z.B. no correct echo) - the display could be at any screen
+        (until the screen timeout)"""
+        self.screens = all_screens(None, None)
+        self.lastpress = self.clock()
@@ -0,0 +1,99 @@
+"""
+Circuit breaker for the connection to the robot: while the robot can't be reached, the commands fail at once, instead
+of every command waiting for the connect timeout.
+
+The states:
+    closed     normal operation - the failures in a row are counted, after failure_threshold the breaker opens
+    open       the commands fail at once (without trying to connect); after reset_timeout seconds, a probe is done
+               in the background
+    half_open  the probe is running (the commands still fail at once): if it works, the breaker closes, otherwise it
+               opens again and the time until the next probe is doubled (up to max_reset_timeout)
+The probe is a function that returns True if the robot can be reached again (see Robot.probe). The listeners are
+called with the new and the previous state after every change (from the thread that caused it - the probes run in
+their own thread).
+"""
+
+
+import logging
+import threading
+import time
+
+
+class CircuitBreaker():
+    """Counts the failures of the robot connection and decides if a command may try to connect (see above)."""
+
+    def __init__(self, probe, failure_threshold=3, reset_timeout=30, max_reset_timeout=600):
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout  # seconds until the first probe
+        self.max_reset_timeout = max_reset_timeout
+        self.state = "closed"
+        self.failures = 0  # failures in a row
+        self.waiting = reset_timeout  # seconds until the next probe (doubled after every failed probe)
+        self.probe_at = None  # time.monotonic() of the next probe (while the breaker is open)
+        self.listeners = []  # functions called with the new and the previous state
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def allow(self):
+        """True if a command may try to reach the robot (the breaker is closed)"""
+        return self.state == "closed"
+
+    def record(self, success):
+        """takes into account the result of a command (True: the robot answered, False: it couldn't be reached)"""
+        with self.lock:
+            if success:
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.state != "closed" or self.failures < self.failure_threshold:
+                return
+            self.state = "open"
+            self.waiting = self.reset_timeout
+            self.probe_at = time.monotonic() + self.waiting
+            self.thread = threading.Thread(target=self.run_probes, name="circuitbreaker", daemon=True)
+            self.thread.start()
+        self.notify("open", "closed")
+
+    def retry_in(self):
+        """seconds until the next probe (0 if the breaker is closed or the probe is running)"""
+        if self.state != "open" or self.probe_at is None:
+            return 0
+        return max(self.probe_at - time.monotonic(), 0)
+
+    def run_probes(self):
+        """waits (in the background) until the next probe is due, and probes until the robot can be reached again"""
+        while not self.stopped.wait(self.retry_in()):
+            with self.lock:
+                self.state = "half_open"
+            self.notify("half_open", "open")
+            try:
+                reachable = self.probe() == True
+            except Exception:
+                logging.exception("problem while probing the robot")
+                reachable = False
+            with self.lock:
+                if reachable:
+                    self.state = "closed"
+                    self.failures = 0
+                    self.probe_at = None
+                else:
+                    self.state = "open"
+                    self.waiting = min(self.waiting * 2, self.max_reset_timeout)
+                    self.probe_at = time.monotonic() + self.waiting
+                state = self.state
+            self.notify(state, "half_open")
+            if reachable:
+                break
+
+    def notify(self, state, previous):
+        for listener in list(self.listeners):
+            try:
+                listener(state, previous)
+            except Exception:  # (a listener mustn't stop the probes)
+                logging.exception("problem in a listener of the circuit breaker")
+
+    def stop(self):
+        """ends the probes (z.B. when the program is closed)"""
+        self.stopped.set()
@@ -0,0 +1,74 @@
+"""
+Execution of the (slow) robot commands in the background.
+
+A robot command can take up to ca. 18 seconds (for example the sequence to turn the vacation off). If it were carried
+out directly by the caller (e.g. a button of the Kivy-GUI), the caller would be blocked the whole time - in the GUI the
+clock and the status labels would stop updating.
+The CommandExecutor runs the commands one after the other in a single worker thread (so that two robot sequences can
+never interleave), and returns a future for every command. When a command is done, its callback is passed to a
+dispatcher, which decides in which thread the callback runs (for Kivy: the main thread, via the Kivy Clock).
+"""
+
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+errorlogger = logging.getLogger("errorlog")  # the same logger as in Heizsteierung (it writes to the error-logfile)
+
+
+def run_directly(callback):
+    """default dispatcher: runs the callback directly in the worker thread (for callers without a GUI)"""
+    callback()
+
+
+class CommandExecutor():
+    """Runs commands (functions) one after the other in a worker thread."""
+
+    def __init__(self, name="heizcommands", dispatcher=run_directly, logger=None):
+        # only 1 worker, so the commands are carried out in the order they were submitted, and never at the same time:
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self.dispatcher = dispatcher  # used for the callbacks if submit() doesn't get its own dispatcher
+        self.lock = threading.Lock()
+        self.pending = 0  # number of submitted commands that are not finished yet
+        self.current = None  # description of the command that is running at the moment (None if idle)
+        self.errorlogger = logger if logger is not None else errorlogger  # (z.B. the logger of the unit, see heizlogging.UnitLogger)
+
+    def submit(self, function, *args, on_done=None, dispatcher=None, description=None):
+        """Submits the function (with its arguments) to the worker thread, and returns a future.
+        on_done is called with the future when the command is finished (also if it raised an exception), through the
+        dispatcher (the one of the executor, or the one passed here)."""
+        if description is None:
+            description = getattr(function, "__name__", str(function))
+        if dispatcher is None:
+            dispatcher = self.dispatcher
+        with self.lock:
+            self.pending += 1
+
+        def run():
+            self.current = description
+            try:
+                return function(*args)
+            finally:
+                self.current = None
+
+        future = self.pool.submit(run)
+        future.add_done_callback(lambda finished: self._finished(finished, on_done, dispatcher, description))
+        return future
+
+    def _finished(self, future, on_done, dispatcher, description):
+        """called in the worker thread when a command is done"""
+        with self.lock:
+            self.pending -= 1
+        if future.exception() is not None:
+            self.errorlogger.error(f"De Befeel {description} huet eng Exception ausgeléist", exc_info=future.exception())
+        if on_done is not None:
+            dispatcher(lambda: on_done(future))
+
+    def busy(self):
+        """True as long as there are submitted commands that are not finished yet"""
+        return self.pending > 0
+
+    def shutdown(self, wait=True):
+        """Stops the worker thread (after the submitted commands are done, if wait is True)."""
+        self.pool.shutdown(wait=wait)
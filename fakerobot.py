@@ -0,0 +1,218 @@
+"""
+Fake robot: a local stand-in for the robot, to test the heating control without the real boiler.
+
+It speaks the same protocol as the robot (see Robot.send_message in Heizsteierung.py): it receives a message (the
+buttons to press, separated by spaces and ending with a dot, z.B. "1 4 4 4 4."), "presses" the buttons (waits for the
+configured time per button), and sends the message back as echo. Several messages can be sent over the same
+connection, also several at once (a batch, see Robot.send_batch): they are carried out one after the other, and every
+message gets its echo as soon as it's done. With pipelining=False (--no-pipeline), the fake robot behaves like a robot
+that can only take one message at a time: if a message arrives before the echo of the previous one was sent, the
+connection is dropped.
+
+To measure and test how the heating control handles a slow or faulty robot, the fake robot can:
+- wait a given time per button press (press_latency) and before answering the first message of a new connection
+  (connect_delay - the TCP connection itself is accepted by the operating system, so the delay shows up on the first
+  answer),
+- drop the connection without answering ("drop"), answer only with a part of the echo and close the connection
+  ("partial"), answer with a wrong echo ("garble"), or never answer ("hang").
+The faults are chosen randomly (with the given rates), or from a fixed list (faults, one entry per message, "ok" for a
+normal answer) to reproduce a situation.
+With a boiler emulator (boiler, see boileremulator.py - or --boiler with the state of the boiler at the start), the
+buttons of every message are also pressed on the emulated boiler control, so that the state of the boiler can be
+compared with the state the control believes.
+
+Use it from the terminal (z.B. python fakerobot.py --port 2323 --press-latency 1 --drop-rate 0.1) and set myrobot_ip
+and myrobot_port in Heizsteierung.py accordingly - or start it from a script with FakeRobot(...).start().
+"""
+
+
+import argparse
+import logging
+import random
+import select
+import socket
+import threading
+import time
+
+from robottiming import count_presses
+
+faultkinds = ["ok", "drop", "partial", "garble", "hang"]
+
+
+class FakeRobot():
+    """TCP server that answers like the robot (echo of the message), with configurable latency and faults."""
+
+    def __init__(self, host="127.0.0.1", port=0, press_latency=0.0, connect_delay=0.0, drop_rate=0.0,
+                 partial_rate=0.0, garble_rate=0.0, hang_rate=0.0, faults=None, seed=None, pipelining=True, boiler=None):
+        self.host = host
+        self.port = port  # (0: the operating system chooses a free port, see self.port after start())
+        self.press_latency = press_latency  # seconds per button press
+        self.connect_delay = connect_delay  # seconds before the first answer of a new connection
+        self.rates = {"drop": drop_rate, "partial": partial_rate, "garble": garble_rate, "hang": hang_rate}
+        self.faults = list(faults) if faults is not None else None  # fixed sequence of faults (one per message)
+        self.random = random.Random(seed)
+        self.pipelining = pipelining  # if False, a message that arrives while another one is carried out is a fault
+        self.boiler = boiler  # BoilerEmulator that gets the button presses (None: the buttons aren't emulated)
+        self.received = []  # all received messages (in the order they arrived)
+        self.connections = 0  # number of accepted connections
+        self.max_queued = 0  # the largest number of messages that were waiting at the same time (batch size)
+        self.open_connections = set()  # (closed by stop(), also the ones that hang)
+        self.server = None
+        self.running = False
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Starts the server in a background thread, and returns the port it listens on."""
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind((self.host, self.port))
+        self.server.listen()
+        self.port = self.server.getsockname()[1]
+        self.running = True
+        threading.Thread(target=self.accept_connections, daemon=True).start()
+        logging.info(f"fake robot listens on {self.host}:{self.port}")
+        return self.port
+
+    def stop(self):
+        """Stops the server and closes the open connections (a client waiting for a hanging answer gets the end of
+        the connection)."""
+        self.running = False
+        if self.server is not None:
+            try:
+                self.server.shutdown(socket.SHUT_RDWR)  # (wakes up the accept of the thread)
+            except OSError:
+                pass
+            self.server.close()
+        with self.lock:
+            connections = list(self.open_connections)
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:  # (already closed)
+                pass
+
+    def next_fault(self):
+        """chooses the fault for the next message ("ok" for a normal answer)"""
+        with self.lock:
+            if self.faults is not None:
+                return self.faults.pop(0) if len(self.faults) > 0 else "ok"
+            chance = self.random.random()
+        for kind, rate in self.rates.items():
+            if chance < rate:
+                return kind
+            chance -= rate
+        return "ok"
+
+    def accept_connections(self):
+        while self.running:
+            try:
+                connection, address = self.server.accept()
+            except OSError:  # the server was closed
+                break
+            with self.lock:
+                self.connections += 1
+            logging.debug(f"connection from {address}")
+            threading.Thread(target=self.handle_connection, args=(connection,), daemon=True).start()
+
+    def handle_connection(self, connection):
+        """receives the messages of one connection (they end with a dot) and answers them one after the other"""
+        firstanswer = True
+        buffer = b""
+        with self.lock:
+            self.open_connections.add(connection)
+        with connection:
+            try:
+                while self.running:
+                    try:
+                        received = connection.recv(1024)
+                    except OSError:
+                        break
+                    if received == b"":  # the client closed the connection
+                        break
+                    buffer += received
+                    with self.lock:
+                        self.max_queued = max(self.max_queued, buffer.count(b"."))
+                    while b"." in buffer:
+                        message, buffer = buffer.split(b".", 1)
+                        if not self.pipelining and buffer != b"":
+                            logging.info("received a message before the echo of the previous one was sent - dropping the connection")
+                            return
+                        message_text = message.decode(errors="replace").strip() + "."
+                        if firstanswer:
+                            time.sleep(self.connect_delay)
+                            firstanswer = False
+                        if not self.answer(connection, message_text):
+                            return
+            finally:
+                with self.lock:
+                    self.open_connections.discard(connection)
+
+    def answer(self, connection, message_text):
+        """Presses the buttons of the message and sends the answer (or the fault). Returns False if the connection
+        has to be closed."""
+        with self.lock:
+            self.received.append(message_text)
+        fault = self.next_fault()
+        logging.info(f"received '{message_text}' ({fault})")
+        time.sleep(count_presses(message_text) * self.press_latency)
+        if self.boiler is not None:  # (the buttons are pressed also if the answer goes wrong afterwards)
+            self.boiler.run(message_text)
+            logging.info(f"boiler: {self.boiler.describe()}")
+        if not self.pipelining and fault != "hang" and select.select([connection], [], [], 0)[0]:
+            logging.info("received data while pressing the buttons - dropping the connection")
+            return False
+        if fault == "drop":
+            return False
+        elif fault == "hang":
+            # never answer - wait until the client closes the connection (or the server is stopped):
+            while self.running:
+                try:
+                    if connection.recv(1024) == b"":
+                        break
+                except OSError:
+                    break
+            return False
+        elif fault == "partial":
+            connection.sendall(message_text[:len(message_text) // 2].encode())
+            return False
+        elif fault == "garble":
+            connection.sendall(message_text.replace("4", "3").replace("1", "2")[:-1].encode() + b"x.")
+            return True
+        connection.sendall(message_text.encode())
+        return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake robot for the heating control (echo-server with latency and faults)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=2323)
+    parser.add_argument("--press-latency", type=float, default=0.0, help="seconds per button press")
+    parser.add_argument("--connect-delay", type=float, default=0.0, help="seconds before the first answer of a new connection")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="share of messages where the connection is dropped")
+    parser.add_argument("--partial-rate", type=float, default=0.0, help="share of messages answered only partially")
+    parser.add_argument("--garble-rate", type=float, default=0.0, help="share of messages answered with a wrong echo")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="share of messages that are never answered")
+    parser.add_argument("--faults", default=None, help=f"fixed sequence of faults, comma-separated ({', '.join(faultkinds)})")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--no-pipeline", action="store_true", help="drop the connection if a message arrives before the previous echo was sent")
+    parser.add_argument("--boiler", default=None, choices=["normal", "reduziert", "urlaub"],
+                        help="emulate the boiler control (see boileremulator.py), starting in this state")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', datefmt="%Y-%m-%d %H:%M:%S")
+    faults = args.faults.split(",") if args.faults else None
+    if faults is not None and any(fault not in faultkinds for fault in faults):
+        parser.error(f"unknown fault in --faults (possible: {', '.join(faultkinds)})")
+    boiler = None
+    if args.boiler is not None:
+        from boileremulator import BoilerEmulator
+        boiler = BoilerEmulator(args.boiler)
+    fakerobot = FakeRobot(args.host, args.port, args.press_latency, args.connect_delay, args.drop_rate,
+                          args.partial_rate, args.garble_rate, args.hang_rate, faults, args.seed,
+                          not args.no_pipeline, boiler)
+    fakerobot.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fakerobot.stop()
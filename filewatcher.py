@@ -0,0 +1,167 @@
+"""
+Watching of the data-files (times and holiday), so that changes take effect without pressing a button.
+
+The FileWatcher runs in a background thread. On Linux it uses inotify (through ctypes, so no extra package is needed)
+to get notified as soon as a file in the directory of the watched files is written or replaced - editors and scp often
+write a temporary file and rename it, that's why the directory is watched and not the file itself. Where inotify isn't
+available, the modification time and size of the files are polled (every poll_interval seconds).
+A notification alone doesn't mean that the content changed (z.B. the file was saved without changes, or touched), so
+the content of the file is hashed and the callback is only called if the hash is different from the last one.
+Like with the CommandExecutor, the callback is passed to a dispatcher, which decides in which thread it runs (for Kivy:
+the main thread, via the Kivy Clock).
+"""
+
+
+import ctypes
+import ctypes.util
+import hashlib
+import logging
+import os
+import select
+import struct
+import threading
+import time
+
+# inotify flags (from <sys/inotify.h>):
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+watchmask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+eventheader = struct.Struct("iIII")  # wd, mask, cookie, length of the name
+
+
+def run_directly(callback):
+    """default dispatcher: runs the callback directly in the watcher thread"""
+    callback()
+
+
+def file_hash(filename):
+    """returns the sha1-hash of the content of the file (or None if the file doesn't exist or can't be read)"""
+    try:
+        with open(filename, "rb") as readfile:
+            return hashlib.sha1(readfile.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def inotify_init():
+    """Returns the file descriptor of a new (non-blocking) inotify instance and the loaded libc, or (None, None) if
+    inotify isn't available (not Linux, or the call failed)."""
+    libname = ctypes.util.find_library("c")
+    if libname is None:
+        return None, None
+    try:
+        libc = ctypes.CDLL(libname, use_errno=True)
+        inotifyfd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None, None
+    if inotifyfd < 0:
+        return None, None
+    return inotifyfd, libc
+
+
+class FileWatcher():
+    """Calls on_change(filename) when the content of one of the watched files changes."""
+
+    def __init__(self, filenames, on_change, dispatcher=run_directly, poll_interval=0.5, settle=0.2, use_inotify=True):
+        self.filenames = [os.path.abspath(filename) for filename in filenames]
+        self.on_change = on_change
+        self.dispatcher = dispatcher
+        self.poll_interval = poll_interval  # seconds between two checks of the files (without inotify)
+        self.settle = settle  # seconds to wait after a notification, in case the file is written in several steps
+        self.use_inotify = use_inotify
+        self.hashes = {filename: file_hash(filename) for filename in self.filenames}  # the last known contents
+        self.mode = None  # "inotify" or "polling" (after start())
+        self.running = False
+        self.thread = None
+        self.inotifyfd = None
+        self.directories = {}  # watch descriptor of inotify -> the watched directory
+
+    def start(self):
+        """starts watching in a background thread"""
+        self.running = True
+        if self.use_inotify:
+            self.inotifyfd, libc = inotify_init()
+        if self.inotifyfd is not None:
+            for directory in {os.path.dirname(filename) for filename in self.filenames}:
+                watchdescriptor = libc.inotify_add_watch(self.inotifyfd, directory.encode(), watchmask)
+                if watchdescriptor < 0:
+                    logging.debug(f"inotify_add_watch failed for {directory} (errno {ctypes.get_errno()}), polling instead")
+                    os.close(self.inotifyfd)
+                    self.inotifyfd = None
+                    break
+                self.directories[watchdescriptor] = directory
+        self.mode = "inotify" if self.inotifyfd is not None else "polling"
+        target = self.watch_inotify if self.mode == "inotify" else self.watch_polling
+        self.thread = threading.Thread(target=target, name="filewatcher", daemon=True)
+        self.thread.start()
+        logging.debug(f"watching {self.filenames} ({self.mode})")
+
+    def stop(self):
+        """stops watching (the thread ends after at most poll_interval seconds)"""
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(self.poll_interval * 2 + self.settle)
+        if self.inotifyfd is not None:
+            os.close(self.inotifyfd)
+            self.inotifyfd = None
+
+    def check(self, filename):
+        """compares the content of the file with the last known one, and passes the change to the callback"""
+        newhash = file_hash(filename)
+        if newhash != self.hashes[filename]:
+            self.hashes[filename] = newhash
+            logging.debug(f"content of {filename} changed")
+            self.dispatcher(lambda: self.on_change(filename))
+
+    def watch_inotify(self):
+        # (an event has the watch descriptor of the directory and the name in it - the full path tells which file it is
+        #   for, also if files with the same name are watched in different directories)
+        watched = set(self.filenames)
+        changed = set()
+        while self.running:
+            # (with a timeout, so that stop() is noticed, and so that the changes are checked after a pause)
+            readable = select.select([self.inotifyfd], [], [], self.settle if changed else self.poll_interval)[0]
+            if not readable:
+                for filename in changed:
+                    self.check(filename)
+                changed = set()
+                continue
+            try:
+                data = os.read(self.inotifyfd, 4096)
+            except BlockingIOError:
+                continue
+            except OSError:  # the watcher was stopped
+                break
+            offset = 0
+            while offset + eventheader.size <= len(data):
+                wd, mask, cookie, length = eventheader.unpack_from(data, offset)
+                name = data[offset + eventheader.size:offset + eventheader.size + length].rstrip(b"\0").decode(errors="replace")
+                offset += eventheader.size + length
+                filename = os.path.join(self.directories.get(wd, ""), name)
+                if filename in watched:
+                    changed.add(filename)
+
+    def watch_polling(self):
+        stats = {filename: self.file_stat(filename) for filename in self.filenames}
+        while self.running:
+            time.sleep(self.poll_interval)
+            for filename in self.filenames:
+                newstat = self.file_stat(filename)
+                if newstat != stats[filename]:
+                    stats[filename] = newstat
+                    time.sleep(self.settle)
+                    self.check(filename)
+
+    @staticmethod
+    def file_stat(filename):
+        """modification time and size of the file (None if it doesn't exist)"""
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
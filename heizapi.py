@@ -0,0 +1,265 @@
+"""
+HTTP interface of the heating control for the local network (z.B. for phones or scripts), besides the touchscreen.
+
+    GET  /status                  the state of the control (JSON), see HeizApi.snapshot
+    POST /raise, /reduce          like the buttons 'lo rop' / 'lo rof' (the robot action runs in the background)
+    POST /longer_warm, /longer_warm_back, /tomorrow_holiday, /tomorrow_holiday_back
+    POST /reload/times, /reload/urlaub   loads the data-file (like the load-buttons)
+    POST /reload/holidays, /reload/vacations   loads the imported calendar (if it is configured, see icsimport)
+With api_token set in Heizsteierung.py, every request needs the header "Authorization: Bearer <token>". By default, the
+API only listens on this computer (api_host 127.0.0.1): on another address (z.B. 0.0.0.0 for the local network), it is
+only started with a token.
+
+The server runs with asyncio in its own thread, so that it answers at once, also while the robot is busy:
+- the actions are passed to the main thread of the GUI/daemon (with its dispatcher, like the callbacks of the
+  executor) - so the Heizung is only changed from there, as with the buttons. A robot action is only queued in the
+  executor of the Heizung (one command after the other, never interleaved with the ones of the GUI or other clients),
+  and the request is answered with 202 (accepted) without waiting for the robot,
+- GET /status returns a snapshot of the state that is at most snapshot_maxage seconds old (a new one is built in the
+  main thread if needed) - the robot isn't asked.
+"""
+
+
+import asyncio
+import concurrent.futures
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from Heizsteierung import testerei, onlyerrorlog, versionnr, api_host, api_port, api_token
+
+
+reasons = {200: "OK", 202: "Accepted", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+           405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large", 503: "Service Unavailable"}
+max_bodysize = 65536  # bytes - a request with a larger body is refused (the bodies aren't used)
+
+
+def is_local(host):
+    """True if the address can only be reached from this computer"""
+    return host in ("localhost", "::1") or host.startswith("127.")
+
+
+class HeizApi():
+    """HTTP server for the actions and the state of a Heizung.
+    dispatcher passes a callback to the main thread of the GUI/daemon, run_reconcile(description) lets the robot bring
+    the boiler to the desired state (in the executor), reload(filename) loads a data-file, and on_change() is called
+    after the changing-times were changed (z.B. to reschedule the next check)."""
+
+    def __init__(self, myheizung, dispatcher, run_reconcile, reload, on_change=None, host=api_host, port=api_port,
+                 token=api_token, snapshot_maxage=1.0, timeout=5.0):
+        self.myheizung = myheizung
+        self.dispatcher = dispatcher
+        self.run_reconcile = run_reconcile
+        self.reload = reload
+        self.on_change = on_change
+        self.host = host
+        self.port = port
+        self.token = token
+        self.snapshot_maxage = snapshot_maxage  # seconds
+        self.timeout = timeout  # seconds to wait for the main thread
+        self.cached = None  # the last snapshot (JSON, as bytes)
+        self.cachedtime = 0  # time.monotonic() of the last snapshot
+        self.loop = None
+        self.server = None
+        self.started = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="heizapi", daemon=True)
+        # the actions: path -> (function of the Heizung, description for the log, does it need the robot)
+        self.actions = {
+            "/raise": (myheizung.request_raise, "lo rop", True),
+            "/reduce": (myheizung.request_reduce, "lo rof", True),
+            "/longer_warm": (myheizung.longer_warm, "länger warm an", False),
+            "/longer_warm_back": (myheizung.longer_warm_back, "länger warm aus", False),
+            "/tomorrow_holiday": (myheizung.tomorrow_holiday, "muar-Feierdag an", False),
+            "/tomorrow_holiday_back": (myheizung.tomorrow_holiday_back, "muar-Feierdag aus", False),
+        }
+
+    def start(self):
+        """Starts the server in its thread. Returns False if it couldn't be started (z.B. the port is already used)."""
+        self.thread.start()
+        self.started.wait(5)
+        return self.server is not None
+
+    def stop(self):
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(5)
+
+    def run(self):
+        if self.token is None and not is_local(self.host):
+            logging.error(f"the HTTP API isn't started on {self.host} without api_token")
+            if testerei == False:
+                self.myheizung.errorlogger.error(f"D'HTTP-API gët op {self.host} net ouni api_token gestart (jiddereen am Netz kéint d'Heizung schalten)")
+            self.started.set()
+            return
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(asyncio.start_server(self.handle_connection, self.host, self.port))
+            if self.port == 0:  # (the operating system chose a free port)
+                self.port = self.server.sockets[0].getsockname()[1]
+        except OSError:
+            logging.exception("the HTTP API couldn't be started")
+            if testerei == False:
+                self.myheizung.errorlogger.exception(f"D'HTTP-API konnt net gestart gin (Port {self.port})")
+            self.started.set()
+            return
+        self.started.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.server.close()
+            # (the connections that are still open, z.B. kept alive by a client, are closed too)
+            connections = asyncio.all_tasks(self.loop)
+            for connection in connections:
+                connection.cancel()
+            self.loop.run_until_complete(asyncio.gather(*connections, return_exceptions=True))
+            self.loop.run_until_complete(self.server.wait_closed())
+            self.loop.close()
+
+    async def handle_connection(self, reader, writer):
+        """reads the requests of a connection (several, if the client keeps it open) and answers them"""
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 30)
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                requestline = lines[0].split()
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                # (the body isn't used - if it can't be read, the answer closes the connection, as the rest of the body
+                #   would be taken as the next request)
+                length = headers.get("content-length", "0") or "0"
+                bodyread = length.isdigit() and int(length) <= max_bodysize
+                if bodyread and int(length) > 0:
+                    await reader.readexactly(int(length))
+                if not length.isdigit():
+                    code, answer = 400, {"message": "bad Content-Length"}
+                elif not bodyread:
+                    code, answer = 413, {"message": f"the body is larger than {max_bodysize} bytes"}
+                elif len(requestline) != 3:
+                    code, answer = 400, {"message": "bad request line"}
+                else:
+                    code, answer = await self.handle_request(requestline[0], requestline[1].split("?")[0], headers)
+                body = answer if type(answer) == bytes else json.dumps(answer, ensure_ascii=False).encode()
+                keepalive = bodyread and headers.get("connection", "").lower() != "close" and requestline[-1:] == ["HTTP/1.1"]
+                writer.write(f"HTTP/1.1 {code} {reasons[code]}\r\nContent-Type: application/json; charset=utf-8\r\n"
+                             f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keepalive else 'close'}\r\n\r\n".encode() + body)
+                await writer.drain()
+                if not keepalive:
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:  # (the server is stopped)
+            pass
+        finally:
+            writer.close()
+
+    async def handle_request(self, method, path, headers):
+        """returns (HTTP status code, answer - a dictionary or the JSON as bytes)"""
+        if self.token is not None and headers.get("authorization") != f"Bearer {self.token}":
+            return 401, {"message": "wrong or missing token"}
+        if path == "/status":
+            if method != "GET":
+                return 405, {"message": "use GET"}
+            if self.cached is None or time.monotonic() - self.cachedtime > self.snapshot_maxage:
+                try:
+                    await self.in_mainthread(self.refresh_snapshot)
+                except asyncio.TimeoutError:
+                    if self.cached is None:
+                        return 503, {"message": "the control doesn't answer"}
+            return 200, self.cached
+        if path not in self.actions and path not in self.reloadfiles():
+            return 404, {"message": f"unknown path {path}"}
+        if method != "POST":
+            return 405, {"message": "use POST"}
+        try:
+            return await self.in_mainthread(lambda: self.run_action(path))
+        except asyncio.TimeoutError:
+            return 503, {"message": "the control doesn't answer"}
+
+    def in_mainthread(self, function):
+        """runs the function in the main thread of the GUI/daemon, and returns an awaitable for its result"""
+        future = concurrent.futures.Future()
+
+        def call():
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(function())
+            except Exception as error:
+                future.set_exception(error)
+
+        self.dispatcher(call)
+        return asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+
+    def run_action(self, path):
+        """carries out the action (in the main thread), and returns (HTTP status code, answer)"""
+        if path.startswith("/reload/"):
+            logging.debug(f"API: {path}")
+            if testerei == False and onlyerrorlog == False:
+                self.myheizung.actionlogger.info(f"API: {path}")
+            self.reload(self.reloadfiles()[path])
+            code, message = 200, "ragelueden"
+        else:
+            function, description, needsrobot = self.actions[path]
+            logging.debug(f"API: '{description}'")
+            if testerei == False and onlyerrorlog == False:
+                self.myheizung.actionlogger.info(f"API: '{description}'")
+            response = function()
+            if response != True:
+                code, message = 409, response
+            elif needsrobot:
+                self.run_reconcile(f"API: {description}")
+                code, message = 202, f"de Roboter schalt op {self.myheizung.desired_status}"
+            else:
+                if self.on_change is not None:
+                    self.on_change()
+                code, message = 200, f"nei Zäiten fier haut: {self.myheizung.changetimes_today}"
+        self.refresh_snapshot()
+        return code, {"message": message, "state": json.loads(self.cached)}
+
+    def reloadfiles(self):
+        """the data-files that can be loaded with /reload/... (path -> filename)"""
+        heizung = self.myheizung
+        files = {"/reload/times": heizung.timesfile, "/reload/urlaub": heizung.urlaubfile}
+        if heizung.holidayfile is not None:
+            files["/reload/holidays"] = heizung.holidayfile
+        if heizung.vacationfile is not None:
+            files["/reload/vacations"] = heizung.vacationfile
+        return files
+
+    def refresh_snapshot(self):
+        """builds the snapshot of the state (in the main thread)"""
+        self.cached = json.dumps(self.snapshot(), ensure_ascii=False).encode()
+        self.cachedtime = time.monotonic()
+
+    def snapshot(self):
+        """the state of the control, as shown in the GUI"""
+        heizung = self.myheizung
+        done, total = heizung.myrobot.progress
+        return {
+            "status": heizung.status,
+            "desired_status": heizung.desired_status,
+            "longerwarm_on": heizung.longerwarm_on,
+            "tomorrowholiday_on": heizung.tomorrowholiday_on,
+            "holiday_tomorrow": heizung.holiday_calendar.holiday_on(heizung.last_evaluated.date() + timedelta(days=1)),
+            "changetimes_today": heizung.changetimes_today,
+            "nextcheck": heizung.nextcheck.strftime("%Y-%m-%d %H:%M:%S") if heizung.nextcheck is not None else None,
+            "upcoming": [{"time": transition.moment.strftime("%Y-%m-%d %H:%M"), "status": transition.state}
+                         for transition in heizung.timeline().next_transitions(5)],
+            "robot_busy": heizung.executor.busy(),
+            "robot_command": heizung.executor.current,
+            "robot_progress": [done, total] if heizung.executor.current is not None else None,
+            "robot_expected_seconds": round(heizung.myrobot.expected, 1) if heizung.myrobot.expected > 0 else None,
+            "robot_breaker": heizung.myrobot.breaker.state,
+            "communicationworks": heizung.communicationworks,
+            "parseerrors": [str(error) for error in heizung.parseerrors],
+            "version": versionnr,
+            "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
@@ -0,0 +1,151 @@
+"""
+Headless operation of the heating control (without GUI and without kivy).
+
+The HeizDaemon does what the Kivy-GUI does without buttons: it checks the changing-times and holiday-times at the
+moments computed by Heizung.next_check_time, lets the robot carry out the needed changes (in the worker thread of the
+executor, like the GUI), and loads the data-files when they are changed.
+Like the Kivy Clock in the GUI, the daemon has a single main thread that works off the callbacks (of the executor and the
+file watcher) and the checks, so that the Heizung is never changed from two threads at the same time (besides the
+robot commands in the executor).
+
+Use: python Heizsteierung.py --headless (stops with Ctrl-C or SIGTERM).
+"""
+
+
+import logging
+import os
+import queue
+import signal
+import threading
+
+from Heizsteierung import Heizung, testerei, onlyerrorlog, versionnr, watch_datafiles, api_port
+from filewatcher import FileWatcher
+from heizapi import HeizApi
+
+
+class HeizDaemon():
+    """Runs the time-related checks of a Heizung (and the reloading of the data-files) without GUI.
+    dispatcher passes the callbacks of the executor, the file watcher and the API to the main thread - by default the
+    queue of this daemon (see run()); the fleet mode passes its own (see heizfleet.py)."""
+
+    def __init__(self, myheizung=None, dispatcher=None, apiport=api_port):
+        self.myheizung = myheizung if myheizung is not None else Heizung()
+        self.callbacks = queue.Queue()  # callbacks from other threads, to be run in the main thread of the daemon
+        self.wakeup = threading.Event()  # set to interrupt the waiting for the next check
+        self.dispatcher = dispatcher if dispatcher is not None else self.call_soon
+        self.apiport = apiport  # port of the HTTP API (None: no API)
+        self.running = False
+        self.reconcile_queued = False  # True while a reconcile waits in the executor (see run_reconcile)
+        self.filewatcher = None
+        self.api = None  # the HTTP API (started in start(), if apiport isn't None)
+
+    def call_soon(self, callback):
+        """dispatcher for the executor and the file watcher: passes the callback to the main thread of the daemon"""
+        self.callbacks.put(callback)
+        self.wakeup.set()
+
+    def run(self):
+        """Runs the checks until stop() is called (or SIGTERM/Ctrl-C is received)."""
+        logging.debug(f"headless control started (v{versionnr})")
+        if testerei == False and onlyerrorlog == False:
+            self.myheizung.actionlogger.info(f"Steierung ouni GUI gestart (Versioun: {versionnr})")
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda signum, frame: self.stop())
+        self.start()
+        self.running = True
+        try:
+            while self.running:
+                self.run_callbacks()
+                self.check()
+                # (the moment of the next check is computed again after every wakeup, as the data could have changed)
+                self.wakeup.wait(self.myheizung.seconds_until_next_check())
+                self.wakeup.clear()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+            if testerei == False and onlyerrorlog == False:
+                self.myheizung.actionlogger.info("Steierung ouni GUI gestoppt")
+
+    def start(self):
+        """starts the file watcher, the HTTP API and the communication test with the robot (in the background)"""
+        if watch_datafiles == True:
+            self.filewatcher = FileWatcher([self.myheizung.timesfile, self.myheizung.urlaubfile] + self.myheizung.calendarfiles,
+                                           self.datafile_changed, dispatcher=self.dispatcher)
+            self.filewatcher.start()
+        if self.apiport is not None:
+            self.api = HeizApi(self.myheizung, self.dispatcher, self.run_reconcile, self.load_datafile, port=self.apiport)
+            self.api.start()
+        self.myheizung.executor.submit(self.myheizung.check_communication, description="Kommunikatiounstest")
+
+    def shutdown(self):
+        """stops the file watcher, the API and the probes of the robot, and waits until a running robot command is
+        finished"""
+        if self.filewatcher is not None:
+            self.filewatcher.stop()
+        if self.api is not None:
+            self.api.stop()
+        self.myheizung.myrobot.breaker.stop()
+        self.myheizung.executor.shutdown(wait=True)
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+
+    def run_callbacks(self):
+        while not self.callbacks.empty():
+            callback = self.callbacks.get()
+            try:
+                callback()
+            except Exception:  # (a problem in one callback mustn't stop the daemon)
+                logging.exception("problem in a callback of the daemon")
+                if testerei == False:
+                    self.myheizung.errorlogger.exception("Problem an engem Callback vum Daemon")
+
+    def check(self):
+        """checks if a change is due (like check_kivy_statusandactions in the GUI)"""
+        self.myheizung.refresh_heiz_time()
+        heizstatus_response = self.myheizung.check_heiz_statusandactions()
+        if heizstatus_response == "reconcile":
+            self.run_reconcile(f"automatesch: {self.myheizung.desired_status}")
+        elif heizstatus_response == False:
+            logging.debug("problem with the automatic change of times/urlaub (maybe the status was 'none'?)")
+            if testerei == False:
+                self.myheizung.errorlogger.error("PROBLEM BEIM AUTOMATESCHEN EMSCHALTEN vun Zäiten/urlaub! (ev. war de status 'none'?)")
+
+    def run_reconcile(self, description):
+        """lets the robot bring the boiler to the desired state in the worker thread (at most one waiting reconcile,
+        like in the GUI)"""
+        if self.reconcile_queued:
+            return
+        self.reconcile_queued = True
+
+        def reconcile_command():
+            self.reconcile_queued = False
+            return self.myheizung.reconcile()
+
+        def reconcile_done(future):
+            if future.exception() is None:
+                logging.debug(f"{description}: the robot returned {future.result()}, the status is {self.myheizung.status}")
+
+        self.myheizung.executor.submit(reconcile_command, on_done=reconcile_done, dispatcher=self.dispatcher,
+                                       description=description)
+
+    def datafile_changed(self, filename):
+        """loads a changed data-file (called by the file watcher)"""
+        if testerei == False and onlyerrorlog == False:
+            self.myheizung.actionlogger.info(f"D'Datei {filename} as geännert gin - gët automatesch ragelueden")
+        self.load_datafile(filename)
+
+    def load_datafile(self, filename):
+        """loads a data-file (like the load-buttons of the GUI), and adjusts the state if needed"""
+        if os.path.basename(filename) == os.path.basename(self.myheizung.timesfile):
+            response_times = self.myheizung.refresh_changetimes()
+            if response_times == "reduce now" and self.myheizung.request_reduce() == True:
+                self.run_reconcile("automatesch: reduziert (nei Zäiten)")
+            elif response_times == "raise now" and self.myheizung.request_raise() == True:
+                self.run_reconcile("automatesch: normal (nei Zäiten)")
+        elif os.path.basename(filename) in [os.path.basename(calendarfile) for calendarfile in self.myheizung.calendarfiles]:
+            self.myheizung.refresh_calendar(filename)
+        else:
+            self.myheizung.refresh_urlaub()
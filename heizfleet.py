@@ -0,0 +1,121 @@
+"""
+Fleet mode: one process controls the boilers of several flats (units), each with its own robot.
+
+The units are defined in a JSON file (z.B. fleet.json):
+    {"units": [
+        {"name": "Wunneng 1", "robot_ip": "192.168.178.33", "directory": "wunneng1", "api_port": 8081},
+        {"name": "Wunneng 2", "robot_ip": "192.168.178.34", "robot_port": 23, "directory": "wunneng2"}
+    ]}
+Every unit has its own Heizung (state, data-files, parse cache and journal in its directory, which is created if
+needed), its own robot connection and its own executor - so the robot commands of different units run at the same
+time, and a slow or unreachable robot only delays the commands of its own unit. Optionally every unit has its own HTTP
+API (api_port).
+The checks of all the units run in one main thread (like the HeizDaemon for one unit): it sleeps until the next check of
+any unit is due, or until a callback (of an executor, a file watcher or an API) arrives. The checks themselves don't
+wait for a robot, so the main thread needs only a few milliseconds per unit and due change.
+
+Use: python Heizsteierung.py --fleet fleet.json
+"""
+
+
+import json
+import logging
+import os
+import queue
+import signal
+import threading
+
+from Heizsteierung import Heizung, testerei, onlyerrorlog, versionnr
+from heizdaemon import HeizDaemon
+
+errorlogger = logging.getLogger("errorlog")  # the loggers of Heizsteierung (they write to the logfiles)
+actionlogger = logging.getLogger("actionlog")
+
+
+def load_fleet(filename):
+    """Reads the definitions of the units from the JSON file. Returns the list of units (dictionaries with name,
+    robot_ip, robot_port, directory and api_port). Raises ValueError if the file isn't valid."""
+    with open(filename, "r") as readfile:
+        definition = json.load(readfile)
+    if not isinstance(definition, dict) or not isinstance(definition.get("units"), list) or len(definition["units"]) == 0:
+        raise ValueError(f"{filename}: expected {{\"units\": [...]}} with at least one unit")
+    units = []
+    for position, unit in enumerate(definition["units"], 1):
+        if not isinstance(unit, dict) or not isinstance(unit.get("name"), str) or not isinstance(unit.get("robot_ip"), str):
+            raise ValueError(f"{filename}: unit {position} needs at least a name and a robot_ip")
+        units.append({"name": unit["name"], "robot_ip": unit["robot_ip"], "robot_port": int(unit.get("robot_port", 23)),
+                      "directory": unit.get("directory", unit["name"]), "api_port": unit.get("api_port")})
+    names = [unit["name"] for unit in units]
+    directories = [os.path.abspath(unit["directory"]) for unit in units]
+    ports = [unit["api_port"] for unit in units if unit["api_port"] is not None]
+    if len(set(names)) < len(names) or len(set(directories)) < len(directories) or len(set(ports)) < len(ports):
+        raise ValueError(f"{filename}: the names, directories and API ports of the units have to be different")
+    return units
+
+
+class HeizFleet():
+    """Runs the checks of several units (one HeizDaemon per unit, without their own loop) in one main thread."""
+
+    def __init__(self, units):
+        self.callbacks = queue.Queue()  # callbacks from other threads, to be run in the main thread
+        self.wakeup = threading.Event()  # set to interrupt the waiting for the next check
+        self.running = False
+        self.units = {}  # name -> HeizDaemon of the unit
+        for unit in units:
+            os.makedirs(unit["directory"], exist_ok=True)
+            myheizung = Heizung(robotip=unit["robot_ip"], robotport=unit["robot_port"], datadir=unit["directory"],
+                                name=unit["name"])
+            self.units[unit["name"]] = HeizDaemon(myheizung, dispatcher=self.call_soon, apiport=unit["api_port"])
+
+    def call_soon(self, callback):
+        """dispatcher of all the units: passes the callback to the main thread"""
+        self.callbacks.put(callback)
+        self.wakeup.set()
+
+    def run(self):
+        """Runs the checks of all the units until stop() is called (or SIGTERM/Ctrl-C is received)."""
+        logging.debug(f"fleet control started with {len(self.units)} units (v{versionnr})")
+        if testerei == False and onlyerrorlog == False:
+            actionlogger.info(f"Steierung fier {len(self.units)} Wunnengen gestart ({', '.join(self.units)}, Versioun: {versionnr})")
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda signum, frame: self.stop())
+        for daemon in self.units.values():
+            daemon.start()
+        self.running = True
+        try:
+            while self.running:
+                self.run_callbacks()
+                for name, daemon in self.units.items():
+                    self.check(name, daemon)
+                self.wakeup.wait(min(daemon.myheizung.seconds_until_next_check() for daemon in self.units.values()))
+                self.wakeup.clear()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for daemon in self.units.values():
+                daemon.shutdown()
+            if testerei == False and onlyerrorlog == False:
+                actionlogger.info("Steierung fier d'Wunnengen gestoppt")
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+
+    def run_callbacks(self):
+        while not self.callbacks.empty():
+            callback = self.callbacks.get()
+            try:
+                callback()
+            except Exception:  # (a problem of one unit mustn't stop the other ones)
+                logging.exception("problem in a callback of the fleet")
+                if testerei == False:
+                    errorlogger.exception("Problem an engem Callback vun de Wunnengen")
+
+    def check(self, name, daemon):
+        """checks if a change is due for the unit"""
+        try:
+            daemon.check()
+        except Exception:
+            logging.exception(f"problem while checking the unit {name}")
+            if testerei == False:
+                errorlogger.exception(f"Problem beim Checken vun der Wunneng {name}")
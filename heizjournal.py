@@ -0,0 +1,125 @@
+"""
+Journal of the state of the heating control, to be able to restore it after a restart (z.B. after a power cut).
+
+Every change of the state (status of the boiler after a confirmed robot action, desired status, longer-warm, tomorrow-
+holiday, the changing-times of today, the last checked minute) is appended to the journal file as one line, with only
+the values that changed:
+    <crc32 of the JSON, 8 hex digits> <JSON: {"seq": number, "event": what happened, "changes": {name: value}}>
+The lines are only appended (and synced to the card), so a power cut can at most damage the last line. When the journal
+is read, a line that isn't complete or whose checksum doesn't match ends the reading (the rest of the file is cut off).
+Every snapshot_every lines, the whole state is saved in the snapshot file (written to a temporary file and renamed, so
+it's either the old or the new one) and the journal is emptied. The state is restored by loading the snapshot and
+applying the lines of the journal that came after it.
+"""
+
+
+import json
+import logging
+import os
+import threading
+import zlib
+
+
+def encode_line(record):
+    """the journal line (bytes) for a record, with the checksum in front"""
+    payload = json.dumps(record, separators=(",", ":"), ensure_ascii=False).encode()
+    return b"%08x %s\n" % (zlib.crc32(payload), payload)
+
+
+def decode_line(line):
+    """Returns the record of a journal line (bytes, with the newline), or None if the line is incomplete or damaged."""
+    if not line.endswith(b"\n") or len(line) < 10 or line[8:9] != b" ":
+        return None
+    payload = line[9:-1]
+    try:
+        if int(line[:8], 16) != zlib.crc32(payload):
+            return None
+        return json.loads(payload)
+    except ValueError:
+        return None
+
+
+class Journal():
+    """Append-only journal of the state changes, with snapshots."""
+
+    def __init__(self, filename, snapshotfile, snapshot_every=200):
+        self.filename = filename
+        self.snapshotfile = snapshotfile
+        self.snapshot_every = snapshot_every
+        self.state = {}  # the last saved state (to find out which values changed)
+        self.seq = 0  # number of the last record
+        self.lines = 0  # number of lines in the journal since the last snapshot
+        self.lock = threading.Lock()  # (the state is saved from the GUI and from the worker thread of the robot)
+
+    def recover(self):
+        """Reads the snapshot and the journal, and returns the last saved state (a dictionary), or None if nothing
+        was saved yet. A damaged end of the journal (z.B. from a power cut while writing) is removed."""
+        with self.lock:
+            snapshot = self.read_snapshot()
+            if snapshot is not None:
+                self.seq, self.state = snapshot["seq"], snapshot["state"]
+            goodlength = 0
+            if os.path.exists(self.filename):
+                with open(self.filename, "rb") as journalfile:
+                    for line in journalfile:
+                        record = decode_line(line)
+                        if record is None:
+                            break
+                        goodlength += len(line)
+                        self.lines += 1
+                        if record["seq"] > self.seq:  # (older records are already in the snapshot)
+                            self.seq = record["seq"]
+                            self.state.update(record["changes"])
+                if goodlength < os.path.getsize(self.filename):
+                    logging.warning(f"journal {self.filename} damaged after {goodlength} bytes, the rest is removed")
+                    os.truncate(self.filename, goodlength)
+            if snapshot is None and self.seq == 0:
+                return None
+            return dict(self.state)
+
+    def read_snapshot(self):
+        """the saved snapshot {"seq": ..., "state": {...}}, or None if there is none (or it is damaged)"""
+        try:
+            with open(self.snapshotfile, "rb") as readfile:
+                record = decode_line(readfile.read())
+        except OSError:
+            return None
+        return record
+
+    def record(self, event, state):
+        """Appends the values of the state that changed since the last record to the journal (nothing if no value
+        changed). Returns True if a line was written."""
+        with self.lock:
+            changes = {name: value for name, value in state.items() if name not in self.state or self.state[name] != value}
+            if len(changes) == 0:
+                return False
+            self.seq += 1
+            self.append(encode_line({"seq": self.seq, "event": event, "changes": changes}))
+            self.state.update(changes)
+            self.lines += 1
+            if self.lines >= self.snapshot_every:
+                self.write_snapshot()
+            return True
+
+    def append(self, line):
+        """appends the line to the journal file, and waits until it's on the card"""
+        journalfd = os.open(self.filename, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(journalfd, line)
+            os.fsync(journalfd)
+        finally:
+            os.close(journalfd)
+
+    def write_snapshot(self):
+        """saves the whole state in the snapshot file, and empties the journal (called with the lock)"""
+        tmpfilename = self.snapshotfile + ".tmp"
+        with open(tmpfilename, "wb") as writefile:
+            writefile.write(encode_line({"seq": self.seq, "state": self.state}))
+            writefile.flush()
+            os.fsync(writefile.fileno())
+        os.replace(tmpfilename, self.snapshotfile)
+        # (if the power is cut before the journal is emptied, its records are skipped at the next start, as they are
+        #   already in the snapshot - see seq)
+        with open(self.filename, "wb") as journalfile:
+            os.fsync(journalfile.fileno())
+        self.lines = 0
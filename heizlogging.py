@@ -0,0 +1,190 @@
+"""
+Logging to files without slowing down the GUI, and without filling the SD card.
+
+With plain FileHandlers, every log message is written to the file (and the file flushed) in the thread that logs -
+in the GUI that's the kivy main thread, in the middle of a button press. Here the loggers only put the messages in a
+queue (QueuedHandler), and a background thread (LogWriter) writes them to the files:
+- the messages are collected and written together, at the latest after flush_interval seconds, or at once when an
+  error (or something more serious) is logged, so that errors are on the card even if the power is cut right after,
+- a logfile is rotated when it reaches max_bytes: the old part is compressed (gzip, z.B. LOG_heiz_action.txt.1.gz),
+  at most backup_count old parts are kept, and the oldest parts are deleted if all the parts of the log together
+  exceed total_cap bytes.
+If the queue is full (the card is extremely slow), further messages are dropped (and counted) rather than blocking the
+program.
+With several units (flats) in one process (see heizfleet), they all write to the same logfiles: every Heizung logs
+through a UnitLogger, which puts the name of the unit in front of its messages.
+"""
+
+
+import atexit
+import gzip
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import threading
+import time
+
+
+def gzip_namer(name):
+    """name of a rotated (compressed) log part"""
+    return name + ".gz"
+
+
+def gzip_rotator(source, dest):
+    """compresses the full logfile to the rotated part, and removes it"""
+    with open(source, "rb") as sourcefile, gzip.open(dest, "wb") as destfile:
+        shutil.copyfileobj(sourcefile, destfile)
+    os.remove(source)
+
+
+class BatchedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """RotatingFileHandler that collects the formatted messages and only writes them to the file when flush() is
+    called (by the LogWriter). The rotated parts are compressed, and their total size is limited."""
+
+    def __init__(self, filename, max_bytes, backup_count, total_cap):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True)
+        self.namer = gzip_namer
+        self.rotator = gzip_rotator
+        self.total_cap = total_cap
+        self.pending = []  # the formatted messages that aren't written yet
+
+    def emit(self, record):
+        try:
+            self.pending.append(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        """writes the collected messages to the file (rotates the file first, if it would get too big)"""
+        self.acquire()
+        try:
+            if len(self.pending) == 0:
+                return
+            messages = self.pending
+            self.pending = []
+            if self.stream is None:
+                self.stream = self._open()
+            size = self.stream.tell()
+            batch = []
+            for message in messages:
+                length = len(message.encode())
+                if self.maxBytes > 0 and size > 0 and size + length > self.maxBytes:
+                    # (the messages up to here still go into the old file, the others into the new one)
+                    self.stream.write("".join(batch))
+                    batch = []
+                    self.doRollover()
+                    self.enforce_cap()
+                    if self.stream is None:
+                        self.stream = self._open()
+                    size = 0
+                batch.append(message)
+                size += length
+            self.stream.write("".join(batch))
+            self.stream.flush()
+        except Exception:
+            logging.exception(f"problem while writing the log {self.baseFilename}")
+        finally:
+            self.release()
+
+    def rotated_parts(self):
+        """the existing rotated parts of the log, from the newest to the oldest"""
+        parts = []
+        for number in range(1, self.backupCount + 1):
+            partname = self.rotation_filename(f"{self.baseFilename}.{number}")
+            if os.path.exists(partname):
+                parts.append(partname)
+        return parts
+
+    def enforce_cap(self):
+        """deletes the oldest rotated parts, as long as all the parts together are bigger than total_cap"""
+        parts = self.rotated_parts()
+        total = sum(os.path.getsize(part) for part in parts)
+        while len(parts) > 0 and total > self.total_cap:
+            oldest = parts.pop()
+            total -= os.path.getsize(oldest)
+            os.remove(oldest)
+
+
+class UnitLogger(logging.LoggerAdapter):
+    """Logger of one unit: the messages get the name of the unit in front (z.B. "flat2: De status as lo: normal"), if
+    it has one (a single Heizung, without name, logs as before)."""
+
+    def __init__(self, logger, unitname=None):
+        super().__init__(logger, {"unit": unitname})
+
+    def process(self, msg, kwargs):
+        if self.extra["unit"]:
+            msg = f"{self.extra['unit']}: {msg}"
+        return msg, kwargs
+
+
+class QueuedHandler(logging.handlers.QueueHandler):
+    """handler for the loggers: passes the messages for the target handler to the queue of the LogWriter"""
+
+    def __init__(self, logwriter, target):
+        super().__init__(logwriter.queue)
+        self.logwriter = logwriter
+        self.target = target
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait((self.target, record))
+        except queue.Full:
+            self.logwriter.dropped += 1
+
+
+class LogWriter():
+    """Background thread that passes the queued messages to their (file-)handlers, and flushes them together."""
+
+    def __init__(self, flush_interval=10, flush_level=logging.ERROR, capacity=200, maxqueue=10000):
+        self.queue = queue.Queue(maxqueue)
+        self.flush_interval = flush_interval  # seconds a message waits at most before it is written
+        self.flush_level = flush_level  # messages of this level (or higher) are written at once
+        self.capacity = capacity  # number of waiting messages after which they are written
+        self.dropped = 0  # number of messages that were dropped because the queue was full
+        self.waiting = set()  # the handlers with messages that aren't written yet
+        self.count = 0  # the number of messages that aren't written yet
+        self.oldest = None  # the moment when the oldest waiting message arrived
+        self.thread = threading.Thread(target=self.run, name="logwriter", daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)  # (writes the remaining messages when the program ends)
+
+    def handler_for(self, target):
+        """returns the handler to add to a logger, so that its messages are written by target (in the background)"""
+        return QueuedHandler(self, target)
+
+    def run(self):
+        while True:
+            timeout = None if self.oldest is None else max(0, self.oldest + self.flush_interval - time.monotonic())
+            try:
+                target, record = self.queue.get(timeout=timeout)
+            except queue.Empty:  # (flush_interval is over)
+                self.flush()
+                continue
+            if target is None:  # stop() was called
+                self.flush()
+                break
+            target.handle(record)
+            self.waiting.add(target)
+            self.count += 1
+            if self.oldest is None:
+                self.oldest = time.monotonic()
+            if (record.levelno >= self.flush_level or self.count >= self.capacity
+                    or time.monotonic() - self.oldest >= self.flush_interval):
+                self.flush()
+
+    def flush(self):
+        """writes the waiting messages of all the handlers (called in the thread of the LogWriter)"""
+        for handler in self.waiting:
+            handler.flush()
+        self.waiting = set()
+        self.count = 0
+        self.oldest = None
+
+    def stop(self):
+        """writes the waiting messages and ends the thread"""
+        if self.thread.is_alive():
+            self.queue.put((None, None))
+            self.thread.join(10)
@@ -0,0 +1,196 @@
+"""
+Metrics of the robot and the control (latencies, results, scheduler lag), to be able to tune the timeouts and to notice
+a robot that gets slower before it fails.
+
+The values are only counted in memory (a few additions per robot command), and are exported in the text format of
+Prometheus:
+- over HTTP (MetricsServer, z.B. http://127.0.0.1:9108/metrics), for a Prometheus server or simply with curl,
+- and/or in a file (TextfileWriter, rewritten every few seconds), z.B. for the textfile collector of the node_exporter.
+The metrics (see Heizsteierung.py):
+    heiz_robot_phase_seconds{command, phase, robot}     histogram of the duration of connect, send and echo per command
+    heiz_robot_commands_total{command, result, robot}   results of the commands (ok, timeout, echo_mismatch,
+                                                        connection_error, breaker_open, not_sent, error)
+    heiz_robot_connects_total{result}                   new connections to the robot (ok, timeout, error)
+    heiz_robot_breaker_state{robot}                     the circuit breaker (0 closed, 1 half open, 2 open), and
+    heiz_robot_breaker_trips_total{robot}               how often it opened
+    heiz_reconcile_seconds / heiz_reconcile_total{result}   the actions of the Heizung (reconcile)
+    heiz_scheduler_lag_seconds                          how late a due change was noticed by the scheduler
+"""
+
+
+import bisect
+import http.server
+import logging
+import os
+import threading
+
+# upper limits of the histogram buckets (in seconds) - the robot needs from a few ms (echo of "test.") up to ca. 20 s
+#   (vacation off):
+default_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 20, 30, 60)
+
+
+def format_labels(labels):
+    """the labels in the Prometheus format, z.B. {command="toggle",phase="echo"} (labels is a tuple of (name, value))"""
+    if len(labels) == 0:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in labels) + "}"
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Histogram():
+    """counts of the observed values per bucket (not cumulative, they are added up for the export), with sum and count"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # (the last one for the values above the biggest bucket)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics():
+    """The registry of all the metrics (counters, gauges and histograms), by name and labels."""
+
+    def __init__(self):
+        self.lock = threading.Lock()  # (the metrics are changed by the GUI, the worker thread and read by the export)
+        self.descriptions = {}  # name -> (type, help text)
+        self.counters = {}  # (name, labels) -> value
+        self.gauges = {}
+        self.histograms = {}  # (name, labels) -> Histogram
+        self.buckets = {}  # name -> buckets of the histogram
+
+    def describe(self, name, kind, helptext, buckets=default_buckets):
+        """declares a metric (kind: "counter", "gauge" or "histogram") - only declared metrics are exported"""
+        self.descriptions[name] = (kind, helptext)
+        if kind == "histogram":
+            self.buckets[name] = buckets
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.gauges[key] = value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets.get(name, default_buckets))
+            histogram.observe(value)
+
+    def render(self):
+        """returns all the metrics in the text format of Prometheus"""
+        with self.lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            histograms = {key: (list(histogram.counts), histogram.sum, histogram.count)
+                          for key, histogram in self.histograms.items()}
+        lines = []
+        for name, (kind, helptext) in sorted(self.descriptions.items()):
+            lines.append(f"# HELP {name} {helptext}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "histogram":
+                for (metricname, labels), (counts, total, count) in sorted(histograms.items()):
+                    if metricname != name:
+                        continue
+                    cumulative = 0
+                    for bound, bucketcount in zip(self.buckets[name] + (float("inf"),), counts):
+                        cumulative += bucketcount
+                        lines.append(f"{name}_bucket{format_labels(labels + (('le', format_value(bound)),))} {cumulative}")
+                    lines.append(f"{name}_sum{format_labels(labels)} {format_value(total)}")
+                    lines.append(f"{name}_count{format_labels(labels)} {count}")
+            else:
+                values = counters if kind == "counter" else gauges
+                for (metricname, labels), value in sorted(values.items()):
+                    if metricname == name:
+                        lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer():
+    """HTTP server (in a background thread) that returns the metrics at /metrics."""
+
+    def __init__(self, metrics, host, port):
+        class MetricsHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # (the requests aren't logged)
+
+        self.httpd = http.server.ThreadingHTTPServer((host, port), MetricsHandler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="metricsserver", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class TextfileWriter():
+    """Writes the metrics to a file every interval seconds (to a temporary file that is renamed, so that a reader never
+    sees a half written file)."""
+
+    def __init__(self, metrics, filename, interval=15):
+        self.metrics = metrics
+        self.filename = filename
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="metricstextfile", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def run(self):
+        while True:
+            self.write()
+            if self.stopped.wait(self.interval):
+                break
+
+    def write(self):
+        tmpfilename = self.filename + ".tmp"
+        try:
+            with open(tmpfilename, "w") as writefile:
+                writefile.write(self.metrics.render())
+            os.replace(tmpfilename, self.filename)
+        except OSError:
+            logging.exception(f"problem while writing the metrics to {self.filename}")
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join(5)
+        self.write()
+
+
+metrics = Metrics()  # the metrics of the program (like the loggers, shared by all the modules)
@@ -0,0 +1,118 @@
+"""
+Timeline of the effective changes of the boiler state: the changing-times of the weekdays, the changed times of today
+(longer-warm, tomorrow-holiday), the holiday morning of tomorrow and the holiday-times, merged in one sequence.
+
+The layers are applied like the check of the Heizung does it (see check_heiz_statusandactions and midnight_change):
+- today, the times of changetimes_today apply (they may be changed by longer-warm or tomorrow-holiday), the other days
+  the times of their weekday - the day after a tomorrow-holiday with the first change-time replaced by the raise-time
+  of Saturday,
+- a holiday-time 'urlaub' starts a vacation: the change-times are blocked until its end ('normal'), which raises to
+  normal (the next change-time applies again),
+- at the same minute, the holiday-change comes before the change-time.
+Only the effective transitions are returned (a change to the state that is already set isn't one).
+The timeline is generated lazily, day by day, only as far as the question needs it (but at most horizon days): "the
+next N transitions" looks at a few days, "the state at a moment" and "the transitions in a range" only up to the end
+of the range.
+A Timeline is built for the data at one moment (see Heizung.timeline) - it isn't changed when the data changes, a new
+one is built then.
+"""
+
+
+import collections
+import heapq
+import itertools
+from datetime import datetime, timedelta
+
+from scheduleindex import DayIndex, to_minutes
+
+datetimeformat = "%Y-%m-%d %H:%M"
+
+# moment: datetime of the change, state: the state after it, kind: "times" (change-time) or "urlaub" (holiday-time)
+Transition = collections.namedtuple("Transition", "moment state kind")
+
+
+class Timeline():
+    """The effective changes after start (datetime, a whole minute), when the state at start is state.
+    times_index: ScheduleIndex of the weekdays, today/today_index: the date and the index of the (changed) times of
+    today, urlaub_index: UrlaubIndex of the holiday-times, holidaymorning: the raise-time ('HH:MM') of tomorrow if
+    tomorrow is a holiday (otherwise None)."""
+
+    def __init__(self, start, state, times_index, today, today_index, urlaub_index, holidaymorning=None, horizon=366):
+        self.start = start
+        self.state = state
+        self.times_index = times_index
+        self.today = today
+        self.today_index = today_index
+        self.urlaub_index = urlaub_index
+        self.holidaymorning = holidaymorning
+        self.horizon = horizon  # days after start that are looked at, at most
+
+    def day_index(self, day):
+        """the index of the change-times of the day (or None if there are none)"""
+        if day == self.today:
+            return self.today_index
+        weekdayindex = self.times_index.days.get(day.isoweekday())
+        if day == self.today + timedelta(days=1) and self.holidaymorning is not None and weekdayindex is not None \
+                and len(weekdayindex) > 0:
+            daytimes = dict(weekdayindex.source)
+            daytimes.pop(weekdayindex.first()[0])
+            daytimes[self.holidaymorning] = "normal"
+            return DayIndex(daytimes)
+        return weekdayindex
+
+    def times_changes(self):
+        """yields the change-times (moment, 1, "times", state) after start, day by day"""
+        day = self.start.date()
+        fromminute = self.start.hour * 60 + self.start.minute
+        lastday = day + timedelta(days=self.horizon)
+        while day <= lastday:
+            dayindex = self.day_index(day)
+            if dayindex is not None:
+                for changetime, change_to in dayindex.transitions_between(fromminute, 24 * 60 - 1):
+                    minute = to_minutes(changetime)
+                    yield datetime.combine(day, datetime.min.time()) + timedelta(minutes=minute), 1, "times", change_to
+            day += timedelta(days=1)
+            fromminute = -1
+
+    def urlaub_changes(self):
+        """yields the holiday-times (moment, 0, "urlaub", state) after start"""
+        for urlaubtime, change_to in self.urlaub_index.changes_after(self.start):
+            yield datetime.strptime(urlaubtime, datetimeformat), 0, "urlaub", change_to
+
+    def transitions(self, end=None):
+        """yields the effective transitions (Transition) after start, up to (including) end - or without end (up to
+        the horizon)"""
+        state = self.state
+        # (the second value sorts the holiday-change before the change-time of the same minute)
+        for moment, _, kind, change_to in heapq.merge(self.urlaub_changes(), self.times_changes()):
+            if end is not None and moment > end:
+                return
+            if kind == "urlaub":
+                if change_to == "urlaub":
+                    newstate = "urlaub"
+                elif state == "urlaub":
+                    newstate = "normal"
+                else:
+                    newstate = state
+            else:
+                newstate = change_to if state != "urlaub" else state
+            if newstate != state:
+                state = newstate
+                yield Transition(moment, state, kind)
+
+    def next_transitions(self, count):
+        """the next count effective transitions (fewer if there aren't as many within the horizon)"""
+        return list(itertools.islice(self.transitions(), count))
+
+    def transitions_between(self, start, end):
+        """the effective transitions after start and up to (including) end"""
+        return [transition for transition in self.transitions(end) if transition.moment > start]
+
+    def state_at(self, moment):
+        """the state at the moment (at or after the start of the timeline)"""
+        if moment < self.start:
+            raise ValueError(f"the timeline starts at {self.start}, {moment} is before")
+        state = self.state
+        for transition in self.transitions(moment):
+            state = transition.state
+        return state
@@ -0,0 +1,486 @@
+"""
+Import of calendars in the iCalendar format (.ics files, z.B. exported from a calendar app, or the public holidays
+published for the country), for the public holidays and the vacations:
+- holiday calendar: every day an event covers is a public holiday - the evening before it, tomorrow-holiday is
+  activated automatically (see Heizung.apply_holidaycalendar),
+- vacation calendar: every event is a vacation (from its start to its end), added to the holiday-times of the
+  urlaub-file (see urlaubindex.merge_vacations).
+
+Only the part of iCalendar that calendars of holidays and vacations use is read: the VEVENTs with DTSTART, DTEND or
+DURATION, SUMMARY, RRULE, RDATE, EXDATE, RECURRENCE-ID (a changed repetition replaces the original one) and STATUS
+(cancelled events are left out). Of the RRULEs, the frequencies DAILY, WEEKLY, MONTHLY and YEARLY are supported, with
+INTERVAL, COUNT, UNTIL, BYMONTH, BYMONTHDAY, BYDAY (also with position, z.B. "-1MO" for the last Monday) and WKST - an
+event with another rule part (z.B. BYSETPOS) is reported as problem and left out. The times are local times, to the
+minute (the time zone of TZID isn't converted, times in UTC - ending with "Z" - are converted to the local time).
+
+parse_ics reads the file in one pass, to a list of events (dictionaries with strings, so that the ParseCache can save
+them) - the repetitions aren't expanded there. IcsCalendar expands them lazily, only for a window of window_days days
+(from the day that is asked for), and keeps the covered days in an index by date. The repetitions before the window
+are skipped arithmetically (without COUNT), so a calendar over many years costs at the start and at a reload only
+as much as the number of its events.
+"""
+
+
+import calendar
+import collections
+import heapq
+import re
+from datetime import date, datetime, time, timedelta, timezone
+
+from scheduleparser import ScheduleError
+
+format_version = 1  # to be raised when the reading of the events changes (the cached events aren't used then, see parsecache)
+dateformat = "%Y-%m-%d"
+datetimeformat = "%Y-%m-%d %H:%M"
+frequencies = ["DAILY", "WEEKLY", "MONTHLY", "YEARLY"]
+rule_parts = ["FREQ", "INTERVAL", "COUNT", "UNTIL", "BYMONTH", "BYMONTHDAY", "BYDAY", "WKST"]
+weekdaynames = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]  # (the position is date.weekday())
+date_pattern = re.compile(r"\d{8}")
+datetime_pattern = re.compile(r"\d{8}T\d{6}Z?")
+byday_pattern = re.compile(r"([+-]?\d{1,2})?(MO|TU|WE|TH|FR|SA|SU)")
+duration_pattern = re.compile(r"([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?")
+
+# an event with the values converted (see prepare_event): start (datetime), duration (timedelta), rule (Rule or None),
+#   rdates/exdates (sets of datetimes)
+Event = collections.namedtuple("Event", "summary start duration rule rdates exdates")
+Rule = collections.namedtuple("Rule", "freq interval count until bymonth bymonthday byday wkst")
+
+
+def unfold(lines):
+    """Joins the folded lines (a line that starts with a space or a tab continues the line before).
+    Yields (number of the first line, joined line)."""
+    current = None
+    number = 0
+    for linenumber, line in enumerate(lines, start=1):
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield number, current
+        current, number = line, linenumber
+    if current is not None:
+        yield number, current
+
+
+def split_contentline(line):
+    """Splits a line into name, parameters (dictionary) and value, and the column of the value.
+    Raises ValueError if the line has no ':'."""
+    inquotes = False
+    for pos, char in enumerate(line):
+        if char == '"':
+            inquotes = not inquotes
+        elif char == ":" and not inquotes:
+            break
+    else:
+        raise ValueError("':' is missing")
+    name, *params = line[:pos].split(";")
+    parameters = {}
+    for param in params:
+        key, _, paramvalue = param.partition("=")
+        parameters[key.upper()] = paramvalue.strip('"')
+    return name.upper(), parameters, line[pos + 1:], pos + 2
+
+
+def unescape(text):
+    """the text of a SUMMARY (z.B. 'Christi Himmelfahrt\\, Feierdag' -> 'Christi Himmelfahrt, Feierdag')"""
+    return re.sub(r"\\([\\;,nN])", lambda match: "\n" if match.group(1) in "nN" else match.group(1), text)
+
+
+def parse_moment(value, parameters):
+    """Converts a DATE or DATE-TIME value to the format of the control: 'YYYY-MM-DD' for a whole day, otherwise
+    'YYYY-MM-DD HH:MM' (local time). Raises ValueError if it isn't valid."""
+    if parameters.get("VALUE") == "DATE" or date_pattern.fullmatch(value) is not None:
+        if date_pattern.fullmatch(value) is None:
+            raise ValueError(f"'{value}' isn't a date (YYYYMMDD)")
+        return date(int(value[:4]), int(value[4:6]), int(value[6:8])).strftime(dateformat)
+    if datetime_pattern.fullmatch(value) is None:
+        raise ValueError(f"'{value}' isn't a date-time (YYYYMMDDTHHMMSS)")
+    # (without strptime, which is slow - a calendar has a few values per event)
+    moment = datetime(int(value[:4]), int(value[4:6]), int(value[6:8]), int(value[9:11]), int(value[11:13]),
+                      int(value[13:15]))
+    if value.endswith("Z"):
+        moment = moment.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    return moment.strftime(datetimeformat)
+
+
+def parse_duration(value):
+    """the timedelta of a DURATION value (z.B. P1D, PT2H30M, P2W) - raises ValueError if it isn't valid"""
+    match = duration_pattern.fullmatch(value)
+    if match is None or value.endswith(("P", "T")):
+        raise ValueError(f"'{value}' isn't a duration (z.B. P1D or PT2H)")
+    sign, weeks, days, hours, minutes, seconds = match.groups()
+    duration = timedelta(weeks=int(weeks or 0), days=int(days or 0), hours=int(hours or 0), minutes=int(minutes or 0),
+                         seconds=int(seconds or 0))
+    return -duration if sign == "-" else duration
+
+
+def parse_numbers(value, highest, negative):
+    """checks the numbers of a BYMONTH/BYMONTHDAY value (negative ones count from the end, if negative is True) -
+    raises ValueError"""
+    numbers = [int(number) for number in value.split(",")]
+    if any(number == 0 or abs(number) > highest or (number < 0 and not negative) for number in numbers):
+        raise ValueError(f"'{value}' has a number that isn't possible")
+    return numbers
+
+
+def parse_rrule(value):
+    """Checks an RRULE value, and returns its parts (a dictionary of strings, UNTIL converted like DTSTART).
+    Raises ValueError (with the reason) if the rule isn't valid or uses a part that isn't supported."""
+    rule = {}
+    for part in value.split(";"):
+        key, _, partvalue = part.partition("=")
+        key = key.upper()
+        if key not in rule_parts:
+            raise ValueError(f"the rule part {key} isn't supported")
+        rule[key] = partvalue.upper()
+    if rule.get("FREQ") not in frequencies:
+        raise ValueError(f"the frequency {rule.get('FREQ')} isn't supported (only {', '.join(frequencies)})")
+    for key in ["INTERVAL", "COUNT"]:
+        if key in rule and (not rule[key].isdigit() or int(rule[key]) == 0):
+            raise ValueError(f"{key}={rule[key]} isn't a positive number")
+    if "UNTIL" in rule:
+        rule["UNTIL"] = parse_moment(rule["UNTIL"], {})
+    if "BYMONTH" in rule:
+        parse_numbers(rule["BYMONTH"], 12, False)
+    if "BYMONTHDAY" in rule:
+        parse_numbers(rule["BYMONTHDAY"], 31, True)
+    if "BYDAY" in rule:
+        for byday in rule["BYDAY"].split(","):
+            match = byday_pattern.fullmatch(byday)
+            if match is None:
+                raise ValueError(f"'{byday}' isn't a weekday (z.B. MO, 2TU or -1FR)")
+            if match.group(1) is not None and rule["FREQ"] in ["DAILY", "WEEKLY"]:
+                raise ValueError(f"a position ('{byday}') is only possible with FREQ=MONTHLY or YEARLY")
+    if rule.get("WKST", "MO") not in weekdaynames:
+        raise ValueError(f"WKST={rule['WKST']} isn't a weekday")
+    return rule
+
+
+def parse_ics(lines):
+    """Reads the events of an iCalendar file (the lines) in one pass. Returns the list of events (dictionaries:
+    summary, start, end - 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM', the end is excluded -, rrule, rdates, exdates) and the list
+    of the problems found (ScheduleError). An event with a problem is left out."""
+    events = []
+    errors = []
+    overrides = []  # (uid, recurrence-id) of the changed or cancelled repetitions
+    event = None
+    nested = []  # the components inside the event that are skipped (z.B. VALARM)
+    found_calendar = False
+    found_content = False
+    for number, line in unfold(lines):
+        if line.strip() == "":
+            continue
+        found_content = True
+        try:
+            name, parameters, value, column = split_contentline(line)
+        except ValueError as error:
+            if event is not None and len(nested) == 0:
+                errors.append(ScheduleError(number, 1, str(error)))
+                event["problem"] = True
+            continue
+        if name == "BEGIN" and value.upper() == "VCALENDAR":
+            found_calendar = True
+        elif name == "BEGIN" and value.upper() == "VEVENT" and event is None:
+            event = {"line": number, "summary": "", "uid": None, "status": "", "rdates": [], "exdates": [],
+                     "rrule": None, "recurrence_id": None, "problem": False}
+        elif event is None:
+            continue
+        elif name == "BEGIN":
+            nested.append(value.upper())
+        elif name == "END" and len(nested) > 0:
+            if value.upper() == nested[-1]:
+                nested.pop()
+        elif len(nested) > 0:
+            continue
+        elif name == "END":
+            finished = finish_event(event, errors)
+            if finished is not None:
+                if event["recurrence_id"] is not None:
+                    overrides.append((event["uid"], event["recurrence_id"]))
+                if event["status"] != "CANCELLED":
+                    events.append(finished)
+            event = None
+        else:
+            try:
+                read_property(event, name, parameters, value)
+            except ValueError as error:
+                errors.append(ScheduleError(number, column, f"{name}: {error}"))
+                event["problem"] = True
+    if found_content and not found_calendar:
+        errors.append(ScheduleError(1, 1, "no BEGIN:VCALENDAR - it's not an iCalendar file"))
+    # a changed or cancelled repetition (RECURRENCE-ID) replaces the original one of the repeated event:
+    for uid, recurrence_id in overrides:
+        for original in events:
+            if original["uid"] == uid and original["rrule"] is not None:
+                original["exdates"].append(recurrence_id)
+    for finished in events:
+        del finished["uid"]
+    return events, errors
+
+
+def read_property(event, name, parameters, value):
+    """takes over a property of the event (raises ValueError if its value isn't valid)"""
+    if name == "DTSTART":
+        event["start"] = parse_moment(value, parameters)
+    elif name == "DTEND":
+        event["end"] = parse_moment(value, parameters)
+    elif name == "DURATION":
+        event["duration"] = parse_duration(value)
+    elif name == "SUMMARY":
+        event["summary"] = unescape(value)
+    elif name == "UID":
+        event["uid"] = value
+    elif name == "STATUS":
+        event["status"] = value.upper()
+    elif name == "RRULE":
+        event["rrule"] = parse_rrule(value)
+    elif name == "RDATE":
+        if parameters.get("VALUE") == "PERIOD":
+            raise ValueError("periods aren't supported")
+        event["rdates"].extend(parse_moment(single, parameters) for single in value.split(","))
+    elif name == "EXDATE":
+        event["exdates"].extend(parse_moment(single, parameters) for single in value.split(","))
+    elif name == "RECURRENCE-ID":
+        event["recurrence_id"] = parse_moment(value, parameters)
+
+
+def finish_event(event, errors):
+    """Checks the read event (at END:VEVENT) and returns it in the format of parse_ics, or None if it has a problem."""
+    if event["problem"]:
+        return None
+    if "start" not in event:
+        errors.append(ScheduleError(event["line"], 1, "the event has no DTSTART"))
+        return None
+    start = to_moment(event["start"])
+    allday = len(event["start"]) == 10
+    if "end" in event:
+        end = to_moment(event["end"])
+    elif "duration" in event:
+        end = start + event["duration"]
+    else:
+        end = start + timedelta(days=1) if allday else start  # (a date alone is the whole day)
+    if end < start:
+        errors.append(ScheduleError(event["line"], 1, f"the event ends ({end}) before it starts ({event['start']})"))
+        return None
+    endformat = dateformat if allday and end.time() == time() else datetimeformat
+    return {"summary": event["summary"], "uid": event["uid"], "start": event["start"], "end": end.strftime(endformat),
+            "rrule": event["rrule"], "rdates": event["rdates"], "exdates": event["exdates"]}
+
+
+def to_moment(text):
+    """the datetime of a 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM' string"""
+    return datetime.fromisoformat(text)
+
+
+def prepare_event(event):
+    """converts an event of parse_ics to an Event (with datetimes, for the expansion)"""
+    start = to_moment(event["start"])
+    rule = None
+    if event["rrule"] is not None:
+        parts = event["rrule"]
+        byday = []
+        for single in parts.get("BYDAY", "").split(",") if "BYDAY" in parts else []:
+            position, weekdayname = byday_pattern.fullmatch(single).groups()
+            byday.append((int(position) if position is not None else None, weekdaynames.index(weekdayname)))
+        until = to_moment(parts["UNTIL"]) if "UNTIL" in parts else None
+        if until is not None and len(parts["UNTIL"]) == 10:
+            until = datetime.combine(until.date(), time.max)  # (a date includes the whole day)
+        rule = Rule(parts["FREQ"], int(parts.get("INTERVAL", 1)), int(parts["COUNT"]) if "COUNT" in parts else None,
+                    until, [int(month) for month in parts["BYMONTH"].split(",")] if "BYMONTH" in parts else [],
+                    [int(day) for day in parts["BYMONTHDAY"].split(",")] if "BYMONTHDAY" in parts else [],
+                    byday, weekdaynames.index(parts.get("WKST", "MO")))
+    return Event(event["summary"], start, to_moment(event["end"]) - start, rule,
+                 {to_moment(rdate) for rdate in event["rdates"]}, {to_moment(exdate) for exdate in event["exdates"]})
+
+
+def week_begin(day, wkst):
+    """the first day of the week of day (the week starts on the weekday wkst, 0 = Monday)"""
+    return day - timedelta(days=(day.weekday() - wkst) % 7)
+
+
+def add_months(day, months):
+    """the first day of the month that lies months after the month of day (None after the year 9999)"""
+    monthnumber = day.year * 12 + day.month - 1 + months
+    if monthnumber // 12 > 9999:
+        return None
+    return date(monthnumber // 12, monthnumber % 12 + 1, 1)
+
+
+def period_begin(dtstart, rule, period):
+    """the first day of the period (day, week, month or year) number period after the one of dtstart"""
+    try:
+        if rule.freq == "DAILY":
+            return dtstart.date() + timedelta(days=period)
+        if rule.freq == "WEEKLY":
+            return week_begin(dtstart.date(), rule.wkst) + timedelta(weeks=period)
+        if rule.freq == "MONTHLY":
+            return add_months(dtstart.date(), period)
+        return date(dtstart.year + period, 1, 1) if dtstart.year + period <= 9999 else None
+    except OverflowError:
+        return None
+
+
+def periods_between(dtstart, moment, rule):
+    """the number of whole periods from the one of dtstart to the one of moment"""
+    if rule.freq == "DAILY":
+        return (moment.date() - dtstart.date()).days
+    if rule.freq == "WEEKLY":
+        return (week_begin(moment.date(), rule.wkst) - week_begin(dtstart.date(), rule.wkst)).days // 7
+    if rule.freq == "MONTHLY":
+        return (moment.year - dtstart.year) * 12 + moment.month - dtstart.month
+    return moment.year - dtstart.year
+
+
+def weekdays_in(first, length, byday):
+    """the days (set of dates) of the BYDAY values in the range of length days from first (a month or a year): all the
+    days of a weekday, or only the one at the position (z.B. 2 = the second, -1 = the last)"""
+    found = set()
+    for position, weekday in byday:
+        days = [first + timedelta(days=offset) for offset in range((weekday - first.weekday()) % 7, length, 7)]
+        if position is None:
+            found.update(days)
+        elif position <= len(days) and -position <= len(days):
+            found.add(days[position - 1] if position > 0 else days[position])
+    return found
+
+
+def month_days(first, rule, dtstart):
+    """the days (sorted list of dates) of the rule in the month that starts at first"""
+    length = calendar.monthrange(first.year, first.month)[1]
+    days = None
+    if len(rule.bymonthday) > 0:
+        days = {first.replace(day=monthday if monthday > 0 else length + 1 + monthday) for monthday in rule.bymonthday
+                if abs(monthday) <= length}
+    if len(rule.byday) > 0:
+        bydays = weekdays_in(first, length, rule.byday)
+        days = bydays if days is None else days & bydays
+    if days is None:
+        days = {first.replace(day=dtstart.day)} if dtstart.day <= length else set()  # (z.B. no 31st in April)
+    return sorted(days)
+
+
+def period_days(dtstart, rule, begin):
+    """the days (sorted list of dates) of the rule in the period that starts at begin"""
+    if rule.freq == "DAILY":
+        days = [begin]
+        if len(rule.bymonthday) > 0:
+            length = calendar.monthrange(begin.year, begin.month)[1]
+            days = [day for day in days if day.day in rule.bymonthday or day.day - length - 1 in rule.bymonthday]
+        if len(rule.byday) > 0:
+            days = [day for day in days if day.weekday() in [weekday for _, weekday in rule.byday]]
+    elif rule.freq == "WEEKLY":
+        weekdays = [weekday for _, weekday in rule.byday] or [dtstart.weekday()]
+        days = sorted({begin + timedelta(days=(weekday - begin.weekday()) % 7) for weekday in weekdays})
+    elif rule.freq == "MONTHLY":
+        days = month_days(begin, rule, dtstart)
+    elif len(rule.bymonth) == 0 and len(rule.byday) > 0 and len(rule.bymonthday) == 0:
+        # (the positions count in the whole year, z.B. 20MO = the 20th Monday of the year)
+        days = sorted(weekdays_in(begin, 366 if calendar.isleap(begin.year) else 365, rule.byday))
+    else:  # YEARLY, in the months of BYMONTH (or all the months with BYMONTHDAY, or the month of dtstart)
+        months = rule.bymonth or (range(1, 13) if len(rule.bymonthday) > 0 else [dtstart.month])
+        days = [day for month in sorted(months) for day in month_days(begin.replace(month=month), rule, dtstart)]
+    if len(rule.bymonth) > 0:
+        days = [day for day in days if day.month in rule.bymonth]
+    return days
+
+
+def rule_starts(dtstart, rule, earliest, end):
+    """Yields the starts (datetimes, sorted) of the repetitions of the rule up to end. Without COUNT, the periods that
+    lie completely before earliest are skipped arithmetically (with COUNT, they have to be counted)."""
+    period = 0
+    if rule.count is None and earliest > dtstart:
+        period = max(periods_between(dtstart, earliest, rule) // rule.interval - 1, 0) * rule.interval
+    produced = 0
+    while True:
+        begin = period_begin(dtstart, rule, period)
+        if begin is None or begin > end.date() or (rule.until is not None and begin > rule.until.date()):
+            return
+        for day in period_days(dtstart, rule, begin):
+            start = datetime.combine(day, dtstart.time())
+            if start < dtstart:
+                continue
+            if start > end or (rule.until is not None and start > rule.until):
+                return
+            yield start
+            produced += 1
+            if rule.count is not None and produced >= rule.count:
+                return
+        period += rule.interval
+
+
+def event_starts(event, start, end):
+    """yields the starts (sorted) of the repetitions of the event that overlap the range from start to end"""
+    earliest = start - event.duration  # (a repetition that starts before the range can still reach into it)
+    if event.rule is None:
+        starts = [event.start]
+    else:
+        starts = rule_starts(event.start, event.rule, earliest, end)
+    previous = None
+    for occurrence in heapq.merge(starts, sorted(event.rdates)):
+        if occurrence > end:
+            return
+        if occurrence == previous or occurrence in event.exdates:
+            continue
+        previous = occurrence
+        if occurrence + event.duration > start or occurrence >= start:
+            yield occurrence
+
+
+def covered_days(start, end):
+    """the days that an event from start to end covers (the end is excluded - an event that ends at midnight doesn't
+    cover the day after it)"""
+    last = end.date() if end.time() != time() or end == start else end.date() - timedelta(days=1)
+    day = start.date()
+    while day <= last:
+        yield day
+        day += timedelta(days=1)
+
+
+class IcsCalendar():
+    """The events of an imported calendar (see parse_ics), with the repetitions expanded lazily for a window of
+    window_days days."""
+
+    def __init__(self, events=(), window_days=400):
+        self.events = [prepare_event(event) for event in events]
+        self.window_days = window_days
+        self.window = None  # (first day, last day) of the days in the index
+        self.days = {}  # the index: date -> summary of the (first) event that covers the day, for the days of the window
+
+    def __len__(self):
+        return len(self.events)
+
+    def occurrences(self, start, end):
+        """returns the repetitions (start, end, summary) of the events that overlap the range from start to end, sorted
+        by their start"""
+        found = []
+        for event in self.events:
+            for occurrence in event_starts(event, start, end):
+                found.append((occurrence, occurrence + event.duration, event.summary))
+        found.sort()
+        return found
+
+    def expand_window(self, day):
+        """builds the index of the days for the window that starts at day (if day isn't in the window yet)"""
+        if self.window is not None and self.window[0] <= day <= self.window[1]:
+            return
+        first, last = day, day + timedelta(days=self.window_days)
+        self.days = {}
+        for start, end, summary in self.occurrences(datetime.combine(first, time()), datetime.combine(last, time.max)):
+            for covered in covered_days(start, end):
+                if first <= covered <= last:
+                    self.days.setdefault(covered, summary)
+        self.window = (first, last)
+
+    def holiday_on(self, day):
+        """the summary of the event on the day (date), or None if the calendar has no event on this day"""
+        if len(self.events) == 0:
+            return None
+        self.expand_window(day)
+        return self.days.get(day)
+
+    def intervals(self, start, end):
+        """the events that overlap the range from start to end as vacations: a list of (start, end) date-strings
+        ('YYYY-MM-DD HH:MM', like the holiday-times of the urlaub-file)"""
+        return [(occurrencestart.strftime(datetimeformat), occurrenceend.strftime(datetimeformat))
+                for occurrencestart, occurrenceend, _ in self.occurrences(start, end) if occurrenceend > occurrencestart]
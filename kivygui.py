@@ -0,0 +1,588 @@
+"""
+Touchscreen front end (Kivy) of the heating control.
+
+The control itself (classes Heizung and Robot) is in Heizsteierung.py, which doesn't need kivy - this module is only
+imported when the GUI is started (python Heizsteierung.py, without --headless), so that the control can also run on a
+computer without screen (see heizdaemon.py), and kivy isn't loaded there.
+The GUI calls the methods of the class Heizung when a button is pressed, shows the states in labels, and checks the
+changing-times with the Kivy Clock.
+"""
+
+
+import logging
+import time
+import os
+from datetime import datetime, timedelta
+
+# the following is needed because otherwise (with KIVY_LOG_MODE = "KIVY"), kivy will affect all logs, even of third-party
+#   modules, and for example the module "logging" will not write to a file as expected:
+os.environ['KIVY_LOG_MODE'] = 'MIXED'  # needs to be done before the import of kivy!
+
+from kivy.config import Config
+# everything here must be above all the other imports:
+Config.set("graphics", "position", "custom")  # position must be set to "custom" (here that way or manually in the kivy configuration file), otherwise it doesn't work
+Config.set("graphics", "left", 0)  # coordinate system
+Config.set("graphics", "top", 0)
+Config.set("graphics", "height", 430)  # 445
+Config.set("graphics", "width", 795)  # 800
+#Config.set("graphics", "allow_screensaver", True)  # more on kivy configurations: https://kivy.org/doc/stable/api-kivy.config.html#module-kivy.config, but doesn't work
+
+import kivy
+from kivy.app import App
+from kivy.uix.button import Button
+from kivy.uix.label import Label
+from kivy.uix.floatlayout import FloatLayout
+
+from kivy.clock import Clock
+
+from ownlabel import MyWarnLabel  # own module with custom kivy-label (it's a label that tells the user to wait while actions run)
+
+from Heizsteierung import Heizung, testerei, zeiten_testerei, onlyerrorlog, versionnr, watch_datafiles, robot_ip, \
+    myrobot_ip, api_port
+from filewatcher import FileWatcher  # own module that notices changes of the data-files
+from heizapi import HeizApi  # own module with the HTTP API (for phones and scripts in the local network)
+
+kivy.require('2.1.0')
+
+errorlogger = logging.getLogger("errorlog")  # the loggers of Heizsteierung (they write to the logfiles)
+actionlogger = logging.getLogger("actionlog")
+
+
+class KivyGui(App):
+    """gets called in the class Interface(), and calls itself the methods of the class Heizung that are needed.
+    Creates the graphical interface with Kivy."""
+
+    def __init__(self):
+        super(KivyGui, self).__init__()
+        self.myheizung = Heizung()
+        self.commandstart = time.monotonic()  # start time of the running robot command (for the please-wait-label)
+        self.progressevent = None  # kivy-event that refreshes the please-wait-label while a robot command runs
+        self.checkevent = None  # kivy-event of the next scheduled check of the times
+        self.reconcile_queued = False  # True while a reconcile waits in the executor (see run_reconcile)
+        self.filewatcher = None  # watches the data-files (started in build(), if watch_datafiles is True)
+        self.api = None  # the HTTP API (started in build(), if api_port isn't None)
+        logging.debug("init of the class KivyGui activated")
+
+    # to build the application we have to return a widget on the build() function:
+    def build(self):
+        layout = FloatLayout()
+        self.title = f"Heizungssteierung V {versionnr}"  # window title
+
+        # BUTTON ACTIONS:
+
+        def dispatch_to_kivy(callback):
+            """passes a callback from the worker thread of the executor to the kivy main thread (kivy widgets may only
+            be changed from there)"""
+            Clock.schedule_once(lambda dt: callback())
+
+        def popup_on(nobutton_assigned):
+            """to activate the popup-label ("Please wait"), when a button is pressed"""
+            if lbpopup.parent is None:  # (the label could already be shown, if another command is still running)
+                layout.add_widget(lbpopup)
+                self.progressevent = Clock.schedule_interval(popup_progress, 0.5)
+        def popup_off(nobutton_assigned):
+            """to deactivate the popup-label ("Please wait"), as soon as no robot command is running anymore"""
+            if lbpopup.parent is not None and not self.myheizung.executor.busy():
+                layout.remove_widget(lbpopup)
+                self.progressevent.cancel()
+                lbpopup.text = "Please wait ..."
+        def popup_progress(dt):
+            """refreshes the popup-label with the running command and the time since it was started"""
+            if lbpopup.parent is not None:
+                running = self.myheizung.executor.current
+                if running is not None:
+                    done, total = self.myheizung.myrobot.progress
+                    steps = f", {done}/{total}" if total > 1 else ""
+                    # (the expected duration of the robot messages, learned from the previous ones - see robottiming)
+                    expected = self.myheizung.myrobot.expected
+                    estimate = f" / ca. {expected:.0f} s" if expected > 0 else ""
+                    lbpopup.text = f"Please wait ...\n{running} ({int(time.monotonic() - self.commandstart)} s{estimate}{steps})"
+                else:
+                    lbpopup.text = "Please wait ..."
+
+        def run_robotcommand(description, function, on_response):
+            """carries out a (slow) robot command in the worker thread of the executor, so that the GUI keeps running.
+            When the command is finished, on_response is called (in the kivy main thread) with its return value."""
+            def command_done(future):
+                if future.exception() is not None:
+                    response = f"Feeler: {future.exception()!r}"
+                else:
+                    response = future.result()
+                on_response(response)
+                refresh_statuslabels()
+                reschedule_check()  # (the desired state changed - the next change that matters could be another one)
+                popup_off(None)
+
+            def command(*args):
+                self.commandstart = time.monotonic()
+                return function(*args)
+
+            popup_on(None)
+            self.myheizung.executor.submit(command, on_done=command_done, dispatcher=dispatch_to_kivy, description=description)
+
+        def show_robotresponse(response):
+            lboutput.text = f"Roboter/Kommunikatioun get zréck: {response}"
+            #if onlyerrorlog == False and testerei == False:
+            #    actionlogger.info(f"Roboter/Kommunikatioun get zréck: {response}")
+
+        def run_reconcile(description):
+            """lets the robot bring the boiler to the desired state (Heizung.reconcile) in the worker thread.
+            If a reconcile is already waiting in the executor, no second one is submitted: the waiting one will
+            take the latest desired state into account (so several requests are collapsed into one robot action)."""
+            if self.reconcile_queued:
+                popup_off(None)  # (the label stays, as long as the executor is busy)
+                return
+            self.reconcile_queued = True
+            def reconcile_command():
+                self.reconcile_queued = False  # (requests from now on need a new reconcile)
+                return self.myheizung.reconcile()
+            run_robotcommand(description, reconcile_command, show_robotresponse)
+
+        def set_raise_now(currentbutton):
+            """action bound to the raise-now-button btnrop"""
+            logging.debug(f"'{currentbutton.text}' pushed")
+            if onlyerrorlog == False and testerei == False:
+                actionlogger.info(f"'{currentbutton.text}' gedréckt")
+            response = self.myheizung.request_raise()
+            if response == True:
+                run_reconcile(currentbutton.text)
+            else:
+                popup_off(currentbutton)
+                show_robotresponse(response)
+
+        def set_reduce_now(currentbutton):
+            """action bound to the reduce-now-button btnrof"""
+            logging.debug(f"'{currentbutton.text}' pushed")
+            if onlyerrorlog == False and testerei == False:
+                actionlogger.info(f"'{currentbutton.text}' gedréckt")
+            response = self.myheizung.request_reduce()
+            if response == True:
+                run_reconcile(currentbutton.text)
+            else:
+                popup_off(currentbutton)
+                show_robotresponse(response)
+
+        def set_longer_warm(currentbutton):
+            """action bound to the longer-warm-button btnsetlonger"""
+            logging.debug(f"'{currentbutton.text}' pushed")
+            if onlyerrorlog == False and testerei == False:
+                actionlogger.info(f"'{currentbutton.text}' gedréckt")
+            # call the method of Heizung that makes the needed changes to not reduce the temp in the evening:
+            response_longer = self.myheizung.longer_warm()
+            if response_longer == True:
+                lboutput.text = f"nei Zäiten fier haut: {self.myheizung.changetimes_today}"
+                lblongerwarm.text = "länger warm an"
+                reschedule_check()
+                if testerei == False and onlyerrorlog == False:
+                    actionlogger.info(f"nei Zäiten fier haut: {self.myheizung.changetimes_today}")
+            else:
+                lboutput.text = response_longer
+
+        def set_longer_warm_back(currentbutton):
+            """action bound to the undo-longer-warm-button btnsetlongerback"""
+            logging.debug(f"'{currentbutton.text}' pushed")
+            if onlyerrorlog == False and testerei == False:
+                actionlogger.info(f"'{currentbutton.text}' gedréckt")
+            response_longerback = self.myheizung.longer_warm_back()
+            if response_longerback == True:
+                lboutput.text = f"nei Zäiten fier haut: {self.myheizung.changetimes_today}"
+                lblongerwarm.text = ""
+                reschedule_check()
+                if testerei == False and onlyerrorlog == False:
+                    actionlogger.info(f"nei Zäiten fier haut: {self.myheizung.changetimes_today}")
+            else:
+                lboutput.text = response_longerback
+
+        def set_tomorrow_holiday(currentbutton):
+            """action bound to the tomorrow-holiday-button btnholiday"""
+            logging.debug(f"'{currentbutton.text}' pushed")
+            if onlyerrorlog == False and testerei == False:
+                actionlogger.info(f"'{currentbutton.text}' gedréckt")
+            response_tomorrow = self.myheizung.tomorrow_holiday()  # returns True, "länger warm as an!" or "Näischt gemat"
+            if response_tomorrow == True:
+                lboutput.text = f"muar-Feierdag as aktivéiert. Nei Zäiten fier haut: {self.myheizung.changetimes_today}"
+                reschedule_check()
+                if testerei == False and onlyerrorlog == False:
+                    actionlogger.info(lboutput.text)
+            else:
+                lboutput.text = response_tomorrow
+
+        def set_tomorrow_holiday_back(currentbutton):
+            """action bound to the undo-tomorrow-holiday-button btnholidayback"""
+            logging.debug(f"'{currentbutton.text}' pushed")
+            if onlyerrorlog == False and testerei == False:
+                actionlogger.info(f"'{currentbutton.text}' gedréckt")
+            response_tomorrowback = self.myheizung.tomorrow_holiday_back()
+            if response_tomorrowback == True:
+                lboutput.text = f"muar-Feierdag as rem ausgeschalt. Zäiten fier haut: {self.myheizung.changetimes_today}"
+                reschedule_check()
+                if testerei == False and onlyerrorlog == False:
+                    actionlogger.info(lboutput.text)
+            else:
+                lboutput.text = response_tomorrowback
+
+        def get_holidaydata(currentbutton):
+            """when the associated button is pushed, it calls the methods to load the automatic holiday changes from the file"""
+            logging.debug(f"'{currentbutton.text}' pushed")
+            if onlyerrorlog == False and testerei == False:
+                actionlogger.info(f"'{currentbutton.text}' gedréckt")
+            reload_holidaydata()
+
+        def reload_holidaydata():
+            """loads the holiday changes from the file and shows the result (for the button, and when the file changed)"""
+            response_urlaub = self.myheizung.refresh_urlaub()  # returns False or a dict (either empty or with data)
+            reschedule_check()
+            if response_urlaub == False:
+                lboutput.text = "Problem mat der Datei/Formateirung vun urlaubdata!" + parseerrors_text()
+                logging.debug(lboutput.text)
+                if testerei == False:
+                    errorlogger.error(lboutput.text)
+            elif response_urlaub == {}:
+                lboutput.text = "urlaubdata as eidel!"
+                logging.debug(lboutput.text)
+                if testerei == False:
+                    errorlogger.error(lboutput.text)
+            else:  # it's the right, non-empty dict
+                lboutput.text = f"urlaubdata get zréck: {response_urlaub}"
+                logging.debug(f"urlaubdata loaded. urlaubdata returns: {response_urlaub}. urlaub_times is now: {self.myheizung.urlaub_times}")
+                if testerei == False and onlyerrorlog == False:
+                    actionlogger.info(f"urlaubdata ragelueden. urlaubdata get zréck: {response_urlaub}. urlaub_times as lo: {self.myheizung.urlaub_times}")
+
+        def get_timedata(currentbutton):
+            """when the associated button is pushed, it calls the methods to load the automatic status-changing times from the file"""
+            logging.debug(f"'{currentbutton.text}' pushed")
+            if onlyerrorlog == False and testerei == False:
+                actionlogger.info(f"'{currentbutton.text}' gedréckt")
+            reload_timedata()
+
+        def reload_timedata():
+            """loads the status-changing times from the file and shows the result (for the button, and when the file changed)"""
+            response_times = self.myheizung.refresh_changetimes()  # returns False or an "empty" dict or normal dict
+            reschedule_check()
+            if response_times == False:
+                lboutput.text = "Problem mat der Datei/Formateirung vun timesdata!" + parseerrors_text()
+                logging.debug(lboutput.text)
+                #if testerei == False:
+                #    errorlogger.error(lboutput.text)
+            elif response_times == "empty":  # default_changetimes is an "empty" nested dict
+                lboutput.text = "timesdata as eidel!"
+                logging.debug(lboutput.text)
+                #if testerei == False:
+                #    errorlogger.error(lboutput.text)
+            elif response_times == "muar-Feierdag":
+                lboutput.text = f"muar-Feierdag as aktiv - d'Zäiten kennen net agelies gin."
+                logging.debug(lboutput.text)
+            else: # it is the right dict/format
+                lboutput.text = f"timesdata as ragelueden gin / Fier haut as: {self.myheizung.changetimes_today}"
+                #logging.debug(f"timesdata loaded. timesdata returns: {response_times}.\n change_times is now: {self.myheizung.change_times}")
+                #if testerei == False and onlyerrorlog == False:
+                #    actionlogger.info(f"timesdata ragelueden. timesdata get zréck: {response_times}.\n change_times as lo: {self.myheizung.change_times}")
+
+                # automatic adjustments based on new timesdata, when necessary:
+                if response_times == "reduce now":
+                    btnrof.trigger_action()  # this is like pushing the button btnrof (carried out this way so that the please-wait-label appears)
+                elif response_times == "raise now":
+                    btnrop.trigger_action()  # this is like pushing the button btnrop (carried out this way so that the please-wait-label appears)
+                elif response_times == "status was none":
+                    lboutput.text = "PROBLEM BEIM UPASSEN UN DEI NEI TIMESDATA! (de status war 'none')"
+
+        def reload_calendar(filename):
+            """loads an imported calendar (holidays or vacations) and shows the result (when the file changed)"""
+            response_calendar = self.myheizung.refresh_calendar(filename)  # returns False or the number of events
+            refresh_statuslabels()
+            reschedule_check()
+            if response_calendar == False:
+                lboutput.text = f"Problem mat dem Kalenner {os.path.basename(filename)}!" + parseerrors_text()
+                logging.debug(lboutput.text)
+            else:
+                lboutput.text = f"Kalenner {os.path.basename(filename)} ragelueden: {response_calendar} Evenementer"
+
+        def parseerrors_text():
+            """the first problems found in the loaded data-file (for the output-label)"""
+            errors = self.myheizung.parseerrors
+            text = "".join(f"\n{error}" for error in errors[:3])
+            if len(errors) > 3:
+                text += f"\n(+ {len(errors) - 3} weider)"
+            return text
+
+        def datafile_changed(filename):
+            """called (in the kivy main thread) by the file watcher when the content of a data-file changed - the file is
+            loaded like with the load-buttons, so that edits (z.B. over SSH) take effect without touching the screen"""
+            logging.debug(f"data-file {filename} changed, loading it")
+            if onlyerrorlog == False and testerei == False:
+                actionlogger.info(f"D'Datei {filename} as geännert gin - gët automatesch ragelueden")
+            reload_datafile(filename)
+
+        def reload_datafile(filename):
+            """loads the data-file (for the file watcher and the HTTP API)"""
+            if os.path.basename(filename) == os.path.basename(self.myheizung.timesfile):
+                reload_timedata()
+            elif os.path.basename(filename) in [os.path.basename(calendarfile) for calendarfile in self.myheizung.calendarfiles]:
+                reload_calendar(filename)
+            else:
+                reload_holidaydata()
+
+        def api_changed():
+            """called (in the kivy main thread) when the HTTP API changed the changing-times (longer-warm, tomorrow-holiday)"""
+            refresh_statuslabels()
+            reschedule_check()
+
+
+        def call_robottest(currentbutton):
+            logging.debug(f"'{currentbutton.text}' pushed")
+            if onlyerrorlog == False and testerei == False:
+                actionlogger.info(f"'{currentbutton.text}' gedréckt")
+            def show_testresponse(response):
+                lboutput.text = f"Roboter/Kommunikatioun get zréck: {response}"
+                if onlyerrorlog == False and testerei == False:
+                    actionlogger.info(lboutput.text)
+            run_robotcommand(currentbutton.text, self.myheizung.test_robot, show_testresponse)
+
+        def test_robocommunication(currentbutton):
+            logging.debug(f"'{currentbutton.text}' pushed")
+            if onlyerrorlog == False and testerei == False:
+                actionlogger.info(f"'{currentbutton.text}' gedréckt")
+            def show_commresponse(commresponse):
+                lboutput.text = f"Roboter/Kommunikatioun get zréck: {commresponse}"
+                if onlyerrorlog == False and testerei == False:
+                    actionlogger.info(lboutput.text)
+            run_robotcommand(currentbutton.text, lambda: self.myheizung.myrobot.send_message("test."), show_commresponse)
+
+        def start_communicationtest():
+            """tests the communication with the robot on start, in the worker thread - without the please-wait-label,
+            so that the buttons can be used at once (a robot command waits until the test is done)"""
+            def show_communicationtest(future):
+                communicationworks = future.result() if future.exception() is None else f"Feeler: {future.exception()!r}"
+                # (the start message is only replaced if there is no newer message, or if the communication doesn't work)
+                if lboutput.text == startmessage or communicationworks != True:
+                    lboutput.text = f"Kommunikatioun funzt?: {communicationworks}"
+            self.myheizung.executor.submit(self.myheizung.check_communication, on_done=show_communicationtest,
+                                           dispatcher=dispatch_to_kivy, description="Kommunikatiounstest")
+
+
+        def refresh_kivy_time(nobutton_assigned):
+            """refreshes the clock, and schedules itself again for the beginning of the next minute (the clock only
+            shows hours and minutes, so it doesn't need to run every second)"""
+            # refresh the clock of the class Heizung (by calling the own method of the class Heizung):
+            self.myheizung.refresh_heiz_time()
+            # refresh the clock label in the GUI (otherwise the first time from the starting would remain without being updated):
+            lbclock.text = self.myheizung.zeit
+            now = datetime.now()
+            Clock.schedule_once(refresh_kivy_time, 60 - now.second - now.microsecond / 1000000)
+
+        def refresh_statuslabels():
+            """refreshes the indicators of status and longerwarm_on in the GUI (and shows if the robot is considered
+            unreachable, see circuitbreaker)"""
+            breaker = self.myheizung.myrobot.breaker
+            if breaker.state == "open":
+                nexttest = (datetime.now() + timedelta(seconds=breaker.retry_in())).strftime("%H:%M:%S")
+                lbstatus.text = f"status: {self.myheizung.status}\nRoboter net erreechbar (nächsten Test ëm {nexttest})"
+            elif breaker.state == "half_open":
+                lbstatus.text = f"status: {self.myheizung.status}\nRoboter gët getest ..."
+            else:
+                lbstatus.text = f"status: {self.myheizung.status}"
+            lblongerwarm.text = "länger warm an" if self.myheizung.longerwarm_on else ""
+
+        def reschedule_check(*args):
+            """(re)computes when the next check of the times is due and schedules it (an already scheduled check is
+            replaced). Has to be called when the times change (loading the files, longer-warm, tomorrow-holiday)."""
+            if self.checkevent is not None:
+                self.checkevent.cancel()
+            self.checkevent = Clock.schedule_once(scheduled_check, self.myheizung.seconds_until_next_check())
+            refresh_nextlabel()
+
+        def refresh_nextlabel():
+            """shows the next change of the state (from the timeline of the Heizung, see heiztimeline)"""
+            upcoming = self.myheizung.timeline().next_transitions(1)
+            if len(upcoming) == 0:
+                lbnext.text = ""
+            else:
+                lbnext.text = f"nächst: {upcoming[0].moment.strftime('%d.%m. %H:%M')} {upcoming[0].state}"
+
+        def scheduled_check(dt):
+            """runs the check at the computed moment, and schedules the next one"""
+            self.myheizung.refresh_heiz_time()
+            lbclock.text = self.myheizung.zeit
+            check_kivy_statusandactions(None)
+            reschedule_check()
+
+
+        def check_kivy_statusandactions(nobutton_assigned):
+            """refreshes the indicators of status and longerwarm_on in the GUI.
+            If the Heizung.check_heiz_statusandactions() method returns that a status has to be automatically changed
+            because of time settings, the correspondent button is triggered here in the KivyGui (it is done this way and
+            not by calling the robot directly from the class Heizung as the button-trigger implies that the please-wait-label
+            appears in the GUI)."""
+            heizstatus_response = self.myheizung.check_heiz_statusandactions()
+            refresh_statuslabels()
+
+            # automatic adjustments based on time, when necessary:
+            if heizstatus_response == "reconcile":
+                run_reconcile(f"automatesch: {self.myheizung.desired_status}")
+            elif heizstatus_response == False:
+                lboutput.text = "PROBLEM BEIM AUTOMATESCHEN EMSCHALTEN vun Zäiten/urlaub! (ev. war de status 'none'?)"
+            elif heizstatus_response != None:  # example: "Vakanz ageschalt" (holiday activated)
+                lboutput.text  = f"Roboter/Kommunikatioun get zréck: {heizstatus_response}"
+
+
+        def test_statuschanging(nobutton_assigned):
+            """function to change the time arbitrarily to test methods which rely on time (e.g. when the status
+            should change and be displayed in the GUI). The minutes are incremented to mimic a normal time elapsing/changing.
+            The desired starting time has to be set where the function is called (as it has to be outside of the
+            function to not set the time to start with every function call).
+            (Isn't needed anymore since the implementation of the time data from the files, as now change-times can be
+            easily changed in the time-file during runtime for testing)."""
+            logging.debug("Fonctioun test_statuschanging as agesprong")
+            if type(self.myheizung.zeit) != str:
+                print("self.myheizung.zeit:", self.myheizung.zeit.strftime("%H:%M"))  # only print the hours and minutes
+            elif type(self.myheizung.zeit) == str:
+                print("self.myheizung.zeit:", self.myheizung.zeit)
+                self.myheizung.zeit = datetime.strptime(self.myheizung.zeit, "%H:%M")  # it has to be a datetime object to be able to add 1 minute
+            self.myheizung.zeit +=  timedelta(minutes = 1)
+            self.myheizung.zeit = self.myheizung.zeit.strftime("%H:%M")  # change again the time to string for the rest of the program and for displaying
+            lbclock.text = self.myheizung.zeit
+
+
+        # SCHEDULES / PRESENT READINGS:
+        # show at once when the robot is considered unreachable or reachable again (the circuit breaker changes its
+        #   state in the worker thread or in its own thread):
+        self.myheizung.myrobot.breaker.listeners.append(lambda state, previous: dispatch_to_kivy(refresh_statuslabels))
+        # test the communication with the robot (in the background, the result is shown in lboutput):
+        start_communicationtest()
+        if zeiten_testerei == False:
+            # refresh the clock every minute (calls refresh_kivy_time(), which refreshes the clock label in the window and the zeit-attribute of the class Heizung):
+            Clock.schedule_once(refresh_kivy_time)
+            # check the status of the heizung and if actions have to be taken - not every second, but only at the
+            #   moments when something is due (the check schedules itself again for the next due moment):
+            Clock.schedule_once(scheduled_check)
+        # to test if the status of the class Heizung changes as it should on given times of the day:
+        else: # (if zeiten_testerei == True)
+            returned_status = self.myheizung.read_timesstatus()
+            if returned_status != False:
+                self.myheizung.status = self.myheizung.desired_status = returned_status
+            else:
+                logging.error("status-ofchecken mat den changetimes get False!")
+            Clock.schedule_interval(test_statuschanging, 5)  # This is basically a replacement for the time update for testing (so that I can use the times I need for the test)
+            Clock.schedule_interval(check_kivy_statusandactions, 5)  # check the status of Heizung regularly
+
+        # load the data-files automatically when they are changed:
+        if watch_datafiles == True:
+            self.filewatcher = FileWatcher([self.myheizung.timesfile, self.myheizung.urlaubfile] + self.myheizung.calendarfiles,
+                                           datafile_changed, dispatcher=dispatch_to_kivy)
+            self.filewatcher.start()
+        # the actions and the state are also available over HTTP (the actions are carried out in the kivy main thread):
+        if api_port is not None:
+            self.api = HeizApi(self.myheizung, dispatch_to_kivy, run_reconcile, reload_datafile, on_change=api_changed)
+            self.api.start()
+
+
+        # BUTTONS AND LABELS:
+
+        # (size_hint = (width-percent, height-percent))  # size_hint should be used with pos_hint (and not pos) to allow the elements to find their places when the window is resized
+        # (pos = (sideways, bottom-top)  # starts at the bottom left corner with 0,0 (for the top left corner you need e.g. (0, 500))
+        # (pos_hint = )  # position of the elements by percentage, Bsp: pos_hint={'center_x': .5, 'center_y': .5})
+
+        # clock-Label:
+        lbclock = Label(text = str(datetime.now().strftime("%H:%M")), font_size = 20, color = "blue",  size_hint = (0.8, .2), pos_hint={'center_x': .85, 'center_y': .95})
+        layout.add_widget(lbclock)
+
+        # status-label:
+        lbstatus = Label(text = f"status: {self.myheizung.status}", font_size = 20, color = "blue",  size_hint = (0.2, .2), pos_hint={'center_x': .15, 'center_y': .95})
+        layout.add_widget(lbstatus)
+
+        # longer-warm-label:
+        lblongerwarm = Label(text = "", font_size = 20, color = "blue", size_hint = (0.2, 0.2), pos_hint={'center_x': .15, 'center_y': .90})
+        layout.add_widget(lblongerwarm)
+
+        # label with the next change of the state:
+        lbnext = Label(text = "", font_size = 16, color = "blue", size_hint = (0.3, 0.1), pos_hint={'center_x': .50, 'center_y': .95})
+        layout.add_widget(lbnext)
+
+        # output-label (messages for the user):
+        lboutput = Label(size_hint = (0.85, .2), pos_hint={'center_x': .50, 'center_y': .20})
+        # start message - show in the GUI if the communication works (gets overwritten when other actions are taken):
+        startmessage = "Kommunikatioun gët getest ..."
+        lboutput.text = startmessage
+        layout.add_widget(lboutput)
+
+        # raise-button:
+        btnrop = Button(text ='lo rop', size_hint =(.4, .23), pos_hint={'center_x': .25, 'center_y': .75})
+        btnrop.bind(on_press = popup_on, on_release=set_raise_now)
+        layout.add_widget(btnrop)
+
+        # reduce-button:
+        btnrof = Button(text ='lo rof', size_hint =(.4, .23), pos_hint={'center_x': .75, 'center_y': .75})
+        btnrof.bind(on_press = popup_on, on_release= set_reduce_now)
+        layout.add_widget(btnrof)
+
+        # button for heating longer:
+        btnsetlonger = Button(text = "länger warm an", size_hint = (.30, .12), pos_hint={'center_x': .25, 'center_y': .43})
+        btnsetlonger.bind(on_press = set_longer_warm) # (on_press = popup_on, on_release= set_longer_warm) isn't needed for the please-wait-label because the robot does not need to take an action
+        layout.add_widget(btnsetlonger)
+
+        # button to set off heating longer:
+        btnsetlongerback = Button(text = "länger warm aus", size_hint = (.30, .12), pos_hint={'center_x': .25, 'center_y': .30})
+        btnsetlongerback.bind(on_press = set_longer_warm_back)
+        layout.add_widget(btnsetlongerback)
+
+        # button to load the holiday dates and times from the file:
+        btnurlaub = Button(text = "load urlaubdata", size_hint = (.30, .12), pos_hint={'center_x': .75, 'center_y': .30})
+        btnurlaub.bind(on_press = get_holidaydata)
+        layout.add_widget(btnurlaub)
+
+        # button to load the automatic changing times from the file:
+        btntimes = Button(text = "load timesdata", size_hint = (.30, .12), pos_hint={'center_x': .75, 'center_y': .43})
+        btntimes.bind(on_press = get_timedata)
+        layout.add_widget(btntimes)
+
+        # button to set the next day to a holiday:
+        btnholiday = Button(text = "muar-Feierdag an", size_hint = (.18, .12), pos_hint = {"center_x": .50, "center_y": .43})
+        btnholiday.bind(on_press = set_tomorrow_holiday)
+        layout.add_widget(btnholiday)
+
+        # button to set off tomorrow_holiday (reset the day after to a normal day regarding the saved change-times)
+        btnholidayback = Button(text = "muar-Feierdag aus", size_hint = (.18, .12), pos_hint = {"center_x": .50, "center_y": .30})
+        btnholidayback.bind(on_press = set_tomorrow_holiday_back)
+        layout.add_widget(btnholidayback)
+
+        # button to test the function of the robot:
+        btntestrobot = Button(text = "test robot", color = "red", size_hint = (0.13, 0.08), pos_hint = {"center_x": .10, "center_y": .10})
+        btntestrobot.bind(on_press = popup_on, on_release = call_robottest)
+        layout.add_widget(btntestrobot)
+
+        # button to test the communication to the robot:
+        btntestcomm = Button(text = "test commun.", color = "red", size_hint = (0.13, 0.08), pos_hint = {"center_x": .24, "center_y": .10})
+        btntestcomm.bind(on_press = popup_on, on_release = test_robocommunication)
+        layout.add_widget(btntestcomm)
+
+        # please-wait-label (is added in the moment the label is needed (after pressing a button))
+        lbpopup = MyWarnLabel(text = "Please wait ...", font_size = 110, color = "red", size_hint = (1, 1)) # pos_hint={'center_x': 1, 'center_y': 1})
+
+        # label that shows that "testerei" (testing state) is True:
+        if testerei == True or zeiten_testerei == True:
+            lbtesterei = Label(text = "|testerei on|\n|or zeitentest|", color = "pink", font_size = 20, size_hint = (0.25, 0.15), pos_hint = {"center_x": .90, "center_y": .10})
+            layout.add_widget(lbtesterei)
+        if myrobot_ip != robot_ip:
+            lbfakerobot = Label(text = "fake-robot(IP)", color = "pink", font_size = 50, size_hint = (0.25, 0.15), pos_hint = {"center_x": .50, "center_y": .10})
+            layout.add_widget(lbfakerobot)
+
+        return layout
+
+    def on_stop(self):
+        if self.filewatcher is not None:
+            self.filewatcher.stop()
+        if self.api is not None:
+            self.api.stop()
+        self.myheizung.myrobot.breaker.stop()
+
+
+
+class Interface():
+
+    def __init__(self):
+        logging.debug(f"init of the class Interface activated (v{versionnr})")
+        if testerei == False and onlyerrorlog == False:
+            actionlogger.info(f"init vun class Interface agesprong / Programm gestart (Versioun: {versionnr})")
+
+        myKivyGui = KivyGui()
+        myKivyGui.run()
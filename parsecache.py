@@ -0,0 +1,59 @@
+"""
+Cache of the parsed and validated data-files.
+
+Loading the times- and holiday-files means reading them line by line with the scheduleparser and checking every entry
+(weekday, time/date and state), and the imported calendars (.ics) are read by icsimport. The ParseCache saves the
+checked result together with the hash of the file content in a JSON-file, so that when the same content is loaded
+again (z.B. after a restart of the app), the result can be taken from the cache without parsing.
+The cache is only valid for the version it was written with - the Heizung uses the version of the app together with
+the format versions of scheduleparser and icsimport, so that the results of an older parser aren't taken.
+"""
+
+
+import copy
+import hashlib
+import json
+import logging
+import os
+
+
+def content_hash(text):
+    """returns the sha1-hash of the (file-)text"""
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+class ParseCache():
+    """Parsed results of the data-files, by kind ('times', 'urlaub') and hash of the file content."""
+
+    def __init__(self, filename, version):
+        self.filename = filename
+        self.version = version
+        self.entries = {}  # kind -> {"hash": ..., "result": [[key, value], ...]}
+        try:
+            with open(filename, "r") as readfile:
+                saved = json.load(readfile)
+            if saved.get("version") == version:
+                self.entries = saved.get("entries", {})
+        except (OSError, ValueError, AttributeError):
+            pass  # no (usable) cache yet - it is written at the next loading
+
+    def get(self, kind, texthash):
+        """Returns the cached result for this kind of data, if it was parsed from the content with the same hash,
+        otherwise None."""
+        entry = self.entries.get(kind)
+        if entry is None or entry["hash"] != texthash:
+            return None
+        # (the dictionaries are saved as list of [key, value], as JSON only allows strings as keys - the weekdays are
+        #   ints. The values are copied, so that changes of the caller don't change the cache)
+        return {key: copy.deepcopy(value) for key, value in entry["result"]}
+
+    def put(self, kind, texthash, result):
+        """saves the parsed result (a dictionary) for this kind of data and content hash"""
+        self.entries[kind] = {"hash": texthash, "result": [[key, copy.deepcopy(value)] for key, value in result.items()]}
+        tmpfilename = self.filename + ".tmp"
+        try:
+            with open(tmpfilename, "w") as writefile:
+                json.dump({"version": self.version, "entries": self.entries}, writefile)
+            os.replace(tmpfilename, self.filename)
+        except OSError:
+            logging.exception("Problem while writing the parse cache")
@@ -0,0 +1,106 @@
+"""
+Model of the time the robot needs for a message, learned from the echoes, for the timeouts and the progress display.
+
+The robot needs about the same time for every button press, plus a constant part per message (network, evaluation of
+the message). So the duration of a message is estimated as
+    overhead + presses * press_mean
+where press_mean and overhead are exponentially weighted moving averages (EWMA) of the measured durations: the overhead
+from the messages without button presses ("test."), press_mean from the others. Additionally, the average deviation of
+the measured press durations from press_mean is kept (press_deviation, also an EWMA), and the timeout for a message is
+    overhead + presses * (press_mean + deviation_factor * press_deviation) + margin
+(like the retransmission timeout of TCP), limited to min_timeout ... max_timeout. So a short sequence (or the test)
+notices a robot that doesn't answer after a few seconds, and a new, long sequence gets a long enough timeout.
+After a timeout, the next timeouts are doubled (up to 3 times, reset by the next correct echo), in case the robot only
+got slower.
+The learned values are saved in a JSON-file (if a filename is given), so that they are kept after a restart.
+"""
+
+
+import json
+import logging
+import os
+import threading
+
+
+def count_presses(message_text):
+    """returns the number of button presses of a message (the numbers, z.B. "1 4 4 4 4." -> 5, "test." -> 0)"""
+    return len([button for button in message_text.rstrip(".").split() if button.isdigit()])
+
+
+class TimingModel():
+    """The learned durations of the robot (see above). The defaults are a bit conservative, until the first durations
+    are measured."""
+
+    def __init__(self, filename=None, press_mean=0.8, press_deviation=0.1, overhead=0.5, alpha=0.2,
+                 deviation_factor=4, margin=2.0, min_timeout=3.0, max_timeout=60.0):
+        self.filename = filename  # (None: the values aren't saved)
+        self.press_mean = press_mean  # seconds per button press
+        self.press_deviation = press_deviation
+        self.overhead = overhead  # seconds per message
+        self.alpha = alpha  # weight of a new measurement in the averages
+        self.deviation_factor = deviation_factor
+        self.margin = margin  # seconds added to every timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.samples = 0  # number of measured messages (also the ones from before the restart)
+        self.backoff = 0  # number of timeouts since the last correct echo
+        self.lock = threading.Lock()
+        self.load()
+
+    def expected(self, message_text):
+        """the expected duration (seconds) of the message, from the sending until the echo"""
+        return self.overhead + count_presses(message_text) * self.press_mean
+
+    def timeout(self, message_text):
+        """the time (seconds) to wait for the echo of the message, before the robot is considered as not answering"""
+        presses = count_presses(message_text)
+        timeout = self.overhead + presses * (self.press_mean + self.deviation_factor * self.press_deviation) + self.margin
+        timeout *= 2 ** self.backoff
+        return min(max(timeout, self.min_timeout), self.max_timeout)
+
+    def learn(self, message_text, duration):
+        """takes into account the measured duration of a message (from the sending, or from the echo of the previous
+        message of a batch, until its correct echo)"""
+        presses = count_presses(message_text)
+        with self.lock:
+            self.backoff = 0
+            if presses == 0:
+                self.overhead += self.alpha * (duration - self.overhead)
+            else:
+                press_duration = max(duration - self.overhead, 0) / presses
+                self.press_deviation += self.alpha * (abs(press_duration - self.press_mean) - self.press_deviation)
+                self.press_mean += self.alpha * (press_duration - self.press_mean)
+            self.samples += 1
+        self.save()
+
+    def timed_out(self):
+        """called when the robot didn't answer in time (the next timeouts are longer)"""
+        with self.lock:
+            self.backoff = min(self.backoff + 1, 3)
+
+    def load(self):
+        if self.filename is None:
+            return
+        try:
+            with open(self.filename, "r") as readfile:
+                saved = json.load(readfile)
+            self.press_mean = float(saved["press_mean"])
+            self.press_deviation = float(saved["press_deviation"])
+            self.overhead = float(saved["overhead"])
+            self.samples = int(saved["samples"])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass  # no (usable) file yet - the defaults are used
+
+    def save(self):
+        if self.filename is None:
+            return
+        with self.lock:
+            values = {"press_mean": self.press_mean, "press_deviation": self.press_deviation, "overhead": self.overhead,
+                      "samples": self.samples}
+        tmpfilename = self.filename + ".tmp"
+        try:
+            with open(tmpfilename, "w") as writefile:
+                json.dump(values, writefile)
+            os.replace(tmpfilename, self.filename)
+        except OSError:
+            logging.exception("Problem while saving the robot timing")
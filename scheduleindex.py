@@ -0,0 +1,131 @@
+"""
+Sorted index of the automatic changing-times, for fast lookups.
+
+The changing-times are saved as dictionaries {"HH:MM": "normal"/"reduziert"} (one per weekday). To find out which
+state applies at a given time, the keys would have to be sorted and searched on every call. The DayIndex keeps the
+times of one day as a sorted list of minutes since midnight (06:30 -> 390), so that the questions "which state
+applies at time T", "previous/next change" and "last reducing of the day" can be answered with a binary search
+(bisect) instead of sorting and scanning.
+A DayIndex is never changed after it was built - when the times of a day change, a new one is built. The
+ScheduleIndex (the index for the whole week) only rebuilds the days whose times changed.
+"""
+
+
+from bisect import bisect_right
+
+
+def to_minutes(zeit):
+    """converts a time-string 'HH:MM' to the minutes since midnight (z.B. '06:30' -> 390)"""
+    return int(zeit[:2]) * 60 + int(zeit[3:5])
+
+
+def to_zeit(minutes):
+    """converts the minutes since midnight to a time-string 'HH:MM' (z.B. 390 -> '06:30')"""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class DayIndex():
+    """Sorted index of the changing-times of one day."""
+
+    def __init__(self, daytimes):
+        self.source = dict(daytimes)  # copy of the dictionary the index was built from (to be able to detect changes)
+        entries = sorted((to_minutes(zeit), state) for zeit, state in daytimes.items())
+        self.minutes = [entry[0] for entry in entries]  # sorted minutes since midnight
+        self.states = [entry[1] for entry in entries]  # the state for the same position in self.minutes
+        # the position of the last reducing of the day (or None, if there is no reducing):
+        self.lastreduce_pos = None
+        for pos in range(len(self.states) - 1, -1, -1):
+            if self.states[pos] == "reduziert":
+                self.lastreduce_pos = pos
+                break
+
+    def __len__(self):
+        return len(self.minutes)
+
+    def entry(self, pos):
+        """returns the tuple ('HH:MM', state) at the given position"""
+        return to_zeit(self.minutes[pos]), self.states[pos]
+
+    def times(self):
+        """returns the sorted list of the time-strings (z.B. ['06:45', '22:15'])"""
+        return [to_zeit(minute) for minute in self.minutes]
+
+    def state_at(self, minute):
+        """Returns the state that applies at the given minute: the state of the last change at or before this minute.
+        Before the first change of the day, the state of the last change of the day applies (the state of the night,
+        presuming the state is the same for the night on every weekday). Returns None if the day has no changes."""
+        if len(self.minutes) == 0:
+            return None
+        # (if there is no change before, the position is -1, which is the last change of the day)
+        return self.states[bisect_right(self.minutes, minute) - 1]
+
+    def previous_transition(self, minute):
+        """returns ('HH:MM', state) of the last change at or before the given minute, or None if there is none"""
+        pos = bisect_right(self.minutes, minute) - 1
+        if pos < 0:
+            return None
+        return self.entry(pos)
+
+    def next_transition(self, minute):
+        """returns ('HH:MM', state) of the first change after the given minute, or None if there is none"""
+        pos = bisect_right(self.minutes, minute)
+        if pos == len(self.minutes):
+            return None
+        return self.entry(pos)
+
+    def transitions_between(self, fromminute, tominute):
+        """returns the list of changes ('HH:MM', state) after fromminute and up to (including) tominute"""
+        first = bisect_right(self.minutes, fromminute)
+        last = bisect_right(self.minutes, tominute)
+        return [self.entry(pos) for pos in range(first, last)]
+
+    def first(self):
+        """returns ('HH:MM', state) of the first change of the day (or None)"""
+        if len(self.minutes) == 0:
+            return None
+        return self.entry(0)
+
+    def last(self):
+        """returns ('HH:MM', state) of the last change of the day (or None)"""
+        if len(self.minutes) == 0:
+            return None
+        return self.entry(len(self.minutes) - 1)
+
+    def last_reduce(self):
+        """returns ('HH:MM', 'reduziert') of the last reducing of the day (or None)"""
+        if self.lastreduce_pos is None:
+            return None
+        return self.entry(self.lastreduce_pos)
+
+
+class ScheduleIndex():
+    """Index of the changing-times for the whole week (one DayIndex per weekday 1-7)."""
+
+    def __init__(self, change_times=None):
+        self.days = {}
+        if change_times is not None:
+            self.rebuild(change_times)
+
+    def __getitem__(self, weekday):
+        return self.days[weekday]
+
+    def rebuild(self, change_times):
+        """Updates the index with the (newly loaded) changing-times. Only the days whose times changed are rebuilt.
+        Returns the list of the rebuilt weekdays."""
+        rebuilt = []
+        for weekday, daytimes in change_times.items():
+            if weekday not in self.days or self.days[weekday].source != daytimes:
+                self.days[weekday] = DayIndex(daytimes)
+                rebuilt.append(weekday)
+        for weekday in list(self.days):
+            if weekday not in change_times:
+                del self.days[weekday]
+        return rebuilt
+
+    def day_index(self, weekday, daytimes):
+        """Returns the index for the (possibly changed) times of a day: the prebuilt one, if the times are the same as
+        the saved ones for the weekday, otherwise a new one."""
+        weekindex = self.days.get(weekday)
+        if weekindex is not None and weekindex.source == daytimes:
+            return weekindex
+        return DayIndex(daytimes)
@@ -0,0 +1,245 @@
+"""
+Parser for the data-files (changing-times and holiday-times), in one pass over the lines.
+
+The files can be written in a line format, one change per line:
+    times-file:   <weekday(s)> <HH:MM> <normal/reduziert>     z.B. "1 06:30 normal" or "1-5 21:40 reduziert"
+                  (weekdays: 1 = Monday ... 7 = Sunday, several with "1-5" or "1,3,5" or "1-3,6")
+    urlaub-file:  <YYYY-MM-DD> <HH:MM> <urlaub/normal>        z.B. "2024-11-13 10:00 urlaub"
+Comments start with # (until the end of the line), or are enclosed in ''' (also over several lines).
+The old format (one Python dictionary, z.B. {1: {"06:30": "normal"}, ...}) is still accepted: if the first line
+that isn't a comment starts with "{", the rest of the file is read as dictionary.
+
+Every entry is checked while it is read (weekday, time/date and state), and all the problems are collected with their
+line and column (and not only the first one), so that a file with several errors can be corrected in one go. The time
+needed grows linearly with the size of the file.
+"""
+
+
+import ast
+import re
+
+from urlaubindex import valid_urlaubkey
+
+time_pattern = re.compile(r"([01]\d|2[0-3]):[0-5]\d")  # HH:MM, 00:00 - 23:59
+weekdays_pattern = re.compile(r"[1-7](-[1-7])?(,[1-7](-[1-7])?)*")  # z.B. 1 / 1-5 / 1,3,5 / 1-3,6
+token_pattern = re.compile(r"\S+")
+format_version = 1  # to be raised when the format or the checks change (the cached results of the old parser aren't used then, see parsecache)
+times_states = ["normal", "reduziert"]
+urlaub_states = ["urlaub", "normal"]
+
+
+class ScheduleError():
+    """a problem in a data-file, with its position (line and column start at 1)"""
+
+    def __init__(self, line, column, message):
+        self.line = line
+        self.column = column
+        self.message = message
+
+    def __str__(self):
+        return f"line {self.line}, column {self.column}: {self.message}"
+
+    def __repr__(self):
+        return f"ScheduleError({self.line}, {self.column}, {self.message!r})"
+
+
+def strip_comments(line, inblock):
+    """Replaces the comments of the line by spaces (so that the columns of the rest stay the same).
+    inblock tells if the line starts inside a '''-comment. Returns the cleaned line and if the next line starts inside
+    a '''-comment."""
+    if not inblock and "#" not in line and "'''" not in line:  # (most of the lines)
+        return line, False
+    cleaned = ""
+    pos = 0
+    while pos < len(line):
+        if inblock:
+            end = line.find("'''", pos)
+            if end < 0:
+                cleaned += " " * (len(line) - pos)
+                return cleaned, True
+            cleaned += " " * (end + 3 - pos)
+            pos = end + 3
+            inblock = False
+        else:
+            start = line.find("'''", pos)
+            hashpos = line.find("#", pos)
+            if hashpos >= 0 and (start < 0 or hashpos < start):
+                cleaned += line[pos:hashpos]
+                return cleaned, False
+            if start < 0:
+                cleaned += line[pos:]
+                return cleaned, False
+            cleaned += line[pos:start] + "   "
+            pos = start + 3
+            inblock = True
+    return cleaned, inblock
+
+
+def parse_lines(lines, parse_entry, parse_legacy):
+    """Goes once over the lines, and passes every entry (the tokens with their columns) to parse_entry. If the file is
+    in the old format, the dictionary is passed to parse_legacy.
+    Returns the list of errors, and if there was at least one entry."""
+    errors = []
+    legacylines = None  # the lines of the dictionary (old format), or None for the line format
+    inblock = False
+    found = False
+    for linenumber, line in enumerate(lines, 1):
+        text, inblock = strip_comments(line.rstrip("\r\n"), inblock)
+        if legacylines is not None:
+            legacylines.append(text)
+            continue
+        tokens = [(match.group(), match.start() + 1) for match in token_pattern.finditer(text)]
+        if len(tokens) == 0:
+            continue
+        if tokens[0][0].startswith("{"):
+            # (the lines before are kept empty, so that the line numbers of the dictionary stay correct)
+            legacylines = [""] * (linenumber - 1) + [text]
+            continue
+        found = True
+        parse_entry(tokens, linenumber, errors)
+    if inblock:
+        errors.append(ScheduleError(linenumber, len(line), "''' comment is not closed"))
+    if legacylines is not None:
+        found = True
+        parse_legacy("\n".join(legacylines), errors)
+    return errors, found
+
+
+def parse_literal(text, errors):
+    """Reads the dictionary of the old format. Returns the ast.Dict node (to be able to report the positions of the
+    entries), or None if it isn't a dictionary."""
+    try:
+        # (in brackets, so that an indented dictionary is no syntax error - the line numbers are corrected afterwards)
+        tree = ast.parse("(\n" + text + "\n)", mode="eval")
+    except SyntaxError as error:
+        line = max((error.lineno or 2) - 1, 1)
+        if line > text.count("\n") + 1:  # (the error is in the added closing bracket)
+            errors.append(ScheduleError(line - 1, 1, "syntax error: the dictionary is not closed"))
+        else:
+            errors.append(ScheduleError(line, error.offset or 1, f"syntax error: {error.msg}"))
+        return None
+    ast.increment_lineno(tree, -1)
+    if not isinstance(tree.body, ast.Dict):
+        errors.append(ScheduleError(tree.body.lineno, tree.body.col_offset + 1, "the data has to be a dictionary"))
+        return None
+    return tree.body
+
+
+def constant(node):
+    """the value of a constant node (number or string), or None"""
+    if isinstance(node, ast.Constant) and type(node.value) in (int, str):
+        return node.value
+    return None
+
+
+def position(node):
+    return node.lineno, node.col_offset + 1
+
+
+def expand_weekdays(text):
+    """'1-3,6' -> [1, 2, 3, 6] (the text has to match weekdays_pattern)"""
+    weekdays = []
+    for part in text.split(","):
+        first, _, last = part.partition("-")
+        weekdays += range(int(first), int(last or first) + 1)
+    return weekdays
+
+
+def add_change(daydict, key, state, line, column, errors):
+    """adds the change to the dictionary of the day - the same time with another state is an error"""
+    if daydict.get(key, state) != state:
+        errors.append(ScheduleError(line, column, f"{key} is given twice, with '{daydict[key]}' and '{state}'"))
+    else:
+        daydict[key] = state
+
+
+def parse_times(lines):
+    """Parses the changing-times (lines of the times-file, z.B. an open file).
+    Returns ({weekday: {'HH:MM': state}} with all the weekdays 1-7, or None if there is no entry, list of errors)."""
+    changetimes = {weekday: {} for weekday in range(1, 8)}
+
+    def parse_entry(tokens, line, errors):
+        if len(tokens) != 3:
+            errors.append(ScheduleError(line, tokens[0][1], f"expected '<weekday> <HH:MM> <state>', got {len(tokens)} values"))
+            return
+        (weekdays, daycolumn), (zeit, timecolumn), (state, statecolumn) = tokens
+        valid = True
+        if weekdays_pattern.fullmatch(weekdays) is None:
+            errors.append(ScheduleError(line, daycolumn, f"weekday has to be 1-7 (or z.B. 1-5, 1,3), not '{weekdays}'"))
+            valid = False
+        if time_pattern.fullmatch(zeit) is None:
+            errors.append(ScheduleError(line, timecolumn, f"time has to be HH:MM (00:00-23:59), not '{zeit}'"))
+            valid = False
+        if state not in times_states:
+            errors.append(ScheduleError(line, statecolumn, f"state has to be 'normal' or 'reduziert', not '{state}'"))
+            valid = False
+        if valid:
+            for weekday in expand_weekdays(weekdays):
+                add_change(changetimes[weekday], zeit, state, line, timecolumn, errors)
+
+    def parse_legacy(text, errors):
+        tree = parse_literal(text, errors)
+        if tree is None:
+            return
+        for daynode, daytimesnode in zip(tree.keys, tree.values):
+            if daynode is None:  # (**-unpacking in the dictionary)
+                errors.append(ScheduleError(*position(daytimesnode), "unpacking (**) is not allowed"))
+                continue
+            weekday = constant(daynode)
+            if type(weekday) != int or weekday not in changetimes:
+                errors.append(ScheduleError(*position(daynode), f"weekday has to be 1-7, not {ast.unparse(daynode)}"))
+                continue
+            if not isinstance(daytimesnode, ast.Dict):
+                errors.append(ScheduleError(*position(daytimesnode), f"the times of weekday {weekday} have to be a dictionary"))
+                continue
+            for timenode, statenode in zip(daytimesnode.keys, daytimesnode.values):
+                zeit, state = constant(timenode), constant(statenode)
+                if type(zeit) != str or time_pattern.fullmatch(zeit) is None:
+                    errors.append(ScheduleError(*position(timenode or statenode), f"time has to be 'HH:MM' (00:00-23:59), not {ast.unparse(timenode) if timenode else '**'}"))
+                elif state not in times_states:
+                    errors.append(ScheduleError(*position(statenode), f"state has to be 'normal' or 'reduziert', not {ast.unparse(statenode)}"))
+                else:
+                    changetimes[weekday][zeit] = state
+
+    errors, found = parse_lines(lines, parse_entry, parse_legacy)
+    if not found:
+        return None, errors
+    # (sorted by time, so that the days are shown in order)
+    return {weekday: dict(sorted(daytimes.items())) for weekday, daytimes in changetimes.items()}, errors
+
+
+def parse_urlaub(lines):
+    """Parses the holiday-times (lines of the urlaub-file, z.B. an open file).
+    Returns ({'YYYY-MM-DD HH:MM': state}, list of errors)."""
+    urlaubtimes = {}
+
+    def parse_entry(tokens, line, errors):
+        if len(tokens) != 3:
+            errors.append(ScheduleError(line, tokens[0][1], f"expected '<YYYY-MM-DD> <HH:MM> <state>', got {len(tokens)} values"))
+            return
+        (datum, datecolumn), (zeit, timecolumn), (state, statecolumn) = tokens
+        valid = True
+        if not valid_urlaubkey(f"{datum} {zeit}"):
+            errors.append(ScheduleError(line, datecolumn, f"date and time have to be a valid 'YYYY-MM-DD HH:MM', not '{datum} {zeit}'"))
+            valid = False
+        if state not in urlaub_states:
+            errors.append(ScheduleError(line, statecolumn, f"state has to be 'urlaub' or 'normal', not '{state}'"))
+            valid = False
+        if valid:
+            add_change(urlaubtimes, f"{datum} {zeit}", state, line, datecolumn, errors)
+
+    def parse_legacy(text, errors):
+        tree = parse_literal(text, errors)
+        if tree is None:
+            return
+        for keynode, statenode in zip(tree.keys, tree.values):
+            key, state = constant(keynode), constant(statenode)
+            if not valid_urlaubkey(key):
+                errors.append(ScheduleError(*position(keynode or statenode), f"date and time have to be a valid 'YYYY-MM-DD HH:MM', not {ast.unparse(keynode) if keynode else '**'}"))
+            elif state not in urlaub_states:
+                errors.append(ScheduleError(*position(statenode), f"state has to be 'urlaub' or 'normal', not {ast.unparse(statenode)}"))
+            else:
+                urlaubtimes[key] = state
+
+    errors, found = parse_lines(lines, parse_entry, parse_legacy)
+    return urlaubtimes, errors
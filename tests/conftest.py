@@ -0,0 +1,38 @@
+"""
+Common setup of the tests: the modules of the app are imported from the directory above, and the tests run in a
+temporary directory (the app writes its log-files to the current directory when Heizsteierung is imported).
+"""
+
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(tempfile.mkdtemp(prefix="heiztests-"))
+
+import pytest
+
+import Heizsteierung as heiz
+
+heiz.testerei = True  # (no log-files, only debugging messages)
+
+
+@pytest.fixture
+def make_heizung(tmp_path):
+    """returns a function that creates a Heizung with its data-files in tmp_path (written from the given texts), the
+    Heizungs are shut down after the test"""
+    created = []
+
+    def make(times=None, urlaub=None):
+        if times is not None:
+            (tmp_path / heiz.timesfile).write_text(times)
+        if urlaub is not None:
+            (tmp_path / heiz.urlaubfile).write_text(urlaub)
+        myheizung = heiz.Heizung(robotip="127.0.0.1", robotport=9, datadir=str(tmp_path))
+        created.append(myheizung)
+        return myheizung
+
+    yield make
+    for myheizung in created:
+        myheizung.executor.shutdown(wait=False)
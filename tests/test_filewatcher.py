@@ -0,0 +1,97 @@
+"""Tests of the FileWatcher, with inotify and with polling."""
+
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+from filewatcher import FileWatcher
+
+
+class Changes():
+    """collects the files passed to on_change"""
+
+    def __init__(self):
+        self.files = []
+        self.changed = threading.Event()
+
+    def __call__(self, filename):
+        self.files.append(filename)
+        self.changed.set()
+
+    def wait(self, timeout):
+        found = self.changed.wait(timeout)
+        self.changed.clear()
+        return found
+
+
+def replace(filename, text):
+    """writes a temporary file and renames it to the file (like an editor or scp)"""
+    with open(filename + ".tmp", "w") as tmpfile:
+        tmpfile.write(text)
+    os.replace(filename + ".tmp", filename)
+
+
+@pytest.fixture(params=[True, False], ids=["inotify", "polling"])
+def watch(request):
+    """returns a function that starts a FileWatcher on the files (stopped after the test)"""
+    watchers = []
+
+    def start(*filenames):
+        changes = Changes()
+        watcher = FileWatcher(filenames, changes, use_inotify=request.param)
+        watcher.start()
+        watchers.append(watcher)
+        if not request.param:
+            assert watcher.mode == "polling"
+        elif sys.platform.startswith("linux"):
+            assert watcher.mode == "inotify"
+        return changes
+
+    yield start
+    for watcher in watchers:
+        watcher.stop()
+
+
+def test_replaced_file_is_noticed(watch, tmp_path):
+    filename = str(tmp_path / "data_times.txt")
+    replace(filename, "1 06:30 normal\n")
+    changes = watch(filename)
+    time.sleep(0.1)
+    start = time.monotonic()
+    replace(filename, "1 06:45 normal\n")
+    assert changes.wait(1.5)
+    assert time.monotonic() - start < 1.5
+    assert changes.files == [filename]
+
+
+def test_unchanged_content_is_ignored(watch, tmp_path):
+    filename = str(tmp_path / "data_times.txt")
+    replace(filename, "1 06:30 normal\n")
+    changes = watch(filename)
+    time.sleep(0.1)
+    os.utime(filename)  # (touched)
+    with open(filename, "w") as rewritten:  # (saved without changes)
+        rewritten.write("1 06:30 normal\n")
+    replace(filename, "1 06:30 normal\n")
+    assert not changes.wait(1.2)
+    assert changes.files == []
+
+
+def test_files_with_the_same_name_in_different_directories(watch, tmp_path):
+    first, second = tmp_path / "flat1", tmp_path / "flat2"
+    first.mkdir()
+    second.mkdir()
+    firstfile, secondfile = str(first / "data_times.txt"), str(second / "data_times.txt")
+    replace(firstfile, "1 06:30 normal\n")
+    replace(secondfile, "1 06:30 normal\n")
+    changes = watch(firstfile, secondfile)
+    time.sleep(0.1)
+    replace(firstfile, "1 07:00 normal\n")
+    assert changes.wait(1.5)
+    replace(secondfile, "1 07:30 normal\n")
+    assert changes.wait(1.5)
+    assert changes.files == [firstfile, secondfile]
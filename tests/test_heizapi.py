@@ -0,0 +1,33 @@
+import socket
+from unittest import mock
+
+import heizapi
+
+
+def ask(port, request):
+    """sends the request and returns the whole answer (until the server closes the connection)"""
+    with socket.create_connection(("127.0.0.1", port), timeout=5) as connection:
+        connection.sendall(request)
+        answer = b""
+        while True:
+            chunk = connection.recv(4096)
+            if not chunk:
+                return answer
+            answer += chunk
+
+
+def test_no_network_api_without_token():
+    api = heizapi.HeizApi(mock.MagicMock(), None, None, None, host="0.0.0.0", port=0)
+    assert api.start() == False
+
+
+def test_bad_and_too_large_bodies_are_refused():
+    api = heizapi.HeizApi(mock.MagicMock(), None, None, None, host="127.0.0.1", port=0)
+    assert api.start()
+    try:
+        answer = ask(api.port, b"POST /raise HTTP/1.1\r\nContent-Length: zwielef\r\n\r\n")
+        assert answer.startswith(b"HTTP/1.1 400 ") and b"Connection: close" in answer
+        answer = ask(api.port, b"POST /raise HTTP/1.1\r\nContent-Length: 100000\r\n\r\n" + b"x" * 1000)
+        assert answer.startswith(b"HTTP/1.1 413 ") and b"Connection: close" in answer
+    finally:
+        api.stop()
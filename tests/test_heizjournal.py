@@ -0,0 +1,90 @@
+"""Tests of the restore of the state after a restart (from the journal and its snapshot, also when they are damaged)."""
+
+
+import os
+
+import Heizsteierung as heiz
+
+
+def change(myheizung, event, **state):
+    """sets the values of the state and saves them in the journal"""
+    for name, value in state.items():
+        setattr(myheizung, name, value)
+    myheizung.save_state(event)
+
+
+def restored(myheizung):
+    return {"status": myheizung.status, "desired_status": myheizung.desired_status,
+            "longerwarm_on": myheizung.longerwarm_on, "tomorrowholiday_on": myheizung.tomorrowholiday_on}
+
+
+def journal_lines(tmp_path):
+    return (tmp_path / heiz.journalfile).read_bytes().splitlines(keepends=True)
+
+
+def test_torn_last_line_is_cut_off(make_heizung, tmp_path):
+    first = make_heizung()
+    change(first, "raise", status="reduziert", desired_status="normal", longerwarm_on=True)
+    change(first, "robot", status="normal", longerwarm_on=False, tomorrowholiday_on=True)
+    lines = journal_lines(tmp_path)
+    # (the power was cut while the last line was written)
+    (tmp_path / heiz.journalfile).write_bytes(b"".join(lines[:-1]) + lines[-1][:len(lines[-1]) // 2])
+
+    restarted = make_heizung()
+
+    assert restored(restarted) == {"status": "reduziert", "desired_status": "normal", "longerwarm_on": True,
+                                   "tomorrowholiday_on": False}
+    assert journal_lines(tmp_path)[:len(lines) - 1] == lines[:-1]  # (the torn line is removed, the start appended)
+    assert all(line.endswith(b"\n") for line in journal_lines(tmp_path))
+
+
+def test_damaged_line_ends_the_journal(make_heizung, tmp_path):
+    first = make_heizung()
+    change(first, "reduce", status="normal", desired_status="reduziert")
+    change(first, "longer_warm", longerwarm_on=True)
+    change(first, "tomorrow_holiday", tomorrowholiday_on=True)
+    lines = journal_lines(tmp_path)
+    damaged = lines[-2].replace(b'"longerwarm_on":true', b'"longerwarm_on":1234')  # (valid JSON, but the checksum doesn't match)
+    assert damaged != lines[-2]
+    (tmp_path / heiz.journalfile).write_bytes(b"".join(lines[:-2]) + damaged + lines[-1])
+
+    restarted = make_heizung()
+
+    # (the lines after the damaged one can't be trusted either - they only contain the changes)
+    assert restored(restarted) == {"status": "normal", "desired_status": "reduziert", "longerwarm_on": False,
+                                   "tomorrowholiday_on": False}
+
+
+def test_replay_from_snapshot_and_journal(make_heizung, tmp_path):
+    first = make_heizung()
+    first.journal.snapshot_every = 3
+    change(first, "1", status="normal", desired_status="normal")
+    change(first, "2", longerwarm_on=True)
+    change(first, "3", status="reduziert", desired_status="reduziert", longerwarm_on=False)
+    change(first, "4", desired_status="urlaub")
+    change(first, "5", tomorrowholiday_on=True)
+    assert os.path.exists(tmp_path / heiz.journal_snapshotfile)
+    assert len(journal_lines(tmp_path)) < 5  # (the older lines are in the snapshot)
+
+    restarted = make_heizung()
+
+    assert restored(restarted) == {"status": "reduziert", "desired_status": "urlaub", "longerwarm_on": False,
+                                   "tomorrowholiday_on": True}
+
+
+def test_snapshot_after_restore(make_heizung, tmp_path):
+    first = make_heizung()
+    change(first, "1", status="reduziert", desired_status="normal", longerwarm_on=True)
+    restarted = make_heizung()
+    seq = restarted.journal.seq
+    restarted.journal.snapshot_every = restarted.journal.lines + 2  # (the lines read at the restart count too)
+    change(restarted, "2", status="normal", longerwarm_on=False)
+    change(restarted, "3", tomorrowholiday_on=True)
+    assert journal_lines(tmp_path) == []  # (all in the snapshot)
+    assert restarted.journal.seq == seq + 2
+
+    again = make_heizung()
+
+    assert restored(again) == {"status": "normal", "desired_status": "normal", "longerwarm_on": False,
+                               "tomorrowholiday_on": True}
+    assert again.journal.seq >= seq + 2
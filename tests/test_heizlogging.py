@@ -0,0 +1,11 @@
+import logging
+
+from heizlogging import UnitLogger
+
+
+def test_unit_name_in_front_of_the_messages(caplog):
+    caplog.set_level(logging.INFO, logger="actionlog")
+    UnitLogger(logging.getLogger("actionlog"), "flat2").info("De status as lo: normal")
+    UnitLogger(logging.getLogger("actionlog")).info("De status as lo: reduziert")
+    assert [record.getMessage() for record in caplog.records] == ["flat2: De status as lo: normal",
+                                                                  "De status as lo: reduziert"]
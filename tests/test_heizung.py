@@ -0,0 +1,86 @@
+"""Tests of the time-related checks of the Heizung (with the data-files in a temporary directory)."""
+
+
+import threading
+from datetime import datetime, timedelta
+
+import Heizsteierung as heiz
+
+
+def minute(moment):
+    return moment.replace(second=0, microsecond=0)
+
+
+def urlaubtext(*changes):
+    return "".join(f"{moment.strftime(heiz.datetimeformat)} {state}\n" for moment, state in changes)
+
+
+def test_vacation_end_in_catchup_over_midnight(make_heizung):
+    # vacation 23:40 -> 00:05, last check at 23:50, next check at 00:20 (two days ago, so that everything is in the past)
+    midnight = minute(datetime.now()).replace(hour=0, minute=0) - timedelta(days=1)
+    myheizung = make_heizung(urlaub=urlaubtext((midnight - timedelta(minutes=20), "urlaub"),
+                                               (midnight + timedelta(minutes=5), "normal")))
+    myheizung.status = myheizung.desired_status = "urlaub"
+    myheizung.last_evaluated = midnight - timedelta(minutes=10)
+    myheizung.weekday = myheizung.last_evaluated.isoweekday()
+    myheizung.refresh_urlaub()  # (loaded again, for the last check above)
+
+    due = myheizung.due_transitions(midnight + timedelta(minutes=20))
+
+    assert (midnight + timedelta(minutes=5), "urlaub", "normal") in due
+
+
+def test_restart_across_vacation_end(make_heizung):
+    # the program is stopped during a vacation, and started again after its end
+    now = minute(datetime.now())
+    urlaub = urlaubtext((now - timedelta(days=2), "urlaub"), (now - timedelta(days=1), "normal"))
+    before = make_heizung(urlaub=urlaub)
+    before.status = before.desired_status = "urlaub"
+    before.last_evaluated = now - timedelta(days=1, hours=2)
+    before.save_state("check")
+
+    restarted = make_heizung()
+
+    assert restarted.status == "urlaub"
+    assert restarted.urlaub_times.get((now - timedelta(days=1)).strftime(heiz.datetimeformat)) == "normal"
+    assert restarted.check_heiz_statusandactions() == "reconcile"
+    assert restarted.desired_status == "normal"
+
+
+def test_reduce_during_running_raise_is_reported(make_heizung):
+    # the raise is running (desired normal, the boiler still believed reduziert) - a reduce brings the desired state
+    #   back to the believed one, but the robot has to change the boiler back after the raise
+    myheizung = make_heizung()
+    myheizung.status = "reduziert"
+    myheizung.desired_status = "normal"
+    assert myheizung.request_reduce() == True
+    assert myheizung.desired_status == "reduziert"
+    assert myheizung.request_reduce() == "Näischt gemat"
+
+
+def test_request_during_failed_robot_command_is_kept(make_heizung):
+    # the robot answers wrongly to the raise, and while it's busy a reduce is pressed (in another thread, like the GUI)
+    myheizung = make_heizung()
+    myheizung.status = "reduziert"
+    myheizung.desired_status = "normal"
+
+    def send_batch(messages, on_ack=None):
+        pressed = threading.Thread(target=myheizung.request_status, args=("urlaub",))
+        pressed.start()
+        pressed.join()
+        return ["Echo-Text falsch"]
+
+    myheizung.myrobot.send_batch = send_batch
+    assert myheizung.reconcile() == "Echo-Text falsch"
+    assert myheizung.status == "reduziert"
+    assert myheizung.desired_status == "urlaub"
+    assert myheizung.check_heiz_statusandactions() == "reconcile"
+
+
+def test_failed_robot_command_resets_the_desired_state(make_heizung):
+    myheizung = make_heizung()
+    myheizung.status = "reduziert"
+    myheizung.desired_status = "normal"
+    myheizung.myrobot.send_batch = lambda messages, on_ack=None: ["Echo-Text falsch"]
+    myheizung.reconcile()
+    assert myheizung.desired_status == "reduziert"
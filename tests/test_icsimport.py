@@ -0,0 +1,129 @@
+"""Tests of the import of iCalendar files (the repetitions, overrides and the window of the holiday index)."""
+
+
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from icsimport import IcsCalendar, parse_ics, prepare_event, rule_starts
+
+
+def calendar(*events):
+    """the lines of a calendar file with the events (each one a list of property lines)"""
+    lines = ["BEGIN:VCALENDAR", "VERSION:2.0"]
+    for event in events:
+        lines += ["BEGIN:VEVENT"] + list(event) + ["END:VEVENT"]
+    return lines + ["END:VCALENDAR"]
+
+
+def starts(lines, start, end):
+    """the starts of the repetitions between start and end (dates)"""
+    events, errors = parse_ics(lines)
+    assert errors == []
+    occurrences = IcsCalendar(events).occurrences(datetime.combine(start, datetime.min.time()),
+                                                  datetime.combine(end, datetime.max.time()))
+    return [occurrencestart for occurrencestart, _, _ in occurrences]
+
+
+def test_yearly_last_monday_of_may():
+    lines = calendar(["DTSTART;VALUE=DATE:20200525", "SUMMARY:Pfingsten", "RRULE:FREQ=YEARLY;BYMONTH=5;BYDAY=-1MO"])
+    assert starts(lines, date(2020, 1, 1), date(2024, 12, 31)) == [
+        datetime(2020, 5, 25), datetime(2021, 5, 31), datetime(2022, 5, 30), datetime(2023, 5, 29), datetime(2024, 5, 27)]
+
+
+def test_monthly_last_day_every_second_month():
+    lines = calendar(["DTSTART;VALUE=DATE:20240131", "RRULE:FREQ=MONTHLY;INTERVAL=2;BYMONTHDAY=-1"])
+    assert starts(lines, date(2024, 1, 1), date(2024, 12, 31)) == [
+        datetime(2024, 1, 31), datetime(2024, 3, 31), datetime(2024, 5, 31), datetime(2024, 7, 31),
+        datetime(2024, 9, 30), datetime(2024, 11, 30)]
+
+
+def test_weekly_every_second_week_until():
+    # (UNTIL as date includes the whole day)
+    lines = calendar(["DTSTART;VALUE=DATE:20240304", "RRULE:FREQ=WEEKLY;INTERVAL=2;UNTIL=20240401"])
+    assert starts(lines, date(2024, 1, 1), date(2024, 12, 31)) == [
+        datetime(2024, 3, 4), datetime(2024, 3, 18), datetime(2024, 4, 1)]
+
+
+def test_yearly_on_february_29_only_in_leap_years():
+    lines = calendar(["DTSTART;VALUE=DATE:20200229", "RRULE:FREQ=YEARLY"])
+    assert starts(lines, date(2020, 1, 1), date(2029, 12, 31)) == [
+        datetime(2020, 2, 29), datetime(2024, 2, 29), datetime(2028, 2, 29)]
+
+
+def test_recurrence_id_and_exdate():
+    lines = calendar(["UID:schwammen", "DTSTART:20240902T180000", "DURATION:PT1H", "SUMMARY:Schwammen",
+                      "RRULE:FREQ=WEEKLY;COUNT=4", "EXDATE:20240909T180000"],
+                     ["UID:schwammen", "RECURRENCE-ID:20240916T180000", "DTSTART:20240917T190000",
+                      "DURATION:PT1H", "SUMMARY:Schwammen (verluecht)"])
+    events, errors = parse_ics(lines)
+    assert errors == []
+    occurrences = IcsCalendar(events).occurrences(datetime(2024, 9, 1), datetime(2024, 10, 1))
+    assert occurrences == [
+        (datetime(2024, 9, 2, 18), datetime(2024, 9, 2, 19), "Schwammen"),
+        (datetime(2024, 9, 17, 19), datetime(2024, 9, 17, 20), "Schwammen (verluecht)"),
+        (datetime(2024, 9, 23, 18), datetime(2024, 9, 23, 19), "Schwammen")]
+
+
+@pytest.fixture
+def luxembourg_time(monkeypatch):
+    """the local time zone is the one of Luxembourg during the test"""
+    if not hasattr(time, "tzset"):
+        pytest.skip("the time zone can't be changed on this system")
+    monkeypatch.setenv("TZ", "Europe/Luxembourg")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def test_utc_time_is_converted_to_local_time(luxembourg_time):
+    events, errors = parse_ics(calendar(["DTSTART:20240701T080000Z", "DTEND:20240701T100000Z"],
+                                        ["DTSTART:20240105T080000Z", "DTEND:20240105T100000Z"]))
+    assert errors == []
+    assert [(event["start"], event["end"]) for event in events] == [("2024-07-01 10:00", "2024-07-01 12:00"),
+                                                                    ("2024-01-05 09:00", "2024-01-05 11:00")]
+    expected = datetime(2024, 7, 1, 8, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+    assert events[0]["start"] == expected.strftime("%Y-%m-%d %H:%M")
+
+
+def test_holiday_on_across_the_window_boundary():
+    events, errors = parse_ics(calendar(["DTSTART;VALUE=DATE:20240101", "SUMMARY:Méindeg", "RRULE:FREQ=WEEKLY"]))
+    holidays = IcsCalendar(events, window_days=10)
+    assert holidays.holiday_on(date(2024, 1, 1)) == "Méindeg"
+    assert holidays.holiday_on(date(2024, 1, 11)) is None  # (the last day of the first window)
+    assert holidays.holiday_on(date(2024, 1, 15)) == "Méindeg"  # (after the window: a new one is built)
+    assert holidays.window == (date(2024, 1, 15), date(2024, 1, 25))
+    assert holidays.holiday_on(date(2024, 1, 22)) == "Méindeg"
+    assert holidays.holiday_on(date(2024, 1, 23)) is None
+    assert holidays.holiday_on(date(2024, 1, 8)) == "Méindeg"  # (back before the window)
+
+
+@pytest.mark.parametrize("rrule", [
+    "FREQ=DAILY;INTERVAL=3",
+    "FREQ=DAILY;BYDAY=SA,SU",
+    "FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH",
+    "FREQ=WEEKLY;INTERVAL=3;WKST=SU;BYDAY=SU,SA",
+    "FREQ=MONTHLY;BYDAY=-1FR",
+    "FREQ=MONTHLY;INTERVAL=5;BYMONTHDAY=31",
+    "FREQ=MONTHLY;BYMONTHDAY=1,-1;BYDAY=MO",
+    "FREQ=YEARLY;BYMONTH=5;BYDAY=-1MO",
+    "FREQ=YEARLY;INTERVAL=4",
+    "FREQ=YEARLY;BYDAY=20MO",
+    "FREQ=WEEKLY;INTERVAL=2;UNTIL=20410101",
+])
+def test_skipping_ahead_gives_the_same_starts(rrule):
+    # the repetitions of a rule that started 30 years ago: with the periods before earliest skipped, and counted from
+    #   the start of the rule
+    events, errors = parse_ics(calendar(["DTSTART:20000103T063000", "DURATION:PT1H", f"RRULE:{rrule}"]))
+    assert errors == []
+    event = prepare_event(events[0])
+    found = 0
+    for earliest in [datetime(2030, 2, 28, 12), datetime(2031, 1, 1), datetime(2040, 12, 29, 7)]:
+        end = earliest + timedelta(days=800)
+        skipped = [start for start in rule_starts(event.start, event.rule, earliest, end) if start >= earliest]
+        counted = [start for start in rule_starts(event.start, event.rule, event.start, end) if start >= earliest]
+        assert skipped == counted
+        found += len(counted)
+    assert found > 0
@@ -0,0 +1,9 @@
+from parsecache import ParseCache, content_hash
+
+
+def test_results_of_another_parser_version_are_not_used(tmp_path):
+    filename = str(tmp_path / "data_cache.json")
+    texthash = content_hash("1 06:30 normal")
+    ParseCache(filename, "1.0/1/1").put("times", texthash, {1: {"06:30": "normal"}})
+    assert ParseCache(filename, "1.0/1/1").get("times", texthash) == {1: {"06:30": "normal"}}
+    assert ParseCache(filename, "1.0/2/1").get("times", texthash) is None
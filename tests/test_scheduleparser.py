@@ -0,0 +1,31 @@
+import os
+
+import Heizsteierung as heiz
+from scheduleparser import parse_times
+
+repodir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the example of the old format (in the templates of the earlier versions):
+example_times = {1: {"06:30": "normal", "21:40": "reduziert"}, 2: {"06:30": "normal", "21:40": "reduziert"},
+                 3: {"06:30": "normal", "21:40": "reduziert"}, 4: {"06:30": "normal", "21:40": "reduziert"},
+                 5: {"06:30": "normal", "22:20": "reduziert"}, 6: {"07:30": "normal", "22:20": "reduziert"},
+                 7: {"07:30": "normal", "21:40": "reduziert"}}
+
+
+def uncommented_example(text):
+    """the lines of the example (after "Format-Bsp.:"), without their "# " """
+    lines = text.splitlines()
+    return [line[2:] for line in lines[lines.index("# Format-Bsp.:") + 1:]]
+
+
+def test_template_installs_no_times():
+    with open(os.path.join(repodir, "template_data_times.txt")) as templatefile:
+        template = templatefile.read()
+    assert parse_times(template.splitlines()) == (None, [])
+    assert parse_times(uncommented_example(template)) == (example_times, [])
+
+
+def test_created_timesfile_has_the_same_example(make_heizung, tmp_path):
+    make_heizung()
+    created = (tmp_path / heiz.timesfile).read_text()
+    assert parse_times(created.splitlines()) == (None, [])
+    assert parse_times(uncommented_example(created)) == (example_times, [])
@@ -0,0 +1,61 @@
+"""Tests of the index of the holiday-times (urlaubindex)."""
+
+
+import random
+import time
+from datetime import datetime, timedelta
+
+from urlaubindex import UrlaubIndex, datetimeformat
+
+
+def large_urlaub(count):
+    """count vacations of 2 days, every 5 days, and a vacation without end after them"""
+    start = datetime(2020, 1, 1, 10, 0)
+    urlaub = {}
+    for number in range(count):
+        begin = start + timedelta(days=5 * number)
+        urlaub[begin.strftime(datetimeformat)] = "urlaub"
+        urlaub[(begin + timedelta(days=2)).strftime(datetimeformat)] = "normal"
+    urlaub[(start + timedelta(days=5 * count)).strftime(datetimeformat)] = "urlaub"
+    return urlaub
+
+
+def scanned_vacations(index, start, end):
+    """the vacations of the range, found by going through all of them"""
+    return [(begin, finish) for begin, finish in index.find_intervals()
+            if begin <= end and (finish is None or finish > start)]
+
+
+def test_vacations_between_matches_scan():
+    index = UrlaubIndex(large_urlaub(2000))
+    randomness = random.Random(1)
+    first = datetime(2019, 12, 1)
+    for _ in range(500):
+        start = first + timedelta(minutes=randomness.randrange(12000 * 24 * 60))
+        end = start + timedelta(minutes=randomness.randrange(60 * 24 * 60))
+        startkey, endkey = start.strftime(datetimeformat), end.strftime(datetimeformat)
+        assert index.vacations_between(startkey, endkey) == scanned_vacations(index, startkey, endkey)
+    # the boundaries: a vacation that ends exactly at start doesn't overlap, one that starts exactly at end does
+    assert index.vacations_between("2020-01-03 10:00", "2020-01-06 10:00") == [("2020-01-06 10:00", "2020-01-08 10:00")]
+    # the vacation without end
+    assert index.vacations_between("2100-01-01 00:00", "2100-01-02 00:00")[-1][1] is None
+
+
+def test_vacations_between_after_compact():
+    index = UrlaubIndex(large_urlaub(100))
+    index.compact("2020-02-01 00:00")
+    assert index.intervals() == index.find_intervals()
+    assert index.vacations_between("2020-01-01 00:00", "2020-02-02 00:00") == [("2020-01-31 10:00", "2020-02-02 10:00")]
+
+
+def test_range_query_is_logarithmic():
+    # the same query on an index 100 times larger may not take anywhere near 100 times longer
+    small, large = UrlaubIndex(large_urlaub(1000)), UrlaubIndex(large_urlaub(100000))
+
+    def duration(index):
+        begin = time.perf_counter()
+        for _ in range(2000):
+            index.vacations_between("2020-03-01 00:00", "2020-03-20 00:00")
+        return time.perf_counter() - begin
+
+    assert duration(large) < duration(small) * 10
@@ -0,0 +1,186 @@
+"""
+Interval index of the holiday/vacation data.
+
+The holiday-times are saved as a dictionary {'YYYY-MM-DD HH:MM': 'urlaub'/'normal'}: 'urlaub' starts a vacation,
+'normal' ends it. The UrlaubIndex keeps these changes sorted (the date-strings in this format sort chronologically), so
+that with a binary search it can answer "are we on vacation at this moment?", "which is the next change?" and "which
+changes/vacations lie in this range?". The vacations (start, end) are also kept sorted (they don't overlap, so their
+ends are sorted too), so that the vacations of a range are found with a binary search as well.
+Vacations that are over are of no more use, so they can be removed from the index (and optionally from the file) with
+compact().
+"""
+
+
+import os
+import re
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+datetimeformat = "%Y-%m-%d %H:%M"
+openend = "9999-12-31 23:59"  # (the end of a vacation without end, in self.ends - sorts after every other key)
+urlaubkey_pattern = re.compile(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}")
+
+
+def valid_urlaubkey(singlekey):
+    """Checks if the key has the format 'YYYY-MM-DD HH:MM' and is a valid date/time (and not for example
+    2025-1-29 4:30 or 2025-02-30 10:00). (A file whose content was already checked isn't checked again, see
+    parsecache.)"""
+    if type(singlekey) != str or urlaubkey_pattern.fullmatch(singlekey) is None:
+        return False
+    try:
+        datetime.strptime(singlekey, datetimeformat)
+    except ValueError:
+        return False
+    return True
+
+
+def to_key(moment):
+    """converts a datetime to a key of the holiday-data ('YYYY-MM-DD HH:MM') - strings are returned as they are"""
+    if type(moment) == str:
+        return moment
+    return moment.strftime(datetimeformat)
+
+
+class UrlaubIndex():
+    """Sorted index of the holiday-changes ('urlaub' = vacation starts, 'normal' = vacation ends)."""
+
+    def __init__(self, urlaub_times=None):
+        self.keys = []  # the sorted date-strings
+        self.states = []  # 'urlaub' or 'normal', for the same position in self.keys
+        self.vacations = []  # the vacations (start, end), sorted - see intervals()
+        self.starts = []  # the starts and the ends of the vacations (openend for a vacation without end), for the
+        self.ends = []  #   binary search
+        if urlaub_times is not None:
+            self.rebuild(urlaub_times)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def rebuild(self, urlaub_times):
+        """builds the index from the dictionary with the holiday-times"""
+        self.keys = sorted(urlaub_times)
+        self.states = [urlaub_times[key] for key in self.keys]
+        self.index_vacations()
+
+    def as_dict(self):
+        """returns the (remaining) holiday-times as dictionary, in the format of the file"""
+        return dict(zip(self.keys, self.states))
+
+    def get(self, moment):
+        """returns the change ('urlaub'/'normal') at exactly this minute, or None"""
+        key = to_key(moment)
+        pos = bisect_left(self.keys, key)
+        if pos < len(self.keys) and self.keys[pos] == key:
+            return self.states[pos]
+        return None
+
+    def state_at(self, moment):
+        """Returns 'urlaub' if the moment lies in a vacation (the last change at or before the moment was 'urlaub'),
+        otherwise 'normal'."""
+        pos = bisect_right(self.keys, to_key(moment)) - 1
+        if pos < 0:
+            return "normal"
+        return self.states[pos]
+
+    def on_vacation(self, moment):
+        """True if the moment lies in a vacation"""
+        return self.state_at(moment) == "urlaub"
+
+    def next_change(self, moment):
+        """returns ('YYYY-MM-DD HH:MM', state) of the first change after the moment, or None"""
+        pos = bisect_right(self.keys, to_key(moment))
+        if pos == len(self.keys):
+            return None
+        return self.keys[pos], self.states[pos]
+
+    def changes_after(self, moment):
+        """yields the changes ('YYYY-MM-DD HH:MM', state) after the moment, one after the other (z.B. for heiztimeline)"""
+        for pos in range(bisect_right(self.keys, to_key(moment)), len(self.keys)):
+            yield self.keys[pos], self.states[pos]
+
+    def changes_between(self, start, end):
+        """returns the list of changes ('YYYY-MM-DD HH:MM', state) after start and up to (including) end"""
+        first = bisect_right(self.keys, to_key(start))
+        last = bisect_right(self.keys, to_key(end))
+        return list(zip(self.keys[first:last], self.states[first:last]))
+
+    def index_vacations(self):
+        """builds the sorted list of the vacations from the changes (after every change of the index)"""
+        self.vacations = self.find_intervals()
+        self.starts = [start for start, _ in self.vacations]
+        self.ends = [end if end is not None else openend for _, end in self.vacations]
+
+    def intervals(self):
+        """Returns the vacations as list of (start, end) date-strings. end is None for a vacation without end.
+        Repeated changes to the same state (z.B. 'urlaub' twice in a row) are merged."""
+        return list(self.vacations)
+
+    def find_intervals(self):
+        """the vacations (see intervals), found by going through all the changes"""
+        found = []
+        start = None
+        for key, state in zip(self.keys, self.states):
+            if state == "urlaub" and start is None:
+                start = key
+            elif state == "normal" and start is not None:
+                found.append((start, key))
+                start = None
+        if start is not None:
+            found.append((start, None))
+        return found
+
+    def vacations_between(self, start, end):
+        """returns the vacations (start, end) that overlap the range from start to end"""
+        # (from the first vacation that ends after start, up to the last one that starts at or before end)
+        first = bisect_right(self.ends, to_key(start))
+        last = bisect_right(self.starts, to_key(end))
+        return self.vacations[first:last]
+
+    def compact(self, moment):
+        """Removes the vacations that are over at the given moment (and the changes that lie before the moment and
+        don't matter anymore). A running vacation keeps its start.
+        Returns the number of removed changes."""
+        pos = bisect_left(self.keys, to_key(moment))  # (changes at exactly this minute are kept, they could still be due)
+        if pos == 0:
+            return 0
+        if self.states[pos - 1] == "urlaub":
+            pos -= 1  # the vacation is still running, keep its start
+        del self.keys[:pos]
+        del self.states[:pos]
+        self.index_vacations()
+        return pos
+
+
+def merge_vacations(urlaub_times, vacations):
+    """Returns the holiday-times (dictionary) with the additional vacations (list of (start, end) date-strings, z.B.
+    from the vacation calendar, see icsimport) merged in. Vacations that overlap or touch each other are joined, so that
+    the changes alternate between 'urlaub' and 'normal' (a 'normal' of the holiday-times without vacation before it is
+    left out)."""
+    merged = []
+    for start, end in sorted(UrlaubIndex(urlaub_times).intervals() + list(vacations), key=lambda interval: interval[0]):
+        if len(merged) > 0 and (merged[-1][1] is None or start <= merged[-1][1]):
+            if merged[-1][1] is not None and (end is None or end > merged[-1][1]):
+                merged[-1] = (merged[-1][0], end)
+            continue
+        merged.append((start, end))
+    result = {}
+    for start, end in merged:
+        result[start] = "urlaub"
+        if end is not None:
+            result[end] = "normal"
+    return result
+
+
+def compact_urlaubfile(filename, urlaub_times):
+    """Rewrites the holiday-file with the given (compacted) holiday-times. The comment lines of the file are kept.
+    The holiday-times are written in the line format (one change per line, see scheduleparser).
+    The file is replaced in one step (written to a temporary file first), so that it can't be left half-written."""
+    with open(filename, "r") as readfile:
+        commentlines = [line.rstrip("\n") for line in readfile if line.lstrip().startswith("#")]
+    tmpfilename = filename + ".tmp"
+    with open(tmpfilename, "w") as writefile:
+        writefile.write("".join(line + "\n" for line in commentlines))
+        writefile.write("".join(f"{key} {state}\n" for key, state in urlaub_times.items()))
+        writefile.flush()
+        os.fsync(writefile.fileno())
+    os.replace(tmpfilename, filename)